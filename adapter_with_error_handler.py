@@ -8,9 +8,13 @@ from botbuilder.core import (
     BotFrameworkAdapter,
     BotFrameworkAdapterSettings,
     ConversationState,
+    MessageFactory,
     TurnContext,
 )
 from botbuilder.schema import ActivityTypes, Activity
+from botframework.connector.auth import ClaimsIdentity, MicrosoftAppCredentials
+
+from authentication import SigningKeyRefresher, ValidatedTokenCache
 
 
 class AdapterWithErrorHandler(BotFrameworkAdapter):
@@ -18,9 +22,14 @@ class AdapterWithErrorHandler(BotFrameworkAdapter):
         self,
         settings: BotFrameworkAdapterSettings,
         conversation_state: ConversationState,
+        token_cache: ValidatedTokenCache = None,
+        key_refresher: SigningKeyRefresher = None,
     ):
         super().__init__(settings)
         self._conversation_state = conversation_state
+        # Validated authorization headers, checked before the full JWT validation.
+        self.token_cache = token_cache
+        self.key_refresher = key_refresher
 
         # Catch-all for errors.
         async def on_error(context: TurnContext, error: Exception):
@@ -30,11 +39,13 @@ class AdapterWithErrorHandler(BotFrameworkAdapter):
             print(f"\n [on_turn_error] unhandled error: {error}", file=sys.stderr)
             traceback.print_exc()
 
-            # Send a message to the user
-            await context.send_activity("The bot encountered an error or bug.")
-            await context.send_activity(
-                "To continue to run this bot, please fix the bot source code."
-            )
+            # Send a message to the user, in a single batch with the trace below
+            activities = [
+                MessageFactory.text("The bot encountered an error or bug."),
+                MessageFactory.text(
+                    "To continue to run this bot, please fix the bot source code."
+                ),
+            ]
             # Send a trace activity if we're talking to the Bot Framework Emulator
             if context.activity.channel_id == "emulator":
                 # Create a trace activity that contains the error object
@@ -47,10 +58,39 @@ class AdapterWithErrorHandler(BotFrameworkAdapter):
                     value_type="https://www.botframework.com/schemas/error",
                 )
                 # Send a trace activity, which will be displayed in Bot Framework Emulator
-                await context.send_activity(trace_activity)
+                activities.append(trace_activity)
+            await context.send_activities(activities)
 
             # Clear out state
             nonlocal self
             await self._conversation_state.delete(context)
 
         self.on_turn_error = on_error
+
+    async def authenticate(self, activity: Activity, auth_header: str) -> ClaimsIdentity:
+        """Validate the request as process_activity does, ie before admitting its turn."""
+        return await self._authenticate_request(activity, auth_header or "")
+
+    async def _authenticate_request(
+        self, request: Activity, auth_header: str
+    ) -> ClaimsIdentity:
+        if not auth_header or self.token_cache is None:
+            return await super()._authenticate_request(request, auth_header)
+
+        key = self.token_cache.key(auth_header, request.channel_id, request.service_url)
+        identity = self.token_cache.get(key)
+        if identity is not None:
+            # As the full validation does, trust the service url of the activity.
+            MicrosoftAppCredentials.trust_service_url(request.service_url)
+            return identity
+
+        try:
+            identity = await super()._authenticate_request(request, auth_header)
+        except Exception:
+            # The token may be signed with a key published since the last refresh.
+            if self.key_refresher is not None:
+                self.key_refresher.refresh_soon()
+            raise
+
+        self.token_cache.put(key, identity)
+        return identity
@@ -0,0 +1,17 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Admission module."""
+
+from .controller import (
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    dialog_in_stack,
+)
+
+__all__ = [
+    "AdmissionController",
+    "AdmissionMiddleware",
+    "AdmissionRejected",
+    "dialog_in_stack",
+]
@@ -0,0 +1,278 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Admission control and load shedding of the incoming turns."""
+
+import asyncio
+import collections
+import math
+import time
+from http import HTTPStatus
+from typing import Awaitable, Callable, Dict
+
+from botbuilder.core import (
+    BotState,
+    BotTelemetryClient,
+    Middleware,
+    TurnContext,
+)
+from botbuilder.dialogs import ComponentDialog, DialogState
+
+from telemetry import MetricsReporter
+
+
+class AdmissionRejected(Exception):
+    """A turn refused by the admission controller, to answer with `status` and Retry-After."""
+
+    def __init__(self, status: int, retry_after: int, reason: str):
+        super(AdmissionRejected, self).__init__(f"{reason}, retry after {retry_after}s")
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Conversation:
+    __slots__ = ("tokens", "updated", "in_progress")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.in_progress = False
+
+
+class AdmissionController:
+    """
+    Limits the turns processed at once to `max_concurrent`, the others wait in a
+    queue of at most `max_queue` turns, served first in first out but conversations
+    marked as in progress (ie in the middle of a booking) before the new ones.
+
+    New conversations are shed with a 503 once they fill `new_queue_share` of the
+    queue, or while the average queue wait is above `target_wait` seconds, so that
+    the bookings already started keep the capacity. A queued turn still waiting
+    after `max_wait` seconds is shed too. Each conversation may start `rate` turns
+    per second with bursts of `burst`, beyond that its turns get a 429. Every
+    rejection carries the number of seconds to wait before retrying.
+
+    The per-conversation state of at most `max_conversations` conversations is
+    kept, least recently seen first out, and is local to the process. The counters
+    are sent as metrics every `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_queue: int = 128,
+        new_queue_share: float = 0.5,
+        target_wait: float = 1.0,
+        max_wait: float = 5.0,
+        rate: float = 2.0,
+        burst: float = 10.0,
+        max_conversations: int = 10000,
+        telemetry_client: BotTelemetryClient = None,
+        report_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.new_queue_share = new_queue_share
+        self.target_wait = target_wait
+        self.max_wait = max_wait
+        self.rate = rate
+        self.burst = burst
+        self.max_conversations = max_conversations
+        self._clock = clock
+        self._reporter = MetricsReporter(
+            "Admission",
+            self.metrics,
+            telemetry_client,
+            gauges=("active", "waiting", "average_wait_ms"),
+            interval=report_interval,
+            clock=clock,
+        )
+
+        self._conversations = collections.OrderedDict()
+        self._priority_waiters = collections.deque()
+        self._new_waiters = collections.deque()
+
+        self.active = 0
+        # Moving average of the queue wait of the admitted turns, in seconds.
+        self.average_wait = 0.0
+
+        self.admitted = 0
+        self.admitted_in_progress = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.shed_queue_full = 0
+        self.shed_latency = 0
+        self.shed_timeout = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._priority_waiters) + len(self._new_waiters)
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "admitted": self.admitted,
+            "admitted_in_progress": self.admitted_in_progress,
+            "queued": self.queued,
+            "rate_limited": self.rate_limited,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_latency": self.shed_latency,
+            "shed_timeout": self.shed_timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "average_wait_ms": self.average_wait * 1000,
+        }
+
+    def mark(self, conversation_id: str, in_progress: bool) -> None:
+        """Record whether the conversation is in the middle of a dialog that has priority."""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is not None:
+            conversation.in_progress = in_progress
+
+    async def acquire(self, conversation_id: str) -> None:
+        """Wait for a slot for a turn of `conversation_id`, or raise AdmissionRejected."""
+        now = self._clock()
+        conversation = self._conversation(conversation_id, now)
+        if conversation.tokens < 1.0:
+            self.rate_limited += 1
+            raise AdmissionRejected(
+                HTTPStatus.TOO_MANY_REQUESTS,
+                self._seconds((1.0 - conversation.tokens) / self.rate),
+                "conversation rate limit",
+            )
+        conversation.tokens -= 1.0
+        in_progress = conversation.in_progress
+
+        if self.active < self.max_concurrent:
+            self.active += 1
+            self._admitted(in_progress, 0.0)
+            return
+
+        if self.waiting >= self.max_queue:
+            self.shed_queue_full += 1
+            raise self._overloaded("queue full")
+        if not in_progress:
+            if len(self._new_waiters) >= self.max_queue * self.new_queue_share:
+                self.shed_queue_full += 1
+                raise self._overloaded("queue full")
+            if self.average_wait > self.target_wait:
+                self.shed_latency += 1
+                raise self._overloaded("queue wait above target")
+
+        waiters = self._priority_waiters if in_progress else self._new_waiters
+        waiter = asyncio.get_event_loop().create_future()
+        waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait([waiter], timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # The request went away while queued.
+            self._abandon(waiters, waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiters, waiter)
+            self.shed_timeout += 1
+            # The wait itself is a sample, so that new conversations are shed early.
+            self._record_wait(self.max_wait)
+            raise self._overloaded("queue wait timeout")
+        self._admitted(in_progress, self._clock() - now)
+
+    def release(self) -> None:
+        """Give the slot of a finished turn to the next queued one."""
+        self._reporter.report()
+        for waiters in (self._priority_waiters, self._new_waiters):
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    # The slot is handed over, the number of active turns is unchanged.
+                    waiter.set_result(None)
+                    return
+        self.active -= 1
+
+    def _abandon(self, waiters: collections.deque, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The slot was handed over just before, pass it on.
+            self.release()
+        else:
+            waiters.remove(waiter)
+            waiter.cancel()
+
+    def _conversation(self, conversation_id: str, now: float) -> _Conversation:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            conversation = self._conversations[conversation_id] = _Conversation(self.burst, now)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        else:
+            self._conversations.move_to_end(conversation_id)
+            conversation.tokens = min(
+                self.burst, conversation.tokens + (now - conversation.updated) * self.rate
+            )
+            conversation.updated = now
+        return conversation
+
+    def _admitted(self, in_progress: bool, wait: float) -> None:
+        self.admitted += 1
+        if in_progress:
+            self.admitted_in_progress += 1
+        self._record_wait(wait)
+
+    def _record_wait(self, wait: float) -> None:
+        self.average_wait += (wait - self.average_wait) * 0.1
+
+    def _overloaded(self, reason: str) -> AdmissionRejected:
+        return AdmissionRejected(
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            self._seconds(max(self.average_wait, self.target_wait)),
+            reason,
+        )
+
+    @staticmethod
+    def _seconds(delay: float) -> int:
+        return max(1, math.ceil(delay))
+
+
+def dialog_in_stack(dialog_state: DialogState, dialog_id: str) -> bool:
+    """Whether `dialog_id` is on the stack of `dialog_state` or of a component dialog on it."""
+    for instance in dialog_state.dialog_stack:
+        if instance.id == dialog_id:
+            return True
+        inner = (instance.state or {}).get(ComponentDialog.persisted_dialog_state)
+        if isinstance(inner, DialogState) and dialog_in_stack(inner, dialog_id):
+            return True
+    return False
+
+
+class AdmissionMiddleware(Middleware):
+    """
+    Marks the conversations having `dialog_id` active at the end of their turn, so
+    that the admission controller serves their next turns first. Only the
+    conversation state already loaded by the turn is read.
+    """
+
+    def __init__(
+        self,
+        controller: AdmissionController,
+        conversation_state: BotState,
+        dialog_id: str,
+        property_name: str = "DialogState",
+    ):
+        self.controller = controller
+        self.conversation_state = conversation_state
+        self.dialog_id = dialog_id
+        self.property_name = property_name
+
+    async def on_turn(
+        self, context: TurnContext, logic: Callable[[TurnContext], Awaitable]
+    ):
+        await logic()
+
+        cached_state = self.conversation_state.get_cached_state(context)
+        if cached_state is None or context.activity.conversation is None:
+            return
+        dialog_state = cached_state.state.get(self.property_name)
+        self.controller.mark(
+            context.activity.conversation.id,
+            isinstance(dialog_state, DialogState)
+            and dialog_in_stack(dialog_state, self.dialog_id),
+        )
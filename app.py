@@ -11,15 +11,16 @@ This sample shows how to create a bot that demonstrates the following:
 from http import HTTPStatus
 from aiohttp import web
 from aiohttp.web import Request, Response, json_response
+from msrest.exceptions import DeserializationError
 from botbuilder.core import (
     BotFrameworkAdapterSettings,
-    ConversationState,
     MemoryStorage,
-    UserState,
+    NullTelemetryClient,
     TelemetryLoggerMiddleware,
 )
 from botbuilder.core.integration import aiohttp_error_middleware
 from botbuilder.schema import Activity
+from botframework.connector.auth import ClaimsIdentity
 from botbuilder.applicationinsights import ApplicationInsightsTelemetryClient
 from botbuilder.integration.applicationinsights.aiohttp import (
     AiohttpTelemetryProcessor,
@@ -28,65 +29,365 @@ from botbuilder.integration.applicationinsights.aiohttp import (
 
 from config import DefaultConfig
 from dialogs import MainDialog, BookingDialog
-from bots import DialogAndWelcomeBot
+from bots import DialogAndWelcomeBot, OutboundBufferMiddleware, ResourceRegistry
+from bots.dialog_and_welcome_bot import RESOURCES_DIRECTORY
 
 from adapter_with_error_handler import AdapterWithErrorHandler
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected
+from authentication import SigningKeyRefresher, ValidatedTokenCache
 from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.activity_parser import parse_activity
+from helpers.dialog_helper import DialogRegistry
+from recognition import FastPathRecognizer, Gazetteer, LocalRecognizer
+from storage import (
+    DirtyTrackingConversationState,
+    DirtyTrackingUserState,
+    FileKeyedLock,
+    JsonlOutcomeStore,
+    KeyedLock,
+    SqliteStorage,
+    TranscriptStore,
+    WriteBehindQueue,
+)
+from telemetry import (
+    SamplingTelemetryClient,
+    TelemetrySamplingMiddleware,
+    TurnProfiler,
+    TurnProfilerMiddleware,
+    batching_telemetry_client,
+    span,
+)
 
 CONFIG = DefaultConfig()
 
+# Placeholder key of the envelopes written to a local telemetry file.
+OFFLINE_INSTRUMENTATION_KEY = "00000000-0000-0000-0000-000000000000"
+
 # Create adapter.
 # See https://aka.ms/about-bot-adapter to learn more about how bots work.
 SETTINGS = BotFrameworkAdapterSettings(CONFIG.APP_ID, CONFIG.APP_PASSWORD)
 
-# Create MemoryStorage, UserState and ConversationState
-MEMORY = MemoryStorage()
-USER_STATE = UserState(MEMORY)
-CONVERSATION_STATE = ConversationState(MEMORY)
+# Create the state storage, UserState and ConversationState. The sqlite storage is
+# shared by every worker process, MemoryStorage only lives as long as this process.
+if CONFIG.STORAGE_BACKEND == "sqlite":
+    STORAGE = SqliteStorage(
+        CONFIG.STORAGE_PATH,
+        ttl=CONFIG.STORAGE_TTL,
+        batch_delay=CONFIG.STORAGE_BATCH_DELAY,
+    )
+else:
+    STORAGE = MemoryStorage()
+# Both states only write to the storage when their content changed during the turn.
+USER_STATE = DirtyTrackingUserState(STORAGE)
+CONVERSATION_STATE = DirtyTrackingConversationState(STORAGE)
+# The turns of a conversation wait for each other, so that they never load and save
+# its state concurrently. The file locks are shared by the serve.py workers.
+TURN_LOCK = None
+if CONFIG.TURN_LOCK == "file":
+    TURN_LOCK = FileKeyedLock(
+        CONFIG.TURN_LOCK_DIR,
+        shards=CONFIG.TURN_LOCK_SHARDS,
+        timeout=CONFIG.TURN_LOCK_TIMEOUT,
+    )
+elif CONFIG.TURN_LOCK == "process":
+    TURN_LOCK = KeyedLock()
+
+# Authorization headers already validated, and the signing keys refreshed in the
+# background, only used when the bot has an app id.
+TOKEN_CACHE = None
+KEY_REFRESHER = None
+if CONFIG.APP_ID and CONFIG.AUTH_TOKEN_CACHE_SIZE:
+    TOKEN_CACHE = ValidatedTokenCache(CONFIG.AUTH_TOKEN_CACHE_SIZE)
+if CONFIG.APP_ID and CONFIG.AUTH_KEY_REFRESH_INTERVAL:
+    KEY_REFRESHER = SigningKeyRefresher(
+        interval=CONFIG.AUTH_KEY_REFRESH_INTERVAL,
+        on_keys_removed=TOKEN_CACHE.clear if TOKEN_CACHE is not None else None,
+    )
 
 # Create adapter.
 # See https://aka.ms/about-bot-adapter to learn more about how bots work.
-ADAPTER = AdapterWithErrorHandler(SETTINGS, CONVERSATION_STATE)
+ADAPTER = AdapterWithErrorHandler(
+    SETTINGS,
+    CONVERSATION_STATE,
+    token_cache=TOKEN_CACHE,
+    key_refresher=KEY_REFRESHER,
+)
 
 # Create telemetry client.
-# Note the small 'client_queue_size'.  This is for demonstration purposes.  Larger queue sizes
-# result in fewer calls to ApplicationInsights, improving bot performance at the expense of
-# less frequent updates.
+# The envelopes are queued in memory and exported in batches from a background thread,
+# so that tracking never waits on Application Insights. With a TelemetryFilePath they
+# are written to that file instead, ie for local runs.
 INSTRUMENTATION_KEY = CONFIG.APPINSIGHTS_INSTRUMENTATION_KEY
-TELEMETRY_CLIENT = ApplicationInsightsTelemetryClient(
-    INSTRUMENTATION_KEY, telemetry_processor=AiohttpTelemetryProcessor(), client_queue_size=1
+TELEMETRY_QUEUE = None
+if INSTRUMENTATION_KEY or CONFIG.TELEMETRY_FILE_PATH:
+    APPLICATION_INSIGHTS_CLIENT = batching_telemetry_client(
+        INSTRUMENTATION_KEY or OFFLINE_INSTRUMENTATION_KEY,
+        file_path=CONFIG.TELEMETRY_FILE_PATH,
+        max_pending=CONFIG.TELEMETRY_MAX_PENDING,
+        batch_size=CONFIG.TELEMETRY_BATCH_SIZE,
+        send_interval=CONFIG.TELEMETRY_SEND_INTERVAL,
+    )
+    TELEMETRY_QUEUE = APPLICATION_INSIGHTS_CLIENT.channel.queue
+    TELEMETRY_CLIENT = ApplicationInsightsTelemetryClient(
+        INSTRUMENTATION_KEY or OFFLINE_INSTRUMENTATION_KEY,
+        telemetry_client=APPLICATION_INSIGHTS_CLIENT,
+        telemetry_processor=AiohttpTelemetryProcessor(),
+    )
+else:
+    # No Application Insights resource, ie local runs and benchmarks.
+    TELEMETRY_CLIENT = NullTelemetryClient()
+# Keep the telemetry of a fraction of the conversations, plus the slow or failed turns.
+TELEMETRY_CLIENT = SamplingTelemetryClient(
+    TELEMETRY_CLIENT,
+    rate=CONFIG.TELEMETRY_SAMPLE_RATE,
+    slow_turn_ms=CONFIG.TELEMETRY_SLOW_TURN_MS,
 )
+ADAPTER.use(TelemetrySamplingMiddleware(TELEMETRY_CLIENT))
 
 # Code for enabling activity and personal information logging.
 TELEMETRY_LOGGER_MIDDLEWARE = TelemetryLoggerMiddleware(telemetry_client=TELEMETRY_CLIENT, log_personal_information=False)
 ADAPTER.use(TELEMETRY_LOGGER_MIDDLEWARE)
 
+# Span trees of the sampled turns and their aggregates. The turns are already sampled
+# by the profiler, they bypass the conversation sampling.
+PROFILER = TurnProfiler(
+    telemetry_client=TELEMETRY_CLIENT.telemetry_client,
+    sample_rate=CONFIG.PROFILE_SAMPLE_RATE,
+    slow_turn_ms=CONFIG.PROFILE_SLOW_TURN_MS,
+    dump_dir=CONFIG.PROFILE_DUMP_DIR,
+)
+ADAPTER.use(TurnProfilerMiddleware(PROFILER))
+
+# Admission control of /api/messages, the conversations in the middle of a booking
+# are served first.
+ADMISSION = None
+if CONFIG.ADMISSION_MAX_CONCURRENT:
+    ADMISSION = AdmissionController(
+        max_concurrent=CONFIG.ADMISSION_MAX_CONCURRENT,
+        max_queue=CONFIG.ADMISSION_MAX_QUEUE,
+        target_wait=CONFIG.ADMISSION_TARGET_WAIT,
+        max_wait=CONFIG.ADMISSION_MAX_WAIT,
+        rate=CONFIG.ADMISSION_CONVERSATION_RATE,
+        burst=CONFIG.ADMISSION_CONVERSATION_BURST,
+        telemetry_client=TELEMETRY_CLIENT,
+    )
+    ADAPTER.use(AdmissionMiddleware(ADMISSION, CONVERSATION_STATE, BookingDialog.__name__))
+
+# Registered last: the handlers above see each activity before it is held until the
+# end of the turn.
+OUTBOUND_BUFFER = None
+if CONFIG.OUTBOUND_BUFFER_ENABLED:
+    # Its metrics are sent from inside the turn, past the sampling.
+    OUTBOUND_BUFFER = OutboundBufferMiddleware(
+        coalesce=CONFIG.OUTBOUND_COALESCE,
+        telemetry_client=TELEMETRY_CLIENT.telemetry_client,
+    )
+    ADAPTER.use(OUTBOUND_BUFFER)
+
+# Create the booking outcome and retraining data stores, shared by every conversation
+# of this process. Appends go through a write-behind queue so that the dialogs never
+# wait on the disk.
+WRITE_BEHIND = WriteBehindQueue(
+    max_pending=CONFIG.WRITE_BEHIND_MAX_PENDING,
+    batch_size=CONFIG.WRITE_BEHIND_BATCH_SIZE,
+    spill_path=CONFIG.WRITE_BEHIND_SPILL_PATH,
+    telemetry_client=TELEMETRY_CLIENT,
+    adopt_pattern=CONFIG.WRITE_BEHIND_ADOPT_PATTERN or None,
+)
+OUTCOME_STORE = WRITE_BEHIND.wrap(
+    "outcomes",
+    JsonlOutcomeStore(
+        CONFIG.OUTCOME_STORE_DIR,
+        max_segment_bytes=CONFIG.OUTCOME_SEGMENT_MAX_BYTES,
+        max_segment_age=CONFIG.OUTCOME_SEGMENT_MAX_AGE,
+        fsync_every=CONFIG.OUTCOME_FSYNC_EVERY,
+    ),
+)
+NEW_DATA_STORE = WRITE_BEHIND.wrap(
+    "new_data",
+    JsonlOutcomeStore(
+        CONFIG.OUTCOME_STORE_DIR,
+        prefix="new_data",
+        max_segment_bytes=CONFIG.OUTCOME_SEGMENT_MAX_BYTES,
+        max_segment_age=CONFIG.OUTCOME_SEGMENT_MAX_AGE,
+        fsync_every=CONFIG.OUTCOME_FSYNC_EVERY,
+    ),
+)
+TURN_SPILL_STORE = WRITE_BEHIND.wrap(
+    "turns",
+    JsonlOutcomeStore(
+        CONFIG.OUTCOME_STORE_DIR,
+        prefix="turns",
+        max_segment_bytes=CONFIG.OUTCOME_SEGMENT_MAX_BYTES,
+        max_segment_age=CONFIG.OUTCOME_SEGMENT_MAX_AGE,
+        fsync_every=CONFIG.OUTCOME_FSYNC_EVERY,
+    ),
+)
+
 # Create dialogs and Bot
-RECOGNIZER = FlightBookingRecognizer(CONFIG)
-BOOKING_DIALOG = BookingDialog(telemetry_client=TELEMETRY_CLIENT)
-DIALOG = MainDialog(RECOGNIZER, BOOKING_DIALOG, telemetry_client=TELEMETRY_CLIENT)
-BOT = DialogAndWelcomeBot(CONVERSATION_STATE, USER_STATE, DIALOG, telemetry_client=TELEMETRY_CLIENT)
+LUIS_RECOGNIZER = None
+FALLBACK_RECOGNIZER = None
+if CONFIG.RECOGNIZER_MODE == "local":
+    RECOGNIZER = LocalRecognizer.from_sources(
+        CONFIG.LUIS_MODEL_PATH, CONFIG.NEW_DATA_PATH, NEW_DATA_STORE
+    )
+else:
+    LUIS_RECOGNIZER = FlightBookingRecognizer(
+        CONFIG,
+        telemetry_client=TELEMETRY_CLIENT,
+        metrics_client=TELEMETRY_CLIENT.telemetry_client,
+    )
+    RECOGNIZER = LUIS_RECOGNIZER
+    if CONFIG.FAST_PATH_ENABLED:
+        RECOGNIZER = FastPathRecognizer(
+            RECOGNIZER,
+            Gazetteer.from_luis_model(CONFIG.LUIS_MODEL_PATH),
+            threshold=CONFIG.FAST_PATH_THRESHOLD,
+            # Its metrics are sent from inside the turn, past the sampling.
+            telemetry_client=TELEMETRY_CLIENT.telemetry_client,
+        )
+    if CONFIG.LUIS_FALLBACK_ENABLED:
+        FALLBACK_RECOGNIZER = LocalRecognizer.from_sources(
+            CONFIG.LUIS_MODEL_PATH, CONFIG.NEW_DATA_PATH, NEW_DATA_STORE
+        )
+BOOKING_DIALOG = BookingDialog(
+    telemetry_client=TELEMETRY_CLIENT,
+    outcome_store=OUTCOME_STORE,
+    new_data_store=NEW_DATA_STORE,
+    max_turns=CONFIG.BOOKING_MAX_TURNS,
+    turn_spill_store=TURN_SPILL_STORE,
+    transcripts=TranscriptStore(CONFIG.BOOKING_TRANSCRIPT_CAPACITY),
+)
+DIALOG = MainDialog(
+    RECOGNIZER,
+    BOOKING_DIALOG,
+    telemetry_client=TELEMETRY_CLIENT,
+    fallback_recognizer=FALLBACK_RECOGNIZER,
+)
+RESOURCES = ResourceRegistry(
+    RESOURCES_DIRECTORY,
+    reload_interval=CONFIG.RESOURCE_RELOAD_INTERVAL,
+)
+# The dialog set is built once, each turn only loads the dialog state into it.
+DIALOGS = DialogRegistry(CONVERSATION_STATE.create_property("DialogState"), DIALOG)
+BOT = DialogAndWelcomeBot(
+    CONVERSATION_STATE,
+    USER_STATE,
+    DIALOG,
+    telemetry_client=TELEMETRY_CLIENT,
+    resources=RESOURCES,
+    dialogs=DIALOGS,
+    turn_lock=TURN_LOCK,
+    metrics_client=TELEMETRY_CLIENT.telemetry_client,
+)
 
 
 # Listen for incoming requests on /api/messages.
 async def messages(req: Request) -> Response:
     # Main bot message handler.
-    if "application/json" in req.headers["Content-Type"]:
-        body = await req.json()
-    else:
+    async with PROFILER.profile("request"):
+        return await process_message(req)
+
+
+async def process_message(req: Request) -> Response:
+    if "application/json" not in req.headers.get("Content-Type", ""):
         return Response(status=HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+    # Chunked bodies are capped by the client_max_size of the application.
+    if req.content_length is not None and req.content_length > CONFIG.MAX_REQUEST_BYTES:
+        return Response(status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+    with span("parse"):
+        try:
+            activity = parse_activity(await req.read())
+        except (ValueError, DeserializationError):
+            return Response(status=HTTPStatus.BAD_REQUEST)
 
-    activity = Activity().deserialize(body)
     auth_header = req.headers["Authorization"] if "Authorization" in req.headers else ""
 
-    response = await ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+    # Authenticated first: the conversation id of a forged activity must not use up
+    # the rate limit of the real conversation.
+    with span("authenticate"):
+        identity = await ADAPTER.authenticate(activity, auth_header)
+
+    if ADMISSION is None:
+        return await process_activity(activity, identity)
+
+    conversation_id = activity.conversation.id if activity.conversation else ""
+    with span("admission"):
+        try:
+            await ADMISSION.acquire(conversation_id)
+        except AdmissionRejected as rejected:
+            return Response(
+                status=rejected.status, headers={"Retry-After": str(rejected.retry_after)}
+            )
+    try:
+        return await process_activity(activity, identity)
+    finally:
+        ADMISSION.release()
+
+
+async def process_activity(activity: Activity, identity: ClaimsIdentity) -> Response:
+    with span("process_activity"):
+        response = await ADAPTER.process_activity_with_identity(
+            activity, identity, BOT.on_turn
+        )
     if response:
         return json_response(data=response.body, status=response.status)
     return Response(status=HTTPStatus.OK)
 
+async def start_write_behind(app: web.Application):
+    await WRITE_BEHIND.start()
+
+
+async def start_key_refresher(app: web.Application):
+    if KEY_REFRESHER is not None:
+        await KEY_REFRESHER.start()
+
+
+async def stop_key_refresher(app: web.Application):
+    if KEY_REFRESHER is not None:
+        await KEY_REFRESHER.stop()
+
+
+async def flush_write_behind(app: web.Application):
+    await WRITE_BEHIND.stop()
+
+
+async def close_outcome_stores(app: web.Application):
+    OUTCOME_STORE.close()
+    NEW_DATA_STORE.close()
+    TURN_SPILL_STORE.close()
+
+
+async def close_storage(app: web.Application):
+    if isinstance(STORAGE, SqliteStorage):
+        STORAGE.close()
+
+
+async def close_telemetry(app: web.Application):
+    if TELEMETRY_QUEUE is not None:
+        TELEMETRY_QUEUE.close()
+
+
+async def close_luis_client(app: web.Application):
+    if LUIS_RECOGNIZER is not None and LUIS_RECOGNIZER.is_configured:
+        await LUIS_RECOGNIZER.close()
+
+
 def init_func(argv):
-    APP = web.Application(middlewares=[bot_telemetry_middleware, aiohttp_error_middleware])
+    APP = web.Application(
+        middlewares=[bot_telemetry_middleware, aiohttp_error_middleware],
+        client_max_size=CONFIG.MAX_REQUEST_BYTES,
+    )
     APP.router.add_post("/api/messages", messages)
+    APP.on_startup.append(start_write_behind)
+    APP.on_startup.append(start_key_refresher)
+    APP.on_shutdown.append(stop_key_refresher)
+    APP.on_shutdown.append(flush_write_behind)
+    APP.on_cleanup.append(close_outcome_stores)
+    APP.on_cleanup.append(close_luis_client)
+    APP.on_cleanup.append(close_storage)
+    APP.on_cleanup.append(close_telemetry)
     return APP
 
 if __name__ == "__main__":
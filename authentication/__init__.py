@@ -0,0 +1,7 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Authentication module."""
+
+from .token_cache import SigningKeyRefresher, ValidatedTokenCache, default_metadata_urls
+
+__all__ = ["SigningKeyRefresher", "ValidatedTokenCache", "default_metadata_urls"]
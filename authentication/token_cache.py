@@ -0,0 +1,181 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Cache of the validated Bot Framework tokens and refresh of their signing keys."""
+import asyncio
+import collections
+import hashlib
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+import aiohttp
+from botframework.connector.auth import (
+    AuthenticationConstants,
+    ChannelValidation,
+    ClaimsIdentity,
+    JwtTokenExtractor,
+)
+
+
+def default_metadata_urls() -> list:
+    """OpenID metadata documents of the tokens sent by the channels and the emulator."""
+    return [
+        ChannelValidation.open_id_metadata_endpoint
+        or AuthenticationConstants.TO_BOT_FROM_CHANNEL_OPEN_ID_METADATA_URL,
+        AuthenticationConstants.TO_BOT_FROM_EMULATOR_OPEN_ID_METADATA_URL,
+    ]
+
+
+class ValidatedTokenCache:
+    """
+    Identities of the validated authorization headers, keyed by a hash of the
+    header, channel and service url, and dropped when the token expires. At most
+    `max_entries` are kept, the least recently used first out.
+    """
+
+    def __init__(self, max_entries: int = 10000, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(auth_header: str, channel_id: str, service_url: str) -> bytes:
+        return hashlib.blake2b(
+            f"{auth_header}\n{channel_id}\n{service_url}".encode("utf-8"), digest_size=16
+        ).digest()
+
+    def get(self, key: bytes) -> Optional[ClaimsIdentity]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        identity, expires_at = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return identity
+
+    def put(self, key: bytes, identity: ClaimsIdentity) -> None:
+        """Keep `identity` until the expiry of its token, tokens without one are not kept."""
+        try:
+            expires_at = float(identity.claims.get("exp"))
+        except (AttributeError, TypeError, ValueError):
+            return
+        if not self.max_entries or expires_at <= self._clock():
+            return
+
+        self._entries[key] = (identity, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SigningKeyRefresher:
+    """
+    Refreshes the signing keys of the OpenID metadata documents every `interval`
+    seconds from a background task, so that token validation always finds fresh
+    keys in the botframework metadata cache and never fetches them itself.
+
+    `refresh_soon` asks for an early refresh, ie after a token signed with an
+    unknown key, at most once every `min_interval` seconds. `on_keys_removed` is
+    called when a key disappears from a document.
+    """
+
+    def __init__(
+        self,
+        metadata_urls: Iterable[str] = None,
+        interval: float = 3600.0,
+        min_interval: float = 60.0,
+        timeout: float = 10.0,
+        on_keys_removed: Callable[[], None] = None,
+    ):
+        self.metadata_urls = list(metadata_urls or default_metadata_urls())
+        self.interval = interval
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.on_keys_removed = on_keys_removed
+
+        self._task: asyncio.Task = None
+        self._wake: asyncio.Event = None
+        self._last_refresh = float("-inf")
+
+        self.refreshes = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        """Load the keys once, then keep refreshing them in the background."""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        await self.refresh_all()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def refresh_soon(self) -> None:
+        if self._wake is not None and time.monotonic() - self._last_refresh >= self.min_interval:
+            self._wake.set()
+
+    async def refresh_all(self) -> None:
+        self._last_refresh = time.monotonic()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            for url in self.metadata_urls:
+                try:
+                    await self.refresh(session, url)
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as error:
+                    # The previous keys stay in use until the next attempt.
+                    self.failures += 1
+                    print(f"[SigningKeyRefresher] {url}: {error!r}", file=sys.stderr)
+
+    async def refresh(self, session: aiohttp.ClientSession, url: str) -> None:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            keys_url = (await response.json(content_type=None))["jwks_uri"]
+        async with session.get(keys_url) as response:
+            response.raise_for_status()
+            keys = (await response.json(content_type=None))["keys"]
+
+        metadata = JwtTokenExtractor.get_open_id_metadata(url)
+        removed = {key.get("kid") for key in metadata.keys} - {key.get("kid") for key in keys}
+        metadata.keys = keys
+        metadata.last_updated = datetime.now()
+        self.refreshes += 1
+        if removed and self.on_keys_removed is not None:
+            self.on_keys_removed()
+
+    async def _run(self) -> None:
+        while True:
+            # asyncio.wait, unlike wait_for, never swallows the cancellation of stop().
+            wake = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait([wake], timeout=self.interval)
+            finally:
+                wake.cancel()
+            self._wake.clear()
+            await self.refresh_all()
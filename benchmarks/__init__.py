@@ -0,0 +1,3 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Benchmarks, run them from the repository root with `python -m benchmarks.<name>`."""
@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Micro-benchmark of the parsing of the activities posted to /api/messages.
+
+    python -m benchmarks.activity_parsing [rounds]
+
+benchmarks/data/activities.json holds payloads in the shapes sent by the
+emulator, Web Chat, Teams and the load test. "baseline" is the former path, the
+standard json decoder followed by the msrest Activity deserializer. "fast" is
+helpers.activity_parser.parse_activity, and "fastRead" also reads the fields the
+bot and the adapter use on every turn, including the timestamp.
+"""
+import json
+import os
+import sys
+import timeit
+
+from botbuilder.schema import Activity
+
+from helpers import activity_parser
+from helpers.activity_parser import parse_activity
+
+PAYLOADS_PATH = os.path.join(os.path.dirname(__file__), "data", "activities.json")
+
+
+def baseline(data: bytes) -> Activity:
+    return Activity().deserialize(json.loads(data))
+
+
+def read_turn_fields(activity: Activity) -> tuple:
+    return (
+        activity.type,
+        activity.text,
+        activity.conversation.id,
+        activity.from_property.id,
+        activity.recipient.id,
+        activity.service_url,
+        activity.channel_id,
+        activity.delivery_mode,
+        activity.timestamp,
+    )
+
+
+def per_activity_us(parse, payloads: list, rounds: int) -> float:
+    elapsed = timeit.timeit(lambda: [parse(data) for data in payloads], number=rounds)
+    return elapsed * 1e6 / (rounds * len(payloads))
+
+
+def main(rounds: int):
+    with open(PAYLOADS_PATH, "rb") as payloads_file:
+        payloads = [json.dumps(body).encode("utf-8") for body in json.load(payloads_file)]
+
+    # Both paths must build the same activities.
+    for data in payloads:
+        assert parse_activity(data).serialize() == baseline(data).serialize()
+
+    slow = per_activity_us(baseline, payloads, rounds)
+    fast = per_activity_us(parse_activity, payloads, rounds)
+    fast_read = per_activity_us(lambda data: read_turn_fields(parse_activity(data)), payloads, rounds)
+    report = {
+        "payloads": len(payloads),
+        "rounds": rounds,
+        "orjson": activity_parser.orjson is not None,
+        "baselineUsPerActivity": slow,
+        "fastUsPerActivity": fast,
+        "fastReadUsPerActivity": fast_read,
+        "speedup": slow / fast,
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,69 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Replay the dates of the retraining data through the DateNormalizer batch API.
+
+    python -m benchmarks.date_normalizer [new_data.json] [repeat]
+
+The dates found in the recorded utterances, plus the LocalRecognizer date samples,
+are normalized `repeat` times with the previous double dateutil parse and with
+DateNormalizer.normalize_many.
+"""
+import json
+import sys
+import time
+
+from dateutil import parser
+
+from helpers.date_normalizer import DateNormalizer
+from recognition.fast_path import DATE_PATTERN
+from recognition.local_recognizer import DATE_SAMPLES, load_new_data_turns
+
+
+def legacy_get_timex(or_date):
+    date = parser.parse(or_date)
+    year, month, day = parser.parse(or_date).strftime("%Y-%m-%d").split("-")
+    if day not in or_date:
+        day = "XX"
+    if date.strftime("%b").lower() not in or_date:
+        month = "XX"
+    if year not in or_date:
+        year = "XXXX"
+    return f"{year}-{month}-{day}"
+
+
+def main(path: str, repeat: int):
+    dates = list(DATE_SAMPLES)
+    for turn in load_new_data_turns(path):
+        dates.extend(match.group(0) for match in DATE_PATTERN.finditer(turn["text"]))
+    batch = dates * repeat
+
+    start = time.perf_counter()
+    for text in batch:
+        try:
+            legacy_get_timex(text)
+        except (ValueError, OverflowError):
+            pass
+    legacy = time.perf_counter() - start
+
+    normalizer = DateNormalizer()
+    start = time.perf_counter()
+    normalizer.normalize_many(batch)
+    batched = time.perf_counter() - start
+
+    report = {
+        "strings": len(batch),
+        "distinct": len(set(dates)),
+        "legacyMs": legacy * 1000,
+        "normalizeManyMs": batched * 1000,
+        "fastPathHits": normalizer.fast_path_hits,
+        "dateutilParses": normalizer.dateutil_parses,
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "new_data.json",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
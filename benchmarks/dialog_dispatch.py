@@ -0,0 +1,150 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Micro-benchmark of the dialog dispatch done on every turn.
+
+    python -m benchmarks.dialog_dispatch [turns]
+
+Each conversation walks the real MainDialog and BookingDialog graph up to the
+date prompt and asks for help, then the next conversation starts. LUIS is
+reported as not configured, so no recognizer runs, the dialog state stays in
+memory instead of going through a storage and the replies go to an adapter that
+drops them. "perTurnSet" builds a DialogSet and a state accessor on every turn,
+as DialogExtensions.run_dialog does, and the first DialogContext of the turn
+gathers the memory scopes of the dialog state manager. "registry" uses the
+DialogRegistry built once by app.py. "setOnly" is the cost of building the
+per-turn set alone.
+"""
+import asyncio
+import json
+import sys
+import time
+
+from botbuilder.core import BotAdapter, StatePropertyAccessor, TurnContext
+from botbuilder.dialogs import DialogExtensions, DialogSet
+from botbuilder.schema import (
+    Activity,
+    ActivityTypes,
+    ChannelAccount,
+    ConversationAccount,
+    ResourceResponse,
+)
+
+from dialogs import BookingDialog, MainDialog
+from helpers.dialog_helper import DialogRegistry
+from storage import OutcomeStore
+
+SCRIPT = ["hi", "Paris", "London", "$500", "help"]
+
+
+class NullAdapter(BotAdapter):
+
+    async def send_activities(self, context, activities):
+        return [ResourceResponse() for _ in activities]
+
+    async def update_activity(self, context, activity):
+        pass
+
+    async def delete_activity(self, context, reference):
+        pass
+
+
+class NullOutcomeStore(OutcomeStore):
+
+    def append(self, outcome: str, record: dict) -> None:
+        pass
+
+    def read(self):
+        return iter(())
+
+
+class NotConfiguredRecognizer:
+    is_configured = False
+
+
+class MemoryAccessor(StatePropertyAccessor):
+    """Dialog state of the single benchmark conversation, never serialized."""
+
+    def __init__(self, holder: dict):
+        self.holder = holder
+
+    async def get(self, turn_context: TurnContext, default_value_or_factory=None):
+        if "state" not in self.holder:
+            self.holder["state"] = default_value_or_factory()
+        return self.holder["state"]
+
+    async def delete(self, turn_context: TurnContext) -> None:
+        self.holder.pop("state", None)
+
+    async def set(self, turn_context: TurnContext, value) -> None:
+        self.holder["state"] = value
+
+
+def main_dialog() -> MainDialog:
+    booking_dialog = BookingDialog(
+        outcome_store=NullOutcomeStore(),
+        new_data_store=NullOutcomeStore(),
+        turn_spill_store=NullOutcomeStore(),
+    )
+    return MainDialog(NotConfiguredRecognizer(), booking_dialog)
+
+
+def activity(text: str) -> Activity:
+    return Activity(
+        type=ActivityTypes.message,
+        text=text,
+        channel_id="benchmark",
+        conversation=ConversationAccount(id="conversation"),
+        from_property=ChannelAccount(id="user"),
+        recipient=ChannelAccount(id="bot"),
+    )
+
+
+async def per_turn_us(run, holder: dict, turns: int) -> float:
+    adapter = NullAdapter()
+    activities = [activity(SCRIPT[index % len(SCRIPT)]) for index in range(turns)]
+    start = time.perf_counter()
+    for index, turn_activity in enumerate(activities):
+        if index % len(SCRIPT) == 0:
+            holder.clear()
+        await run(TurnContext(adapter, turn_activity))
+    return (time.perf_counter() - start) * 1e6 / turns
+
+
+async def run_benchmark(turns: int) -> dict:
+    dialog = main_dialog()
+
+    holder = {}
+
+    async def per_turn_set(turn_context: TurnContext):
+        await DialogExtensions.run_dialog(dialog, turn_context, MemoryAccessor(holder))
+
+    registry = DialogRegistry(MemoryAccessor(holder), dialog)
+
+    # Warm up both paths, ie the dialog set versions and the step names.
+    await per_turn_us(per_turn_set, holder, len(SCRIPT))
+    await per_turn_us(registry.run, holder, len(SCRIPT))
+
+    per_turn = await per_turn_us(per_turn_set, holder, turns)
+    shared = await per_turn_us(registry.run, holder, turns)
+
+    start = time.perf_counter()
+    for _ in range(turns):
+        DialogSet(MemoryAccessor(holder)).add(dialog)
+    set_only = (time.perf_counter() - start) * 1e6 / turns
+
+    return {
+        "turns": turns,
+        "perTurnSetUsPerTurn": per_turn,
+        "registryUsPerTurn": shared,
+        "savedUsPerTurn": per_turn - shared,
+        "setOnlyUsPerTurn": set_only,
+    }
+
+
+def main(turns: int):
+    print(json.dumps(asyncio.run(run_benchmark(turns)), indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
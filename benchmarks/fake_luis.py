@@ -0,0 +1,63 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Local LUIS v2 prediction endpoint replaying recorded responses."""
+import asyncio
+import json
+
+from aiohttp import web
+
+RESPONSES_PATH = "benchmarks/data/luis_responses.json"
+
+
+class FakeLuis:
+    """
+    Answers the LUIS v2 prediction requests with the response recorded for the
+    utterance, or with a NoneIntent prediction, after `latency` seconds.
+    """
+
+    def __init__(self, responses: dict, latency: float = 0.05):
+        self.responses = {utterance.lower(): response for utterance, response in responses.items()}
+        self.latency = latency
+        self.requests = 0
+        self.misses = 0
+        self._runner: web.AppRunner = None
+        self.url = None
+
+    @classmethod
+    def from_file(cls, path: str = RESPONSES_PATH, latency: float = 0.05) -> "FakeLuis":
+        with open(path, encoding="utf-8") as json_file:
+            return cls(json.load(json_file), latency)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/luis/v2.0/apps/{app_id}", self.predict)
+        app.router.add_get("/luis/v2.0/apps/{app_id}", self.predict)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def predict(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if request.method == "POST":
+            utterance = await request.json()
+        else:
+            utterance = request.query.get("q", "")
+
+        await asyncio.sleep(self.latency)
+        response = self.responses.get(utterance.lower())
+        if response is None:
+            self.misses += 1
+            response = {
+                "query": utterance,
+                "topScoringIntent": {"intent": "NoneIntent", "score": 0.9},
+                "entities": [],
+            }
+        return web.json_response(dict(response, query=utterance))
@@ -0,0 +1,279 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+End-to-end load test of one bot worker against a local LUIS stub.
+
+    python -m benchmarks.load_test [--users 20] [--conversations 200]
+        [--luis-latency 0.05] [--output PATH] [--compare PATH]
+
+The bot is started in a child process from app.init_func with LUIS pointed at a
+FakeLuis replaying benchmarks/data/luis_responses.json. Each simulated user walks
+whole bookings, one conversation after the other: half of them answer every
+BookingDialog prompt, the other half start with an utterance resolved by LUIS that
+fills the cities. Activities are posted with the expectReplies delivery mode, so
+that the replies come back in the HTTP response and no connector is needed. Bot
+settings can be overridden with --env, ie --env LuisCacheSize=0 to send every LUIS
+utterance to the stub.
+
+The report gives the throughput and the p50/p95/p99 latency of each dialog step.
+It is printed and saved as JSON, by default under benchmarks/results/ with the
+current commit in its name, so that runs can be compared with --compare.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import aiohttp
+
+from .fake_luis import FakeLuis
+
+APP_ID = "b31aeaf3-3511-495b-a07f-571fc873214b"
+APP_KEY = "0d2a8a1c-7b7f-4d1a-9d3e-6c1c2c0e0a11"
+
+# (step, user text, text expected in the replies)
+TAIL = [
+    ("budget", "$500", "departure date"),
+    ("str_date", "23 aug 2022", "return date"),
+    ("end_date", "30 aug 2022", "confirm"),
+    ("confirm", "yes", "booked"),
+]
+SCRIPTS = {
+    "prompts": [
+        ("intro", "hi", "What can I help you with today?"),
+        ("act", "book a flight", "From what city"),
+        ("or_city", "Paris", "To what city"),
+        ("dst_city", "London", "budget"),
+    ] + TAIL,
+    "luis": [
+        ("intro", "hi", "What can I help you with today?"),
+        ("act", "I want to book a flight from Marseille to Paris", "budget"),
+    ] + TAIL,
+}
+
+
+def percentile(values: list, rank: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(rank * len(values)))]
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_bot(port: int, environment: dict):
+    """Child process: configure the bot through its environment and serve it."""
+    os.environ.update(environment)
+    from aiohttp import web  # pylint: disable=import-outside-toplevel
+    import app  # pylint: disable=import-outside-toplevel
+
+    web.run_app(app.init_func(None), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+async def wait_for_port(port: int, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+class LoadTest:
+    def __init__(self, bot_url: str, users: int, conversations: int):
+        self.bot_url = bot_url
+        self.users = users
+        self.conversations = conversations
+        self.latencies = {}
+        self.errors = {}
+        self.samples = []
+        self._started = 0
+
+    async def run(self) -> float:
+        connector = aiohttp.TCPConnector(limit=self.users)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            start = time.perf_counter()
+            await asyncio.gather(*[self._user(session, index) for index in range(self.users)])
+            return time.perf_counter() - start
+
+    async def _user(self, session: aiohttp.ClientSession, user: int):
+        while self._started < self.conversations:
+            script = "prompts" if self._started % 2 == 0 else "luis"
+            self._started += 1
+            conversation_id = str(uuid.uuid4())
+            for step, text, expected in SCRIPTS[script]:
+                if not await self._turn(session, user, conversation_id, step, text, expected):
+                    break
+
+    async def _turn(self, session, user, conversation_id, step, text, expected) -> bool:
+        activity = {
+            "type": "message",
+            "id": str(uuid.uuid4()),
+            "channelId": "loadtest",
+            "serviceUrl": "http://127.0.0.1:9",
+            "deliveryMode": "expectReplies",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "conversation": {"id": conversation_id},
+            "from": {"id": f"user-{user}", "name": f"user {user}"},
+            "recipient": {"id": "bot", "name": "bot"},
+            "text": text,
+        }
+
+        start = time.perf_counter()
+        async with session.post(f"{self.bot_url}/api/messages", json=activity) as response:
+            body = await response.json() if response.status == 200 else {}
+        self.latencies.setdefault(step, []).append((time.perf_counter() - start) * 1000)
+
+        replies = " ".join(
+            reply.get("text") or "" for reply in body.get("activities", [])
+        )
+        if expected.lower() in replies.lower():
+            return True
+
+        self.errors[step] = self.errors.get(step, 0) + 1
+        if len(self.samples) < 5:
+            self.samples.append({"step": step, "status": response.status, "replies": replies})
+        return False
+
+    def report(self, elapsed: float) -> dict:
+        turns = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "turns": turns,
+            "elapsedSeconds": elapsed,
+            "turnsPerSecond": turns / elapsed,
+            "conversationsPerSecond": self.conversations / elapsed,
+            "errors": sum(self.errors.values()),
+            "errorSamples": self.samples,
+            "steps": {
+                step: {
+                    "count": len(latencies),
+                    "errors": self.errors.get(step, 0),
+                    "p50Ms": statistics.median(latencies),
+                    "p95Ms": percentile(latencies, 0.95),
+                    "p99Ms": percentile(latencies, 0.99),
+                }
+                for step, latencies in self.latencies.items()
+            },
+        }
+
+
+def bot_environment(luis_url: str, directory: str, overrides: list = ()) -> dict:
+    """Bot settings pointing at the LUIS stub, with the files under `directory`."""
+    environment = {
+        "LuisAppId": APP_ID,
+        "LuisAPIKey": APP_KEY,
+        "LuisAPIHostName": luis_url,
+        "AppInsightsInstrumentationKey": "",
+        "INSIGHTS_KEY": "",
+        "MicrosoftAppId": "",
+        "MicrosoftAppPassword": "",
+        "OutcomeStoreDir": os.path.join(directory, "outcomes"),
+        "WriteBehindSpillPath": os.path.join(directory, "write_behind.spill"),
+    }
+    environment.update(dict(variable.split("=", 1) for variable in overrides))
+    return environment
+
+
+async def run(args, directory: str) -> dict:
+    luis = FakeLuis.from_file(latency=args.luis_latency)
+    luis_url = await luis.start()
+
+    port = free_port()
+    environment = bot_environment(luis_url, directory, args.env)
+
+    bot = multiprocessing.get_context("spawn").Process(
+        target=serve_bot, args=(port, environment), daemon=True
+    )
+    bot.start()
+    try:
+        await wait_for_port(port)
+        load_test = LoadTest(f"http://127.0.0.1:{port}", args.users, args.conversations)
+        elapsed = await load_test.run()
+    finally:
+        bot.terminate()
+        bot.join()
+        await luis.stop()
+
+    report = load_test.report(elapsed)
+    report["luisRequests"] = luis.requests
+    return report
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Ratios of this run over the baseline, above 1 for throughput is better."""
+    return {
+        "baselineCommit": baseline.get("commit"),
+        "turnsPerSecond": report["turnsPerSecond"] / baseline["turnsPerSecond"],
+        "p95Ms": {
+            step: stats["p95Ms"] / baseline["steps"][step]["p95Ms"]
+            for step, stats in report["steps"].items()
+            if step in baseline.get("steps", {})
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent conversations")
+    parser.add_argument("--conversations", type=int, default=200, help="bookings to run")
+    parser.add_argument("--luis-latency", type=float, default=0.05, help="seconds")
+    parser.add_argument("--env", action="append", default=[], help="NAME=VALUE for the bot")
+    parser.add_argument("--output", help="JSON report path")
+    parser.add_argument("--compare", help="previous JSON report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = asyncio.run(run(args, directory))
+
+    commit = current_commit()
+    report = dict(
+        {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "parameters": {
+                "users": args.users,
+                "conversations": args.conversations,
+                "luisLatency": args.luis_latency,
+                "env": args.env,
+            },
+        },
+        **report,
+    )
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as json_file:
+            report["comparison"] = compare(report, json.load(json_file))
+
+    output = args.output or os.path.join("benchmarks", "results", f"load_test-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as json_file:
+        json.dump(report, json_file, indent=4)
+    print(json.dumps(report, indent=4))
+    print(f"Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
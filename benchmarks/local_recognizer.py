@@ -0,0 +1,94 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Compare the LocalRecognizer with recorded LUIS responses.
+
+    python -m benchmarks.local_recognizer [benchmarks/data/luis_responses.json]
+
+The recognizer is trained without the examples containing the scored utterances, so
+that it is not scored on what it learnt. LUIS latency is only reported for responses
+recorded with a `latencyMs` field.
+
+The bundled responses were not recorded: LUIS was not reachable when they were
+written. They reproduce the LUIS answers asserted in tests/test_bot.py and the
+booking logged in performances.json, without latency, so they only give a rough
+accuracy on four utterances. Record real ones with benchmarks.record_luis, which
+stores the latency of each response, and pass the file as the argument.
+"""
+import json
+import statistics
+import sys
+import time
+
+from config import DefaultConfig
+from recognition import LocalRecognizer
+
+REPEAT = 200
+
+
+def percentile(values: list, rank: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(rank * len(values)))]
+
+
+def expected_entities(response: dict) -> dict:
+    entities = {}
+    for entity in response.get("entities", []):
+        entities.setdefault(entity["type"], []).append(entity["entity"])
+    return entities
+
+
+def normalize(values: list) -> list:
+    # LUIS tokenizes what it returns ("$ 500", "london ,"), compare on the characters only.
+    return ["".join(char for char in value.lower() if char.isalnum()) for value in values]
+
+
+def main(responses_path: str):
+    config = DefaultConfig()
+    with open(responses_path, encoding="utf-8") as json_file:
+        responses = json.load(json_file)
+
+    start = time.perf_counter()
+    recognizer = LocalRecognizer.from_sources(
+        config.LUIS_MODEL_PATH, config.NEW_DATA_PATH, held_out=responses
+    )
+    training_ms = (time.perf_counter() - start) * 1000
+
+    intent_hits, entity_hits, entity_total = 0, 0, 0
+    local_latencies, luis_latencies = [], []
+    for utterance, response in responses.items():
+        result = recognizer.predict(utterance)
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            recognizer.predict(utterance)
+            local_latencies.append((time.perf_counter() - start) * 1000)
+        if "latencyMs" in response:
+            luis_latencies.append(response["latencyMs"])
+
+        if next(iter(result.intents)) == response["topScoringIntent"]["intent"]:
+            intent_hits += 1
+        for name, values in expected_entities(response).items():
+            entity_total += 1
+            if normalize(result.entities.get(name, [])) == normalize(values):
+                entity_hits += 1
+
+    report = {
+        "utterances": len(responses),
+        "recordedLatencies": len(luis_latencies),
+        "trainingMs": training_ms,
+        "intentAccuracy": intent_hits / len(responses),
+        "entityAccuracy": entity_hits / entity_total if entity_total else None,
+        "localLatencyMs": {
+            "p50": statistics.median(local_latencies),
+            "p99": percentile(local_latencies, 0.99),
+        },
+        "luisLatencyMs": {
+            "p50": statistics.median(luis_latencies),
+            "p99": percentile(luis_latencies, 0.99),
+        } if luis_latencies else None,
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "benchmarks/data/luis_responses.json")
@@ -0,0 +1,55 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Record LUIS v2 predictions for a list of utterances.
+
+    python -m benchmarks.record_luis utterances.txt [benchmarks/data/luis_responses.json]
+
+Each response is stored under its utterance together with the observed latency, so
+that the benchmarks can replay them without the LUIS endpoint.
+"""
+import json
+import os
+import sys
+import time
+
+import requests
+
+from config import DefaultConfig
+from flight_booking_recognizer import luis_endpoint
+
+
+def main(utterances_path: str, output_path: str):
+    config = DefaultConfig()
+    endpoint = (
+        f"{luis_endpoint(config.LUIS_API_HOST_NAME)}/luis/v2.0/apps/{config.LUIS_APP_ID}"
+    )
+
+    responses = {}
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as json_file:
+            responses = json.load(json_file)
+
+    with open(utterances_path, encoding="utf-8") as utterances:
+        for utterance in (line.strip() for line in utterances):
+            if not utterance:
+                continue
+            start = time.perf_counter()
+            response = requests.get(
+                endpoint,
+                params={"subscription-key": config.LUIS_API_KEY, "q": utterance, "log": "false"},
+            )
+            response.raise_for_status()
+            prediction = response.json()
+            prediction["latencyMs"] = (time.perf_counter() - start) * 1000
+            responses[utterance] = prediction
+
+    with open(output_path, "w", encoding="utf-8") as json_file:
+        json.dump(responses, json_file, indent=4)
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1],
+        sys.argv[2] if len(sys.argv) > 2 else "benchmarks/data/luis_responses.json",
+    )
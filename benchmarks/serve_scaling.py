@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Throughput of serve.py for an increasing number of worker processes.
+
+    python -m benchmarks.serve_scaling [--workers 1,2,4] [--users 40]
+        [--conversations 400] [--luis-latency 0.01] [--output PATH]
+
+For each worker count, serve.py is started with the sqlite state storage and LUIS
+pointed at a FakeLuis, and the bookings of benchmarks.load_test are replayed against
+it. The report gives the turns per second of each run, the speedup over the first
+one and the scaling efficiency (speedup / workers), next to the number of CPUs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from .fake_luis import FakeLuis
+from .load_test import LoadTest, bot_environment, current_commit, free_port, wait_for_port
+
+
+async def measure(args, workers: int, luis_url: str, directory: str) -> dict:
+    port = free_port()
+    environment = dict(
+        os.environ,
+        **bot_environment(luis_url, directory, args.env),
+        StorageBackend="sqlite",
+        StoragePath=os.path.join(directory, f"state-{workers}.db"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port)],
+        env=environment,
+    )
+    try:
+        await wait_for_port(port)
+        load_test = LoadTest(f"http://127.0.0.1:{port}", args.users, args.conversations)
+        elapsed = await load_test.run()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    report = load_test.report(elapsed)
+    return {
+        "workers": workers,
+        "turnsPerSecond": report["turnsPerSecond"],
+        "errors": report["errors"],
+        "p95Ms": max(step["p95Ms"] for step in report["steps"].values()),
+    }
+
+
+async def run(args) -> list:
+    luis = FakeLuis.from_file(latency=args.luis_latency)
+    luis_url = await luis.start()
+    runs = []
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as directory:
+                runs.append(await measure(args, workers, luis_url, directory))
+    finally:
+        await luis.stop()
+
+    baseline = runs[0]
+    for result in runs:
+        result["speedup"] = result["turnsPerSecond"] / baseline["turnsPerSecond"]
+        result["efficiency"] = result["speedup"] * baseline["workers"] / result["workers"]
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    parser.add_argument("--users", type=int, default=40, help="concurrent conversations")
+    parser.add_argument("--conversations", type=int, default=400, help="bookings per run")
+    parser.add_argument("--luis-latency", type=float, default=0.01, help="seconds")
+    parser.add_argument("--env", action="append", default=[], help="NAME=VALUE for the bot")
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+    args.workers = [int(workers) for workers in args.workers.split(",")]
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "users": args.users,
+            "conversations": args.conversations,
+            "luisLatency": args.luis_latency,
+            "env": args.env,
+        },
+        "runs": asyncio.run(run(args)),
+    }
+
+    output = args.output or os.path.join("benchmarks", "results", f"serve_scaling-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as json_file:
+        json.dump(report, json_file, indent=4)
+    print(json.dumps(report, indent=4))
+    print(f"Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
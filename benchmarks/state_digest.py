@@ -0,0 +1,51 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Micro-benchmark of the change detection of the conversation state.
+
+    python -m benchmarks.state_digest [states] [turns]
+
+ConversationState hashes the state once when it is loaded and once more in each
+save_changes to tell whether it changed. "jsonpickle" is the botbuilder hash,
+the str of the jsonpickle flattening, "digest" the pickle blake2b digest of the
+dirty tracking states. Both hash the dialog stack of a booking waiting for its
+confirmation, as in benchmarks.state_size.
+"""
+import json
+import sys
+import timeit
+
+from botbuilder.core.bot_state import CachedBotState
+
+from benchmarks.state_size import conversation_state
+from config import DefaultConfig
+from storage.dirty_state import _DigestCachedBotState
+
+
+def per_state_us(cached_state: CachedBotState, states: list) -> float:
+    elapsed = timeit.timeit(
+        lambda: [cached_state.compute_hash(state) for state in states], number=1
+    )
+    return elapsed * 1e6 / len(states)
+
+
+def main(states: int, turns: int):
+    conversations = [
+        conversation_state(turns, DefaultConfig.BOOKING_MAX_TURNS) for _ in range(states)
+    ]
+    jsonpickle = per_state_us(CachedBotState(), conversations)
+    digest = per_state_us(_DigestCachedBotState(), conversations)
+    report = {
+        "states": states,
+        "turns": turns,
+        "jsonpickleUsPerHash": jsonpickle,
+        "digestUsPerHash": digest,
+        # Two hashes per turn: on load and on save.
+        "savedUsPerTurn": (jsonpickle - digest) * 2,
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    ARGS = [int(arg) for arg in sys.argv[1:3]]
+    main(*(ARGS + [500, 40][len(ARGS):]))
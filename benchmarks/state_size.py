@@ -0,0 +1,128 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Measure the size and the save/load time of the conversation state.
+
+    python -m benchmarks.state_size [conversations] [turns]
+
+Each conversation holds the dialog stack of a booking waiting for its confirmation,
+after `turns` prompts and answers. "before" is the plain jsonpickle JSON with every
+turn kept, "after" is the StateSerializer encoding with BookingDetails capped at
+DefaultConfig.BOOKING_MAX_TURNS turns. Both are saved to and loaded from a
+SqliteStorage, the way ConversationState.save_changes and load use it.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from botbuilder.dialogs import DialogInstance, DialogState
+from jsonpickle.pickler import Pickler
+from jsonpickle.unpickler import Unpickler
+
+from booking_details import BookingDetails
+from config import DefaultConfig
+from storage import SqliteStorage, StateSerializer
+
+
+class JsonSerializer:
+    """The encoding used before StateSerializer, version 0 of the format."""
+
+    @staticmethod
+    def dumps(item: object) -> bytes:
+        return json.dumps(Pickler().flatten(item)).encode("utf-8")
+
+    @staticmethod
+    def loads(data: bytes) -> object:
+        return Unpickler().restore(json.loads(data))
+
+
+def conversation_state(turns: int, max_turns: int) -> dict:
+    details = BookingDetails(
+        dst_city="New York",
+        or_city="Paris",
+        budget="$ 500",
+        str_date="2022-08-23",
+        end_date="2022-08-30",
+        turns=[],
+    )
+    for index in range(turns):
+        details.add_turn(
+            f"What is the departure date? (reprompt {index})" if index % 2
+            else f"I want to leave on the {index % 28 + 1} of august 2022",
+            max_turns,
+        )
+
+    def waterfall(step_index: int, options) -> DialogInstance:
+        return DialogInstance(
+            "WaterfallDialog" if options is details else "WFDialog",
+            {
+                "options": options,
+                "values": {"instanceId": str(uuid.uuid4())},
+                "stepIndex": step_index,
+            },
+        )
+
+    booking = DialogInstance(
+        "BookingDialog",
+        {"dialogs": DialogState([
+            DialogInstance("ConfirmPrompt", {"options": {"prompt": "Please confirm"}, "state": {}}),
+            waterfall(5, details),
+        ])},
+    )
+    main = DialogInstance(
+        "MainDialog",
+        {"dialogs": DialogState([booking, waterfall(1, None)])},
+    )
+    return {"DialogState": DialogState([main])}
+
+
+async def measure(serializer, states: dict) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SqliteStorage(os.path.join(directory, "state.db"), serializer=serializer)
+
+        start = time.perf_counter()
+        for key, state in states.items():
+            await storage.write({key: state})
+        save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in states:
+            await storage.read([key])
+        load = time.perf_counter() - start
+
+        encoded = sum(len(serializer.dumps(state)) for state in states.values())
+        storage.close()
+
+    return {
+        "bytesPerConversation": encoded / len(states),
+        "saveMs": save * 1000 / len(states),
+        "loadMs": load * 1000 / len(states),
+    }
+
+
+def main(conversations: int, turns: int):
+    max_turns = DefaultConfig.BOOKING_MAX_TURNS
+    before = {
+        f"conversation/{index}": conversation_state(turns, 0) for index in range(conversations)
+    }
+    after = {
+        f"conversation/{index}": conversation_state(turns, max_turns) for index in range(conversations)
+    }
+
+    report = {
+        "conversations": conversations,
+        "turns": turns,
+        "maxTurns": max_turns,
+        "before": asyncio.run(measure(JsonSerializer(), before)),
+        "after": asyncio.run(measure(StateSerializer(), after)),
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    ARGS = [int(arg) for arg in sys.argv[1:3]]
+    main(*(ARGS + [500, 40][len(ARGS):]))
@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Load test several worker processes sharing one SqliteStorage file.
+
+    python -m benchmarks.storage_load [workers] [conversations] [turns]
+
+Every worker plays `turns` turns on each of the shared conversations, a turn being a
+read followed by a write guarded by the e_tag read, retried on conflict, the way
+ConversationState loads and saves the dialog state. The run fails if an update is
+lost: each conversation must end with `workers * turns` turns recorded.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from storage import SqliteStorage
+
+
+def percentile(values: list, rank: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(rank * len(values)))]
+
+
+async def play(path: str, worker: int, conversations: int, turns: int) -> dict:
+    storage = SqliteStorage(path, batch_delay=0.002)
+    latencies = []
+    conflicts = 0
+
+    async def conversation(index: int):
+        nonlocal conflicts
+        key = f"emulator/conversations/{index}/"
+        for turn in range(turns):
+            while True:
+                start = time.perf_counter()
+                state = (await storage.read([key])).get(key) or {"turns": []}
+                state["turns"].append(f"worker {worker} turn {turn}")
+                try:
+                    await storage.write({key: state})
+                except KeyError:
+                    conflicts += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                break
+
+    await asyncio.gather(*[conversation(index) for index in range(conversations)])
+    storage.close()
+    return {
+        "latencies": latencies,
+        "conflicts": conflicts,
+        "batches": storage.batches,
+        "operations": storage.operations,
+    }
+
+
+def run_worker(path: str, worker: int, conversations: int, turns: int, results):
+    results.put(asyncio.run(play(path, worker, conversations, turns)))
+
+
+def main(workers: int, conversations: int, turns: int):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.db")
+        # Create the schema once instead of racing on it.
+        asyncio.run(SqliteStorage(path).read(["warmup"]))
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(path, worker, conversations, turns, results))
+            for worker in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        keys = [f"emulator/conversations/{index}/" for index in range(conversations)]
+        stored = asyncio.run(SqliteStorage(path).read(keys))
+        lost = sum(workers * turns - len(stored[key]["turns"]) for key in keys)
+
+    latencies = [latency for report in reports for latency in report["latencies"]]
+    operations = sum(report["operations"] for report in reports)
+    batches = sum(report["batches"] for report in reports)
+    report = {
+        "workers": workers,
+        "conversations": conversations,
+        "turns": len(latencies),
+        "elapsedSeconds": elapsed,
+        "turnsPerSecond": len(latencies) / elapsed,
+        "turnLatencyMs": {
+            "p50": statistics.median(latencies),
+            "p99": percentile(latencies, 0.99),
+        },
+        "conflicts": sum(report["conflicts"] for report in reports),
+        "operationsPerBatch": operations / batches,
+        "lostUpdates": lost,
+    }
+    print(json.dumps(report, indent=4))
+    if lost:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    ARGS = [int(arg) for arg in sys.argv[1:4]]
+    main(*(ARGS + [4, 20, 25][len(ARGS):]))
@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Micro-benchmark of the TIMEX parsing done by the date resolution steps.
+
+    python -m benchmarks.timex_resolution [turns]
+
+One turn of the booking date steps parses the TIMEX of the departure and return
+dates in BookingDialog.is_ambiguous, twice in DateResolverDialog.initial_step and
+once in DateResolverDialog.datetime_prompt_validator. The report compares a fresh
+Timex per call with the shared resolve_timex cache.
+"""
+import json
+import sys
+import timeit
+
+from datatypes_date_time.timex import Timex
+
+from helpers.timex_cache import resolve_timex
+
+TIMEXES = ["2022-08-23", "2022-08-30", "XXXX-08-23", "2022-09-15", "XXXX-XX-12"]
+
+
+def uncached_turn(str_date: str, end_date: str) -> tuple:
+    return (
+        "definite" not in Timex(str_date).types,
+        "definite" not in Timex(end_date).types,
+        "definite" not in Timex(end_date).types,
+        "definite" in Timex(end_date).types,
+        "definite" in Timex(end_date).types,
+    )
+
+
+def cached_turn(str_date: str, end_date: str) -> tuple:
+    return (
+        not resolve_timex(str_date).definite,
+        not resolve_timex(end_date).definite,
+        not resolve_timex(end_date).definite,
+        resolve_timex(end_date).definite,
+        resolve_timex(end_date).definite,
+    )
+
+
+def per_turn_us(turn, turns: int) -> float:
+    pairs = [(TIMEXES[index % len(TIMEXES)], TIMEXES[(index + 1) % len(TIMEXES)]) for index in range(turns)]
+    elapsed = timeit.timeit(lambda: [turn(*pair) for pair in pairs], number=1)
+    return elapsed * 1e6 / turns
+
+
+def main(turns: int):
+    uncached = per_turn_us(uncached_turn, turns)
+    cached = per_turn_us(cached_turn, turns)
+    report = {
+        "turns": turns,
+        "uncachedUsPerTurn": uncached,
+        "cachedUsPerTurn": cached,
+        "savedUsPerTurn": uncached - cached,
+        "cache": resolve_timex.cache_info()._asdict(),
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
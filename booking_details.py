@@ -1,8 +1,20 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
+from typing import List
 
 
 class BookingDetails:
+    # Saved with the dialog stack on every turn, slots keep the instances small.
+    __slots__ = (
+        "dst_city",
+        "or_city",
+        "budget",
+        "str_date",
+        "end_date",
+        "turns",
+        "spilled_turns",
+    )
+
     def __init__(
         self,
         dst_city: str = None,
@@ -10,12 +22,38 @@ class BookingDetails:
         budget: str = None,
         str_date: str = None,
         end_date: str = None,
-        turns: list = []
+        turns: list = None,
     ):
         self.dst_city = dst_city
         self.or_city = or_city
         self.budget = budget
         self.str_date = str_date
         self.end_date = end_date
-        self.turns = turns
+        self.turns = turns if turns is not None else []
+        self.spilled_turns = 0
+
+    def add_turn(self, text: str, max_turns: int = 0) -> List[str]:
+        """
+        Record a prompt or an answer. When `max_turns` is set, the oldest turns beyond it
+        are removed and returned so that the caller can spill them.
+        """
+        self.turns.append(text)
+        overflow = len(self.turns) - max_turns if max_turns else 0
+        if overflow <= 0:
+            return []
+
+        spilled = self.turns[:overflow]
+        del self.turns[:overflow]
+        self.spilled_turns += overflow
+        return spilled
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in BookingDetails.__slots__}
+
+    def __getstate__(self) -> dict:
+        return self.to_dict()
 
+    def __setstate__(self, state: dict):
+        self.spilled_turns = 0
+        for name, value in state.items():
+            setattr(self, name, value)
@@ -4,5 +4,13 @@
 
 from .dialog_bot import DialogBot
 from .dialog_and_welcome_bot import DialogAndWelcomeBot
+from .outbound_buffer import OutboundBufferMiddleware, coalesce_activities
+from .resource_registry import ResourceRegistry
 
-__all__ = ["DialogBot", "DialogAndWelcomeBot"]
+__all__ = [
+    "DialogBot",
+    "DialogAndWelcomeBot",
+    "OutboundBufferMiddleware",
+    "coalesce_activities",
+    "ResourceRegistry",
+]
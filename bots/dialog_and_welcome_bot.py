@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 """Main dialog to welcome users."""
-import json
 import os.path
 
 from typing import List
@@ -14,7 +13,12 @@ from botbuilder.core import (
 )
 from botbuilder.schema import Activity, Attachment, ChannelAccount
 from helpers.activity_helper import create_activity_reply
+from helpers.dialog_helper import DialogRegistry
+from storage import KeyedLock
 from .dialog_bot import DialogBot
+from .resource_registry import ResourceRegistry
+
+RESOURCES_DIRECTORY = os.path.join(os.path.abspath(os.path.dirname(__file__)), "resources")
 
 
 class DialogAndWelcomeBot(DialogBot):
@@ -26,11 +30,22 @@ class DialogAndWelcomeBot(DialogBot):
         user_state: UserState,
         dialog: Dialog,
         telemetry_client: BotTelemetryClient,
+        resources: ResourceRegistry = None,
+        dialogs: DialogRegistry = None,
+        turn_lock: KeyedLock = None,
+        metrics_client: BotTelemetryClient = None,
     ):
         super(DialogAndWelcomeBot, self).__init__(
-            conversation_state, user_state, dialog, telemetry_client
+            conversation_state,
+            user_state,
+            dialog,
+            telemetry_client,
+            dialogs,
+            turn_lock,
+            metrics_client,
         )
         self.telemetry_client = telemetry_client
+        self.resources = resources or ResourceRegistry(RESOURCES_DIRECTORY)
 
     async def on_members_added_activity(
         self, members_added: List[ChannelAccount], turn_context: TurnContext
@@ -50,14 +65,7 @@ class DialogAndWelcomeBot(DialogBot):
         response.attachments = [attachment]
         return response
 
-    # Load attachment from file.
+    # Served from the registry, the card file is only read again when it changes.
     def create_adaptive_card_attachment(self):
         """Create an adaptive card."""
-        relative_path = os.path.abspath(os.path.dirname(__file__))
-        path = os.path.join(relative_path, "resources/welcomeCard.json")
-        with open(path) as card_file:
-            card = json.load(card_file)
-
-        return Attachment(
-            content_type="application/vnd.microsoft.card.adaptive", content=card
-        )
+        return self.resources.attachment("welcomeCard")
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 """Implements bot Activity handler."""
+from typing import Dict
 
 from botbuilder.core import (
     ActivityHandler,
@@ -10,8 +11,10 @@ from botbuilder.core import (
     BotTelemetryClient,
     NullTelemetryClient,
 )
-from botbuilder.dialogs import Dialog, DialogExtensions
-from helpers.dialog_helper import DialogHelper
+from botbuilder.dialogs import Dialog
+from helpers.dialog_helper import DialogRegistry
+from storage import STATE_SAVES_KEY, KeyedLock
+from telemetry import MetricsReporter
 
 
 class DialogBot(ActivityHandler):
@@ -23,6 +26,9 @@ class DialogBot(ActivityHandler):
         user_state: UserState,
         dialog: Dialog,
         telemetry_client: BotTelemetryClient,
+        dialogs: DialogRegistry = None,
+        turn_lock: KeyedLock = None,
+        metrics_client: BotTelemetryClient = None,
     ):
         if conversation_state is None:
             raise Exception(
@@ -37,18 +43,53 @@ class DialogBot(ActivityHandler):
         self.user_state = user_state
         self.dialog = dialog
         self.telemetry_client = telemetry_client
+        # Built once, the turns only bind their conversation state.
+        self.dialogs = dialogs or DialogRegistry(
+            conversation_state.create_property("DialogState"), dialog
+        )
+        # With a lock, the turns of a conversation run one at a time, from loading its
+        # state to saving it, instead of racing on the storage e_tag.
+        self.turn_lock = turn_lock
 
-    async def on_message_activity(self, turn_context: TurnContext):
-        await DialogExtensions.run_dialog(
-            self.dialog,
-            turn_context,
-            self.conversation_state.create_property("DialogState"),
+        # Written and skipped saves, counted by the dirty tracking states. They are sent
+        # periodically, from inside the turns: to a client which does not sample them
+        # when there is one.
+        self.state_writes = 0
+        self.state_skipped_writes = 0
+        self._saves_reporter = MetricsReporter(
+            "StateSaves", self.metrics, metrics_client or self.telemetry_client
         )
 
+    def metrics(self) -> Dict[str, float]:
+        return {"written": self.state_writes, "skipped": self.state_skipped_writes}
+
+    async def on_turn(self, turn_context: TurnContext):
+        activity = turn_context.activity
+        if (
+            self.turn_lock is None
+            or not activity.channel_id
+            or activity.conversation is None
+            or not activity.conversation.id
+        ):
+            await super(DialogBot, self).on_turn(turn_context)
+            return
+        # Same key as the conversation state storage.
+        async with self.turn_lock(self.conversation_state.get_storage_key(turn_context)):
+            await super(DialogBot, self).on_turn(turn_context)
+
+    async def on_message_activity(self, turn_context: TurnContext):
+        await self.dialogs.run(turn_context)
+
         # Save any state changes that might have occured during the turn.
         await self.conversation_state.save_changes(turn_context, False)
         await self.user_state.save_changes(turn_context, False)
 
+        saves = turn_context.turn_state.get(STATE_SAVES_KEY)
+        if saves:
+            self.state_writes += saves["written"]
+            self.state_skipped_writes += saves["skipped"]
+            self._saves_reporter.report()
+
     @property
     def telemetry_client(self) -> BotTelemetryClient:
         """
@@ -0,0 +1,151 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Middleware sending the outgoing activities of a turn together at its end."""
+import copy
+from typing import Awaitable, Callable, Dict, List
+
+from botbuilder.core import BotTelemetryClient, Middleware, TurnContext
+from botbuilder.schema import Activity, ActivityTypes, DeliveryModes
+
+from telemetry import MetricsReporter, span
+
+# Activities held until the end of the turn, the others flush the buffer first.
+_BUFFERED_TYPES = {ActivityTypes.message, ActivityTypes.trace}
+
+
+def coalesce_activities(activities: List[Activity]) -> List[Activity]:
+    """
+    Merge each run of consecutive plain text messages into one message, the texts
+    separated by a blank line. The input hint and suggested actions of the last
+    message of a run are kept. Messages with attachments, entities, a value or
+    channel data are never merged, nor messages of different locales.
+    """
+    merged = []
+    # Merged messages are copies, the given activities are left unchanged.
+    copies = set()
+    for activity in activities:
+        previous = merged[-1] if merged else None
+        if previous is not None and _can_merge(previous, activity):
+            if id(previous) not in copies:
+                previous = merged[-1] = copy.copy(previous)
+                copies.add(id(previous))
+            previous.text = f"{previous.text}\n\n{activity.text}"
+            if activity.speak:
+                previous.speak = f"{previous.speak} {activity.speak}" if previous.speak else activity.speak
+            previous.input_hint = activity.input_hint
+            previous.suggested_actions = activity.suggested_actions
+        else:
+            merged.append(activity)
+    return merged
+
+
+def _can_merge(previous: Activity, activity: Activity) -> bool:
+    return (
+        previous.type == activity.type == ActivityTypes.message
+        and bool(previous.text)
+        and bool(activity.text)
+        and not previous.attachments
+        and not activity.attachments
+        and not previous.suggested_actions
+        and not previous.channel_data
+        and not activity.channel_data
+        and not previous.entities
+        and not activity.entities
+        and previous.value is None
+        and activity.value is None
+        and previous.text_format == activity.text_format
+        and previous.locale == activity.locale
+    )
+
+
+class OutboundBufferMiddleware(Middleware):
+    """
+    Holds the messages sent during a turn and sends them once it ends, consecutive
+    plain text messages merged into one, so that a turn answering with a
+    confirmation and a prompt makes a single connector call. A send of any other
+    activity type flushes the buffer first, to keep the order.
+
+    A held activity is not sent yet when `send_activity` returns, so it returns no
+    resource response. The activities sent after the turn, ie by the adapter error handler, are not
+    held but the ones sent together are still merged. With the expectReplies
+    delivery mode the replies already go back in a single response and are left
+    untouched.
+
+    Register it last, so that the send handlers of the other middlewares, ie the
+    telemetry logger, see every activity as the bot sent it. The counters are sent
+    as "OutboundBuffer.*" metrics every `report_interval` seconds: "activities"
+    against "sent" and "flushes" shows the connector calls saved.
+    """
+
+    _BUFFER_KEY = "OutboundBuffer"
+
+    def __init__(
+        self,
+        coalesce: bool = True,
+        telemetry_client: BotTelemetryClient = None,
+        report_interval: float = 60.0,
+    ):
+        self.coalesce = coalesce
+
+        self.activities = 0
+        self.sent = 0
+        self.flushes = 0
+        self.expect_replies = 0
+        self._reporter = MetricsReporter(
+            "OutboundBuffer", self.metrics, telemetry_client, interval=report_interval
+        )
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "activities": self.activities,
+            "sent": self.sent,
+            "flushes": self.flushes,
+            "expect_replies": self.expect_replies,
+        }
+
+    async def on_turn(
+        self, context: TurnContext, logic: Callable[[TurnContext], Awaitable]
+    ):
+        context.turn_state[self._BUFFER_KEY] = []
+        context.on_send_activities(self._send_activities)
+        try:
+            await logic()
+        finally:
+            await self.flush(context)
+            context.turn_state[self._BUFFER_KEY] = None
+            self._reporter.report()
+
+    async def flush(self, context: TurnContext) -> None:
+        buffer = context.turn_state.get(self._BUFFER_KEY)
+        if not buffer:
+            return
+
+        activities = self._coalesce(buffer)
+        buffer.clear()
+        self.flushes += 1
+        self.sent += len(activities)
+        with span("flush_outbound"):
+            await context.adapter.send_activities(context, activities)
+
+    async def _send_activities(
+        self, context: TurnContext, activities: List[Activity], next_send
+    ):
+        self.activities += len(activities)
+        if context.activity.delivery_mode == DeliveryModes.expect_replies:
+            self.expect_replies += len(activities)
+            return await next_send()
+
+        buffer = context.turn_state.get(self._BUFFER_KEY)
+        if buffer is not None and all(activity.type in _BUFFERED_TYPES for activity in activities):
+            # TurnContext sends whatever is left in the list once the handlers ran.
+            buffer.extend(activities)
+            activities.clear()
+            return await next_send()
+
+        await self.flush(context)
+        activities[:] = self._coalesce(activities)
+        self.sent += len(activities)
+        return await next_send()
+
+    def _coalesce(self, activities: List[Activity]) -> List[Activity]:
+        return coalesce_activities(activities) if self.coalesce else list(activities)
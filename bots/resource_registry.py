@@ -0,0 +1,103 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Registry of the card templates served by the bots."""
+import json
+import os
+import sys
+import time
+from typing import Dict, Tuple
+
+from botbuilder.schema import Attachment
+
+from helpers.activity_parser import loads
+
+ADAPTIVE_CARD_CONTENT_TYPE = "application/vnd.microsoft.card.adaptive"
+
+
+class ResourceRegistry:
+    """
+    Loads and validates every `*.json` template of `directory` once and serves the
+    attachments built from them. Each access decodes a fresh copy of the template,
+    so that a caller changing its attachment does not change the next ones.
+
+    At most every `reload_interval` seconds an access compares the modification
+    times of the files with the loaded ones and reloads what changed. A template
+    which fails to load or validate after a change keeps its previous version, the
+    failure being reported once per version, as is a directory which cannot be
+    listed. A `reload_interval` of 0 disables the reloading.
+    """
+
+    def __init__(self, directory: str, reload_interval: float = 2.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+
+        # Validated templates, serialized.
+        self._cards: Dict[str, bytes] = {}
+        self._mtimes: Dict[str, float] = {}
+        # Modification time of the last version of each template which failed to load.
+        self._failed_mtimes: Dict[str, float] = {}
+        self._listing_failed = False
+        self._checked_at = 0.0
+
+        self.reloads = 0
+        self.failures = 0
+        for name, path in self._files().items():
+            self._cards[name], self._mtimes[name] = self._load(path)
+        self._checked_at = time.monotonic()
+
+    def attachment(self, name: str) -> Attachment:
+        """Return the attachment built from the `name` template, ie "welcomeCard"."""
+        if self.reload_interval and time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload_changed()
+        return Attachment(
+            content_type=ADAPTIVE_CARD_CONTENT_TYPE, content=loads(self._cards[name])
+        )
+
+    def names(self):
+        return sorted(self._cards)
+
+    def reload_changed(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            files = self._files()
+        except OSError as error:
+            if not self._listing_failed:
+                self._listing_failed = True
+                self.failures += 1
+                print(f"[ResourceRegistry] keeping every template: {error}", file=sys.stderr)
+            return
+        self._listing_failed = False
+
+        for name, path in files.items():
+            mtime = None
+            try:
+                mtime = os.stat(path).st_mtime
+                if mtime in (self._mtimes.get(name), self._failed_mtimes.get(name)):
+                    continue
+                self._cards[name], self._mtimes[name] = self._load(path)
+                self.reloads += 1
+            except (OSError, ValueError) as error:
+                # Each broken version is reported once, not on every check.
+                self._failed_mtimes[name] = mtime
+                self.failures += 1
+                print(f"[ResourceRegistry] keeping the previous {name}: {error}", file=sys.stderr)
+
+    def _files(self) -> Dict[str, str]:
+        return {
+            os.path.splitext(file_name)[0]: os.path.join(self.directory, file_name)
+            for file_name in os.listdir(self.directory)
+            if file_name.endswith(".json")
+        }
+
+    @staticmethod
+    def _load(path: str) -> Tuple[bytes, float]:
+        mtime = os.stat(path).st_mtime
+        with open(path, encoding="utf-8") as card_file:
+            card = json.load(card_file)
+
+        if not isinstance(card, dict) or card.get("type") != "AdaptiveCard":
+            raise ValueError(f"{path} is not an adaptive card")
+        if not isinstance(card.get("body"), list) or "version" not in card:
+            raise ValueError(f"{path} needs a version and a body")
+
+        return json.dumps(card).encode("utf-8"), mtime
@@ -1,11 +1,31 @@
 import json
+import os
 
-with open('performances.json') as json_file:
-    performances = json.load(json_file)
+from config import DefaultConfig
+from storage import JsonlOutcomeStore, OUTCOME_ACCEPTED, OUTCOME_REFUSED
+
+nb_successful = 0
+nb_unsuccessful = 0
+
+# Outcomes recorded before the append-only store was introduced.
+if os.path.exists('performances.json'):
+    with open('performances.json') as json_file:
+        performances = json.load(json_file)
+    nb_successful += len(performances[OUTCOME_ACCEPTED])
+    nb_unsuccessful += len(performances[OUTCOME_REFUSED])
+
+# Stream the segments, one record at a time.
+for outcome, _ in JsonlOutcomeStore(DefaultConfig.OUTCOME_STORE_DIR).read():
+    if outcome == OUTCOME_ACCEPTED:
+        nb_successful += 1
+    elif outcome == OUTCOME_REFUSED:
+        nb_unsuccessful += 1
 
-nb_successful = len(performances["successfull"])
-nb_unsuccessful = len(performances["unsuccessfull"])
 nb_total = nb_successful + nb_unsuccessful
 
-success_percent = round((nb_successful/nb_total)*100, 2)
-print(f"Taux de réussite du bot: {success_percent}%")
\ No newline at end of file
+if nb_total == 0:
+    # No booking recorded yet, ie a fresh deployment.
+    print("Aucune réservation enregistrée.")
+else:
+    success_percent = round((nb_successful/nb_total)*100, 2)
+    print(f"Taux de réussite du bot: {success_percent}%")
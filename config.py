@@ -18,12 +18,129 @@ class DefaultConfig:
     """Configuration for the bot."""
 
     PORT = 8000 #3978
+    # serve.py: worker processes accepting on the shared port, interface to bind and
+    # seconds given to a worker to finish its requests when it is drained. More than
+    # one worker needs StorageBackend=sqlite, and TurnLock=file.
+    SERVE_WORKERS = int(os.environ.get("ServeWorkers", 1))
+    SERVE_HOST = os.environ.get("ServeHost", "0.0.0.0")
+    SERVE_SHUTDOWN_TIMEOUT = float(os.environ.get("ServeShutdownTimeout", 30))
+    # Largest /api/messages body accepted, bigger ones are answered with a 413.
+    MAX_REQUEST_BYTES = int(os.environ.get("MaxRequestBytes", 256 * 1024))
+    # Turns processed at once by a worker, 0 disables the admission control. The
+    # others wait in a queue of ADMISSION_MAX_QUEUE turns, new conversations being
+    # answered with a 503 while the average wait is above ADMISSION_TARGET_WAIT
+    # seconds. Each conversation may send ADMISSION_CONVERSATION_RATE turns per
+    # second, in bursts of ADMISSION_CONVERSATION_BURST, before getting a 429.
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get("AdmissionMaxConcurrent", 32))
+    ADMISSION_MAX_QUEUE = int(os.environ.get("AdmissionMaxQueue", 128))
+    ADMISSION_TARGET_WAIT = float(os.environ.get("AdmissionTargetWait", 1.0))
+    ADMISSION_MAX_WAIT = float(os.environ.get("AdmissionMaxWait", 5.0))
+    ADMISSION_CONVERSATION_RATE = float(os.environ.get("AdmissionConversationRate", 2.0))
+    ADMISSION_CONVERSATION_BURST = float(os.environ.get("AdmissionConversationBurst", 10))
     APP_ID = os.environ.get("MicrosoftAppId", "")
     APP_PASSWORD = os.environ.get("MicrosoftAppPassword", "")
-    LUIS_APP_ID = os.environ.get("LuisAppId", os.environ["LUIS_ID"])
-    LUIS_API_KEY = os.environ.get("LuisAPIKey", os.environ["LUIS_KEY"])
-    # LUIS endpoint host name, ie "westus.api.cognitive.microsoft.com"
-    LUIS_API_HOST_NAME = os.environ.get("LuisAPIHostName", os.environ["LUIS_HOST"])
+    # Validated authorization headers kept until their token expires, 0 validates every
+    # request. The signing keys are refreshed in the background every
+    # AUTH_KEY_REFRESH_INTERVAL seconds, 0 lets the validation fetch them itself.
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AuthTokenCacheSize", 10000))
+    AUTH_KEY_REFRESH_INTERVAL = float(os.environ.get("AuthKeyRefreshInterval", 3600))
+    # "luis" calls the LUIS endpoint, "local" serves predictions from the in-process
+    # LocalRecognizer and needs no LUIS settings.
+    RECOGNIZER_MODE = os.environ.get("RecognizerMode", "luis")
+    LUIS_APP_ID = os.environ.get("LuisAppId", os.environ.get("LUIS_ID", ""))
+    LUIS_API_KEY = os.environ.get("LuisAPIKey", os.environ.get("LUIS_KEY", ""))
+    # LUIS endpoint host name, ie "westus.api.cognitive.microsoft.com", https is assumed
+    # unless a scheme is given.
+    LUIS_API_HOST_NAME = os.environ.get("LuisAPIHostName", os.environ.get("LUIS_HOST", ""))
+    # Shared LUIS connection pool: in-flight limit, per-attempt timeout in seconds,
+    # delay before a hedged second attempt and total attempts per prediction.
+    LUIS_MAX_CONCURRENCY = int(os.environ.get("LuisMaxConcurrency", 32))
+    LUIS_TIMEOUT = float(os.environ.get("LuisTimeout", 3.0))
+    LUIS_HEDGE_AFTER = float(os.environ.get("LuisHedgeAfter", 0.75))
+    LUIS_MAX_ATTEMPTS = int(os.environ.get("LuisMaxAttempts", 2))
+    # Circuit breaker around the LUIS calls: it opens when the failure rate or the rate
+    # of calls slower than LUIS_BREAKER_SLOW_CALL seconds crosses its threshold over the
+    # last LUIS_BREAKER_WINDOW calls, and probes LUIS again after LUIS_BREAKER_OPEN_SECONDS.
+    LUIS_BREAKER_WINDOW = int(os.environ.get("LuisBreakerWindow", 20))
+    LUIS_BREAKER_MIN_CALLS = int(os.environ.get("LuisBreakerMinCalls", 5))
+    LUIS_BREAKER_FAILURE_RATE = float(os.environ.get("LuisBreakerFailureRate", 0.5))
+    LUIS_BREAKER_SLOW_CALL = float(os.environ.get("LuisBreakerSlowCall", 2.0))
+    LUIS_BREAKER_SLOW_CALL_RATE = float(os.environ.get("LuisBreakerSlowCallRate", 0.8))
+    LUIS_BREAKER_OPEN_SECONDS = float(os.environ.get("LuisBreakerOpenSeconds", 30))
+    # Train a LocalRecognizer at startup to answer while the breaker is open. Off by
+    # default: the training takes about 0.6 s of each worker's startup.
+    LUIS_FALLBACK_ENABLED = os.environ.get("LuisFallbackEnabled", "false").lower() == "true"
+    # Published LUIS model version, part of the prediction cache key.
+    LUIS_APP_VERSION = os.environ.get("LuisAppVersion", "")
+    # Size and lifetime of the in-process prediction cache, 0 disables it.
+    LUIS_CACHE_SIZE = int(os.environ.get("LuisCacheSize", 1024))
+    LUIS_CACHE_TTL = float(os.environ.get("LuisCacheTtl", 3600))
+    # Optional sqlite file shared by the workers as a second cache tier.
+    LUIS_CACHE_PATH = os.environ.get("LuisCachePath", "")
+    # LUIS model export, source of the local gazetteer and training data.
+    LUIS_MODEL_PATH = os.environ.get("LuisModelPath", "cognitiveModels/FlightBooking.json")
+    # Resolve structured utterances locally when the rules are at least this confident.
+    FAST_PATH_ENABLED = os.environ.get("FastPathEnabled", "true").lower() == "true"
+    FAST_PATH_THRESHOLD = float(os.environ.get("FastPathThreshold", 0.85))
     APPINSIGHTS_INSTRUMENTATION_KEY = os.environ.get(
-        "AppInsightsInstrumentationKey", os.environ["INSIGHTS_KEY"]
+        "AppInsightsInstrumentationKey", os.environ.get("INSIGHTS_KEY", "")
     )
+    # Telemetry is exported from a background thread in batches of TELEMETRY_BATCH_SIZE,
+    # at least every TELEMETRY_SEND_INTERVAL seconds. Traces and events are sampled once
+    # 3/4 of TELEMETRY_MAX_PENDING are waiting and dropped past it. TELEMETRY_FILE_PATH
+    # writes the envelopes as JSON lines to a local file instead of Application Insights.
+    TELEMETRY_MAX_PENDING = int(os.environ.get("TelemetryMaxPending", 5000))
+    TELEMETRY_BATCH_SIZE = int(os.environ.get("TelemetryBatchSize", 100))
+    TELEMETRY_SEND_INTERVAL = float(os.environ.get("TelemetrySendInterval", 5.0))
+    TELEMETRY_FILE_PATH = os.environ.get("TelemetryFilePath", "")
+    # Fraction of the conversations whose turn telemetry is sent. The turns of the
+    # other conversations are only sent when slower than TELEMETRY_SLOW_TURN_MS, when
+    # they fail or when they trace a warning, ie a refused booking.
+    TELEMETRY_SAMPLE_RATE = float(os.environ.get("TelemetrySampleRate", 1.0))
+    TELEMETRY_SLOW_TURN_MS = float(os.environ.get("TelemetrySlowTurnMs", 1000))
+    # Conversation and user state storage: "memory" (single process) or "sqlite",
+    # shared by the workers. Idle conversations are dropped after STORAGE_TTL seconds
+    # (0 keeps them) and the operations of concurrent turns are written together.
+    STORAGE_BACKEND = os.environ.get("StorageBackend", "memory")
+    STORAGE_PATH = os.environ.get("StoragePath", "state.db")
+    STORAGE_TTL = float(os.environ.get("StorageTtl", 24 * 3600))
+    STORAGE_BATCH_DELAY = float(os.environ.get("StorageBatchDelay", 0.002))
+    # Turns of the same conversation run one at a time: "process" within a worker,
+    # "file" across the workers sharing TURN_LOCK_DIR, where the conversations are
+    # hashed to TURN_LOCK_SHARDS lock files, or "off". A file lock held elsewhere for
+    # more than TURN_LOCK_TIMEOUT seconds is given up.
+    TURN_LOCK = os.environ.get("TurnLock", "process")
+    TURN_LOCK_DIR = os.environ.get("TurnLockDir", "locks")
+    TURN_LOCK_SHARDS = int(os.environ.get("TurnLockShards", 256))
+    TURN_LOCK_TIMEOUT = float(os.environ.get("TurnLockTimeout", 10.0))
+    # Fraction of the turns recorded as span trees in "TurnProfile" events, 0 disables
+    # the profiler. With PROFILE_DUMP_DIR set, the cProfile stats of the sampled turns
+    # slower than PROFILE_SLOW_TURN_MS are written to that directory.
+    PROFILE_SAMPLE_RATE = float(os.environ.get("ProfileSampleRate", 0.0))
+    PROFILE_SLOW_TURN_MS = float(os.environ.get("ProfileSlowTurnMs", 500))
+    PROFILE_DUMP_DIR = os.environ.get("ProfileDumpDir", "")
+    # Send the activities of a turn together at its end, consecutive text messages
+    # merged into one when OUTBOUND_COALESCE is set.
+    OUTBOUND_BUFFER_ENABLED = os.environ.get("OutboundBufferEnabled", "true").lower() == "true"
+    OUTBOUND_COALESCE = os.environ.get("OutboundCoalesce", "true").lower() == "true"
+    # Seconds between two checks of the card templates for changes, 0 never reloads them.
+    RESOURCE_RELOAD_INTERVAL = float(os.environ.get("ResourceReloadInterval", 2.0))
+    # Retraining data recorded before the append-only store, used by LocalRecognizer.
+    NEW_DATA_PATH = os.environ.get("NewDataPath", "new_data.json")
+    # Turns kept in BookingDetails, older ones are spilled to the "turns" segments.
+    BOOKING_MAX_TURNS = int(os.environ.get("BookingMaxTurns", 20))
+    # User answers kept per booking for the new_data retraining records, the oldest
+    # ones are overwritten beyond it.
+    BOOKING_TRANSCRIPT_CAPACITY = int(os.environ.get("BookingTranscriptCapacity", 32))
+    # Directory holding the append-only booking outcome segments.
+    OUTCOME_STORE_DIR = os.environ.get("OutcomeStoreDir", "outcomes")
+    OUTCOME_SEGMENT_MAX_BYTES = int(os.environ.get("OutcomeSegmentMaxBytes", 4 * 1024 * 1024))
+    OUTCOME_SEGMENT_MAX_AGE = float(os.environ.get("OutcomeSegmentMaxAge", 3600))
+    OUTCOME_FSYNC_EVERY = int(os.environ.get("OutcomeFsyncEvery", 32))
+    # Background writer used by the dialogs for outcomes and retraining data.
+    WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WriteBehindMaxPending", 1024))
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WriteBehindBatchSize", 64))
+    WRITE_BEHIND_SPILL_PATH = os.environ.get("WriteBehindSpillPath", "write_behind.spill")
+    # Glob of the spill files of other processes to replay once they exited, ie set by
+    # serve.py to those of the previous generations of a worker.
+    WRITE_BEHIND_ADOPT_PATTERN = os.environ.get("WriteBehindAdoptPattern", "")
@@ -5,5 +5,12 @@ from .booking_dialog import BookingDialog
 from .cancel_and_help_dialog import CancelAndHelpDialog
 from .date_resolver_dialog import DateResolverDialog
 from .main_dialog import MainDialog
+from .profiled_waterfall_dialog import ProfiledWaterfallDialog
 
-__all__ = ["BookingDialog", "CancelAndHelpDialog", "DateResolverDialog", "MainDialog"]
+__all__ = [
+    "BookingDialog",
+    "CancelAndHelpDialog",
+    "DateResolverDialog",
+    "MainDialog",
+    "ProfiledWaterfallDialog",
+]
@@ -2,15 +2,49 @@
 # Licensed under the MIT License.
 """Flight booking dialog."""
 
-import json
-from datatypes_date_time.timex import Timex
-
-from botbuilder.dialogs import WaterfallDialog, WaterfallStepContext, DialogTurnResult
+from botbuilder.dialogs import (
+    DialogInstance,
+    DialogReason,
+    DialogTurnResult,
+    WaterfallDialog,
+    WaterfallStepContext,
+)
 from botbuilder.dialogs.prompts import ConfirmPrompt, TextPrompt, PromptOptions
-from botbuilder.core import MessageFactory, BotTelemetryClient, NullTelemetryClient
+from botbuilder.core import MessageFactory, BotTelemetryClient, NullTelemetryClient, TurnContext
 from botbuilder.core.bot_telemetry_client import Severity
+from booking_details import BookingDetails
+from helpers.timex_cache import resolve_timex
+from telemetry import PropertyProjector, span
+from storage import (
+    OutcomeStore,
+    JsonlOutcomeStore,
+    TranscriptStore,
+    OUTCOME_ACCEPTED,
+    OUTCOME_REFUSED,
+)
 from .cancel_and_help_dialog import CancelAndHelpDialog
 from .date_resolver_dialog import DateResolverDialog
+from .profiled_waterfall_dialog import ProfiledWaterfallDialog
+
+# Booking fields sent with the outcome traces, the transcript is only counted.
+BOOKING_TRACE_PROPERTIES = PropertyProjector(
+    ("or_city", "dst_city", "budget", "str_date", "end_date"),
+    counted=("turns", "spilled_turns"),
+)
+
+
+class _BookingWaterfallDialog(ProfiledWaterfallDialog):
+    """Releases the transcript of a booking however its waterfall ends."""
+
+    def __init__(self, dialog_id: str, steps: list, transcripts: TranscriptStore):
+        super(_BookingWaterfallDialog, self).__init__(dialog_id, steps)
+        self.transcripts = transcripts
+
+    async def end_dialog(
+        self, context: TurnContext, instance: DialogInstance, reason: DialogReason
+    ) -> None:
+        self.transcripts.release(instance.state.get(self.PersistedValues) or {})
+        await super(_BookingWaterfallDialog, self).end_dialog(context, instance, reason)
 
 
 class BookingDialog(CancelAndHelpDialog):
@@ -20,15 +54,31 @@ class BookingDialog(CancelAndHelpDialog):
         self,
         dialog_id: str = None,
         telemetry_client: BotTelemetryClient = NullTelemetryClient(),
+        outcome_store: OutcomeStore = None,
+        new_data_store: OutcomeStore = None,
+        max_turns: int = 0,
+        turn_spill_store: OutcomeStore = None,
+        transcripts: TranscriptStore = None,
     ):
         super(BookingDialog, self).__init__(
             dialog_id or BookingDialog.__name__, telemetry_client
         )
         self.telemetry_client = telemetry_client
+        self.outcome_store = outcome_store or JsonlOutcomeStore("outcomes")
+        self.new_data_store = new_data_store or JsonlOutcomeStore(
+            "outcomes", prefix="new_data"
+        )
+        # Turns kept in the dialog state, older ones are moved to the spill store.
+        self.max_turns = max_turns
+        self.turn_spill_store = turn_spill_store or JsonlOutcomeStore(
+            "outcomes", prefix="turns"
+        )
+        # User answers of each booking, written to new_data when it is refused.
+        self.transcripts = transcripts or TranscriptStore()
         text_prompt = TextPrompt(TextPrompt.__name__)
         text_prompt.telemetry_client = telemetry_client
 
-        waterfall_dialog = WaterfallDialog(
+        waterfall_dialog = _BookingWaterfallDialog(
             WaterfallDialog.__name__,
             [
                 self.or_city_step,
@@ -39,6 +89,7 @@ class BookingDialog(CancelAndHelpDialog):
                 self.confirm_step,
                 self.final_step,
             ],
+            self.transcripts,
         )
         waterfall_dialog.telemetry_client = telemetry_client
 
@@ -54,16 +105,16 @@ class BookingDialog(CancelAndHelpDialog):
 
         self.initial_dialog_id = WaterfallDialog.__name__
 
-        self.user_dialog = []
-
-
     async def or_city_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
         """Prompt for origin city."""
         booking_details = step_context.options
-        self.user_dialog.append(booking_details.turns[0])
+        self.transcripts.append(
+            step_context.values,
+            booking_details.turns[0] if booking_details.turns else step_context.context.activity.text,
+        )
 
         if booking_details.or_city is None:
-            booking_details.turns.append("From what city will you be travelling?")
+            self._add_turn(step_context, booking_details, "From what city will you be travelling?")
             return await step_context.prompt(
                 TextPrompt.__name__,
                 PromptOptions(
@@ -81,11 +132,11 @@ class BookingDialog(CancelAndHelpDialog):
 
         # Capture the response to the previous step's prompt
         booking_details.or_city = step_context.result
-        booking_details.turns.append(step_context.result)
-        self.user_dialog.append(step_context.result)
+        self._add_turn(step_context, booking_details, step_context.result)
+        self.transcripts.append(step_context.values, step_context.result)
 
         if booking_details.dst_city is None:
-            booking_details.turns.append("To what city would you like to travel?")
+            self._add_turn(step_context, booking_details, "To what city would you like to travel?")
             return await step_context.prompt(
                 TextPrompt.__name__,
                 PromptOptions(
@@ -101,11 +152,11 @@ class BookingDialog(CancelAndHelpDialog):
 
         # Capture the response to the previous step's prompt
         booking_details.dst_city = step_context.result
-        booking_details.turns.append(step_context.result)
-        self.user_dialog.append(step_context.result)
+        self._add_turn(step_context, booking_details, step_context.result)
+        self.transcripts.append(step_context.values, step_context.result)
 
         if booking_details.budget is None:
-            booking_details.turns.append("What is your budget for this trip?")
+            self._add_turn(step_context, booking_details, "What is your budget for this trip?")
             return await step_context.prompt(
                 TextPrompt.__name__,
                 PromptOptions(
@@ -125,13 +176,13 @@ class BookingDialog(CancelAndHelpDialog):
 
         # Capture the results of the previous step
         booking_details.budget = step_context.result
-        booking_details.turns.append(step_context.result)
-        self.user_dialog.append(step_context.result)
+        self._add_turn(step_context, booking_details, step_context.result)
+        self.transcripts.append(step_context.values, step_context.result)
 
         if not booking_details.str_date or self.is_ambiguous(
             booking_details.str_date
         ):
-            booking_details.turns.append("What is the departure date?")
+            self._add_turn(step_context, booking_details, "What is the departure date?")
             return await step_context.begin_dialog(
                 "StartDate", booking_details.str_date
             )  # pylint: disable=line-too-long
@@ -148,13 +199,13 @@ class BookingDialog(CancelAndHelpDialog):
 
         # Capture the results of the previous step
         booking_details.str_date = step_context.result
-        booking_details.turns.append(step_context.result)
-        self.user_dialog.append(step_context.result)
+        self._add_turn(step_context, booking_details, step_context.result)
+        self.transcripts.append(step_context.values, step_context.result)
 
         if not booking_details.end_date or self.is_ambiguous(
             booking_details.end_date
         ):
-            booking_details.turns.append("What is the departure date?")
+            self._add_turn(step_context, booking_details, "What is the departure date?")
             return await step_context.begin_dialog(
                 "EndDate", booking_details.end_date
             )  # pylint: disable=line-too-long
@@ -170,8 +221,8 @@ class BookingDialog(CancelAndHelpDialog):
 
         # Capture the results of the previous step
         booking_details.end_date = step_context.result
-        booking_details.turns.append(step_context.result)
-        self.user_dialog.append(step_context.result)
+        self._add_turn(step_context, booking_details, step_context.result)
+        self.transcripts.append(step_context.values, step_context.result)
 
         msg = f"""Please confirm your travel details:\n
         - From: {booking_details.or_city}\n
@@ -200,46 +251,29 @@ class BookingDialog(CancelAndHelpDialog):
 
             self.telemetry_client.track_trace(
                 "booking_accepted",
-                properties=booking_details.__dict__,
+                properties=BOOKING_TRACE_PROPERTIES.project(booking_details.to_dict()),
             )
 
-            with open('performances.json') as json_file:
-                performances = json.load(json_file)
-     
-            performances["successfull"].append(booking_details.__dict__)
-
-            json_string = json.dumps(performances)
-            with open("performances.json", "w") as outfile:
-                outfile.write(json_string)
-
+            with span("outcome_append"):
+                self.outcome_store.append(OUTCOME_ACCEPTED, booking_details.to_dict())
 
             return await step_context.end_dialog(booking_details)
         
         self.telemetry_client.track_trace(
                 "booking_refused",
                 severity=Severity.warning,
-                properties=booking_details.__dict__,
+                properties=BOOKING_TRACE_PROPERTIES.project(booking_details.to_dict()),
             )
 
 
-        with open('performances.json') as json_file:
-            performances = json.load(json_file)
-     
-        performances["unsuccessfull"].append(booking_details.__dict__)
-
-        json_string = json.dumps(performances)
-        with open("performances.json", "w") as outfile:
-            outfile.write(json_string)
-
-        # new data
-        with open('new_data.json') as json_file:
-            new_data = json.load(json_file)
-     
-        new_data["turns"].append({"text":" ".join(self.user_dialog), "labels":{key:value for key, value in booking_details.__dict__.items() if key!="turns"}})
+        with span("outcome_append"):
+            self.outcome_store.append(OUTCOME_REFUSED, booking_details.to_dict())
 
-        json_string = json.dumps(new_data)
-        with open("new_data.json", "w") as outfile:
-            outfile.write(json_string)
+            # new data
+            self.new_data_store.append(
+                "turns",
+                {"text":" ".join(self.transcripts.read(step_context.values)), "labels":{key:value for key, value in booking_details.to_dict().items() if key not in ("turns", "spilled_turns")}},
+            )
 
 
         # self.telemetry_client.track_metric(
@@ -249,7 +283,22 @@ class BookingDialog(CancelAndHelpDialog):
 
         return await step_context.end_dialog()
 
+    def _add_turn(
+        self,
+        step_context: WaterfallStepContext,
+        booking_details: BookingDetails,
+        text: str,
+    ):
+        spilled = booking_details.add_turn(text, self.max_turns)
+        if spilled:
+            self.turn_spill_store.append(
+                "turns",
+                {
+                    "conversation": step_context.context.activity.conversation.id,
+                    "turns": spilled,
+                },
+            )
+
     def is_ambiguous(self, timex: str) -> bool:
         """Ensure time is correct."""
-        timex_property = Timex(timex)
-        return "definite" not in timex_property.types
+        return not resolve_timex(timex).definite
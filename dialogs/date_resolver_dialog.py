@@ -2,8 +2,6 @@
 # Licensed under the MIT License.
 """Handle date/time resolution for booking dialog."""
 
-from datatypes_date_time.timex import Timex
-
 from botbuilder.core import MessageFactory, BotTelemetryClient, NullTelemetryClient
 from botbuilder.dialogs import WaterfallDialog, DialogTurnResult, WaterfallStepContext
 from botbuilder.dialogs.prompts import (
@@ -12,7 +10,9 @@ from botbuilder.dialogs.prompts import (
     PromptOptions,
     DateTimeResolution,
 )
+from helpers.timex_cache import resolve_timex
 from .cancel_and_help_dialog import CancelAndHelpDialog
+from .profiled_waterfall_dialog import ProfiledWaterfallDialog
 
 
 class DateResolverDialog(CancelAndHelpDialog):
@@ -34,7 +34,7 @@ class DateResolverDialog(CancelAndHelpDialog):
         )
         date_time_prompt.telemetry_client = telemetry_client
 
-        waterfall_dialog = WaterfallDialog(
+        waterfall_dialog = ProfiledWaterfallDialog(
             WaterfallDialog.__name__ + "2", [self.initial_step, self.final_step]
         )
         waterfall_dialog.telemetry_client = telemetry_client
@@ -62,7 +62,8 @@ class DateResolverDialog(CancelAndHelpDialog):
             "date including the month, day and year."
         )
 
-        if timex is None or "definite" not in Timex(timex).types:
+        definite = timex is not None and resolve_timex(timex).definite
+        if not definite:
             # We were not given any date at all so prompt the user.
             return await step_context.prompt(
                 DateTimePrompt.__name__,
@@ -73,7 +74,7 @@ class DateResolverDialog(CancelAndHelpDialog):
             )
 
         # We have a Date we just need to check it is unambiguous.
-        if "definite" in Timex(timex).types:
+        if definite:
             # This is essentially a "reprompt" of the data we were given up front.
             return await step_context.prompt(
                 DateTimePrompt.__name__, PromptOptions(prompt=reprompt_msg)
@@ -93,6 +94,6 @@ class DateResolverDialog(CancelAndHelpDialog):
             timex = prompt_context.recognized.value[0].timex.split("T")[0]
 
             # TODO: Needs TimexProperty
-            return "definite" in Timex(timex).types
+            return resolve_timex(timex).definite
 
         return False
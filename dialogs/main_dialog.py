@@ -3,13 +3,13 @@
 
 from botbuilder.dialogs import (
     ComponentDialog,
-    WaterfallDialog,
     WaterfallStepContext,
     DialogTurnResult,
 )
 from botbuilder.dialogs.prompts import TextPrompt, PromptOptions
 from botbuilder.core import (
     MessageFactory,
+    Recognizer,
     TurnContext,
     BotTelemetryClient,
     NullTelemetryClient,
@@ -20,6 +20,7 @@ from booking_details import BookingDetails
 from flight_booking_recognizer import FlightBookingRecognizer
 from helpers.luis_helper import LuisHelper, Intent
 from .booking_dialog import BookingDialog
+from .profiled_waterfall_dialog import ProfiledWaterfallDialog
 
 
 class MainDialog(ComponentDialog):
@@ -28,6 +29,7 @@ class MainDialog(ComponentDialog):
         luis_recognizer: FlightBookingRecognizer,
         booking_dialog: BookingDialog,
         telemetry_client: BotTelemetryClient = None,
+        fallback_recognizer: Recognizer = None,
     ):
         super(MainDialog, self).__init__(MainDialog.__name__)
         self.telemetry_client = telemetry_client or NullTelemetryClient()
@@ -37,12 +39,13 @@ class MainDialog(ComponentDialog):
 
         booking_dialog.telemetry_client = self.telemetry_client
 
-        wf_dialog = WaterfallDialog(
+        wf_dialog = ProfiledWaterfallDialog(
             "WFDialog", [self.intro_step, self.act_step, self.final_step]
         )
         wf_dialog.telemetry_client = self.telemetry_client
 
         self._luis_recognizer = luis_recognizer
+        self._fallback_recognizer = fallback_recognizer
         self._booking_dialog_id = booking_dialog.id
 
         self.add_dialog(text_prompt)
@@ -87,6 +90,19 @@ class MainDialog(ComponentDialog):
             self._luis_recognizer, step_context.context
         )
 
+        if (
+            intent is None
+            and self._fallback_recognizer is not None
+            and getattr(self._luis_recognizer, "is_degraded", False)
+        ):
+            # LUIS is down and the circuit breaker failed fast, extract the booking details locally.
+            intent, luis_result = await LuisHelper.execute_luis_query(
+                self._fallback_recognizer, step_context.context
+            )
+            self.telemetry_client.track_event(
+                "RecognizerFallback", properties={"intent": str(intent)}
+            )
+
         if intent == Intent.BOOK_FLIGHT.value and luis_result:
             # Show a warning for Origin and Destination if we can't resolve them.
             # await MainDialog._show_warning_for_unsupported_cities(
@@ -0,0 +1,15 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Waterfall dialog timing its steps in the turn profile."""
+
+from botbuilder.dialogs import DialogTurnResult, WaterfallDialog, WaterfallStepContext
+
+from telemetry import span
+
+
+class ProfiledWaterfallDialog(WaterfallDialog):
+    """WaterfallDialog adding a span per step, ie "BookingDialog.budget_step"."""
+
+    async def on_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
+        with span(self.get_step_name(step_context.index)):
+            return await super().on_step(step_context)
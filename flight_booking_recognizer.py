@@ -1,8 +1,11 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
+import time
+from typing import Dict
 
 from botbuilder.ai.luis import LuisApplication, LuisRecognizer, LuisPredictionOptions
 from botbuilder.core import (
+    IntentScore,
     Recognizer,
     RecognizerResult,
     TurnContext,
@@ -11,13 +14,30 @@ from botbuilder.core import (
 )
 
 from config import DefaultConfig
+from recognition import CircuitBreaker, LuisHttpClient, PredictionCache
+from telemetry import MetricsReporter
+
+
+def luis_endpoint(host_name: str) -> str:
+    # The host name may come with its scheme, ie to point the bot at a local LUIS stub.
+    if host_name.startswith(("http://", "https://")):
+        return host_name.rstrip("/")
+    return "https://" + host_name
 
 
 class FlightBookingRecognizer(Recognizer):
     def __init__(
-        self, configuration: DefaultConfig, telemetry_client: BotTelemetryClient = None
+        self,
+        configuration: DefaultConfig,
+        telemetry_client: BotTelemetryClient = None,
+        metrics_client: BotTelemetryClient = None,
     ):
         self._recognizer = None
+        self._client = None
+        self._cache = None
+        self._cache_reporter = None
+        self._breaker = None
+        self._telemetry_client = telemetry_client or NullTelemetryClient()
 
         luis_is_configured = (
             configuration.LUIS_APP_ID
@@ -30,20 +50,106 @@ class FlightBookingRecognizer(Recognizer):
             luis_application = LuisApplication(
                 configuration.LUIS_APP_ID,
                 configuration.LUIS_API_KEY,
-                "https://" + configuration.LUIS_API_HOST_NAME,
+                luis_endpoint(configuration.LUIS_API_HOST_NAME),
             )
 
             options = LuisPredictionOptions()
-            options.telemetry_client = telemetry_client or NullTelemetryClient()
+            options.telemetry_client = self._telemetry_client
 
+            # Only used to log the LuisResult telemetry event, predictions go through
+            # the pooled client.
             self._recognizer = LuisRecognizer(
                 luis_application, prediction_options=options
             )
+            self._client = LuisHttpClient(
+                luis_application,
+                max_concurrency=configuration.LUIS_MAX_CONCURRENCY,
+                timeout=configuration.LUIS_TIMEOUT,
+                hedge_after=configuration.LUIS_HEDGE_AFTER,
+                max_attempts=configuration.LUIS_MAX_ATTEMPTS,
+            )
+            self._breaker = CircuitBreaker(
+                "luis",
+                window=configuration.LUIS_BREAKER_WINDOW,
+                min_calls=configuration.LUIS_BREAKER_MIN_CALLS,
+                failure_rate=configuration.LUIS_BREAKER_FAILURE_RATE,
+                slow_call_seconds=configuration.LUIS_BREAKER_SLOW_CALL,
+                slow_call_rate=configuration.LUIS_BREAKER_SLOW_CALL_RATE,
+                open_seconds=configuration.LUIS_BREAKER_OPEN_SECONDS,
+                telemetry_client=self._telemetry_client,
+            )
+
+            if configuration.LUIS_CACHE_SIZE > 0:
+                self._cache = PredictionCache(
+                    configuration.LUIS_APP_ID,
+                    configuration.LUIS_APP_VERSION,
+                    max_entries=configuration.LUIS_CACHE_SIZE,
+                    ttl=configuration.LUIS_CACHE_TTL,
+                    disk_path=configuration.LUIS_CACHE_PATH or None,
+                )
+                # Total time of the recognitions answered by the cache and by LUIS.
+                self.hit_latency_ms = 0.0
+                self.miss_latency_ms = 0.0
+                # The counters are sent periodically, from inside the turns: to a client
+                # which does not sample them when there is one.
+                self._cache_reporter = MetricsReporter(
+                    "LuisPredictionCache",
+                    self.cache_metrics,
+                    metrics_client or self._telemetry_client,
+                    gauges=("entries",),
+                )
 
     @property
     def is_configured(self) -> bool:
         # Returns true if luis is configured in the config.py and initialized.
         return self._recognizer is not None
 
+    @property
+    def is_degraded(self) -> bool:
+        # True while the circuit breaker keeps predictions away from LUIS.
+        return self._breaker is not None and self._breaker.is_degraded
+
+    async def close(self):
+        await self._client.close()
+        if self._cache is not None:
+            self._cache.close()
+
+    def cache_metrics(self) -> Dict[str, float]:
+        # The cache counters, with the time spent on its hits and misses.
+        metrics = self._cache.metrics()
+        metrics["hit_latency_ms"] = self.hit_latency_ms
+        metrics["miss_latency_ms"] = self.miss_latency_ms
+        return metrics
+
     async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
-        return await self._recognizer.recognize(turn_context)
+        if self._cache is None:
+            return await self._recognize_remote(turn_context)
+
+        text = turn_context.activity.text
+        key = self._cache.key(text)
+
+        start = time.perf_counter()
+        cached, _ = await self._cache.lookup(key)
+        if cached is not None:
+            result = PredictionCache.from_cached(text, cached)
+            self.hit_latency_ms += (time.perf_counter() - start) * 1000
+        else:
+            result = await self._recognize_remote(turn_context)
+            self._cache.store(key, PredictionCache.to_cached(result))
+            self.miss_latency_ms += (time.perf_counter() - start) * 1000
+
+        self._cache_reporter.report()
+        return result
+
+    async def _recognize_remote(self, turn_context: TurnContext) -> RecognizerResult:
+        utterance = turn_context.activity.text
+        if not utterance or utterance.isspace():
+            result = RecognizerResult(
+                text=utterance, intents={"": IntentScore(score=1.0)}, entities={}
+            )
+        else:
+            # Raises CircuitOpenError at once while LUIS is considered down.
+            result = await self._breaker.call(self._client.recognize, utterance)
+
+        self._recognizer.on_recognizer_result(result, turn_context)
+        return result
@@ -2,6 +2,13 @@
 # Licensed under the MIT License.
 """Helpers module."""
 
-from . import activity_helper, luis_helper, dialog_helper
+from . import activity_helper, activity_parser, date_normalizer, luis_helper, dialog_helper, timex_cache
 
-__all__ = ["activity_helper", "dialog_helper", "luis_helper"]
+__all__ = [
+    "activity_helper",
+    "activity_parser",
+    "date_normalizer",
+    "dialog_helper",
+    "luis_helper",
+    "timex_cache",
+]
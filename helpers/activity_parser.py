@@ -0,0 +1,157 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Parsing of the activities posted to /api/messages."""
+
+import json
+
+from botbuilder.schema import (
+    Activity,
+    ActivityTypes,
+    ChannelAccount,
+    ConversationAccount,
+)
+from msrest.serialization import Deserializer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the standard decoder is used instead
+    orjson = None
+
+# Activity types built by the fast path, the others go through msrest.
+FAST_TYPES = {ActivityTypes.message, ActivityTypes.conversation_update}
+
+# Accounts built directly, field by field.
+_ACCOUNTS = {
+    "from_property": ChannelAccount,
+    "recipient": ChannelAccount,
+    "conversation": ConversationAccount,
+}
+_ACCOUNT_LISTS = {"members_added", "members_removed"}
+
+# (attribute, JSON key, msrest type) of the fields copied as they are, plain values
+# checked against their type.
+_PLAIN_TYPES = {"str": str, "bool": bool, "object": None}
+_PLAIN_FIELDS = tuple(
+    (name, attribute["key"], _PLAIN_TYPES[attribute["type"]])
+    for name, attribute in Activity._attribute_map.items()
+    if attribute["type"] in _PLAIN_TYPES
+)
+# Dates are deserialized by msrest while parsing, so that a malformed one is still
+# refused with the request.
+_DATE_FIELDS = tuple(
+    (name, attribute["key"], attribute["type"])
+    for name, attribute in Activity._attribute_map.items()
+    if attribute["type"] == "iso-8601"
+)
+# The others (attachments, entities, suggested actions...) are deserialized by
+# msrest the first time they are read.
+_LAZY_FIELDS = tuple(
+    (name, attribute["key"])
+    for name, attribute in Activity._attribute_map.items()
+    if attribute["type"] not in _PLAIN_TYPES
+    and attribute["type"] != "iso-8601"
+    and name not in _ACCOUNTS
+    and name not in _ACCOUNT_LISTS
+)
+
+_DESERIALIZER = Deserializer(Activity._infer_class_models())
+
+
+class _NotSimple(Exception):
+    """The payload needs the msrest deserializer."""
+
+
+def loads(data: bytes):
+    """Decode a JSON request body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_activity(data: bytes) -> Activity:
+    return activity_from_dict(loads(data))
+
+
+def activity_from_dict(body: dict) -> Activity:
+    """
+    Same result as `Activity().deserialize(body)`, without the reflective msrest
+    deserializer for the message and conversationUpdate activities: their plain
+    fields and accounts are copied directly, their dates deserialized, and the
+    other fields are only deserialized when they are read.
+    """
+    if isinstance(body, dict) and body.get("type") in FAST_TYPES:
+        try:
+            return _LazyActivity(body)
+        except _NotSimple:
+            pass
+    return Activity().deserialize(body)
+
+
+def _check(value, expected: type):
+    if expected is not None and not isinstance(value, expected):
+        raise _NotSimple()
+    return value
+
+
+def _account(cls, data):
+    if not isinstance(data, dict):
+        raise _NotSimple()
+    fields = {}
+    for name, attribute in cls._attribute_map.items():
+        value = data.get(attribute["key"])
+        if value is not None:
+            if attribute["type"] not in _PLAIN_TYPES:
+                raise _NotSimple()
+            fields[name] = _check(value, _PLAIN_TYPES[attribute["type"]])
+    return cls(**fields)
+
+
+class _LazyActivity(Activity):
+    """Activity whose uncommon fields are deserialized on first access."""
+
+    def __init__(self, body: dict):
+        fields = {}
+        for name, key, expected in _PLAIN_FIELDS:
+            value = body.get(key)
+            if value is not None:
+                fields[name] = _check(value, expected)
+        for name, cls in _ACCOUNTS.items():
+            value = body.get(Activity._attribute_map[name]["key"])
+            if value is not None:
+                fields[name] = _account(cls, value)
+        for name in _ACCOUNT_LISTS:
+            value = body.get(Activity._attribute_map[name]["key"])
+            if value is not None:
+                if not isinstance(value, list):
+                    raise _NotSimple()
+                fields[name] = [_account(ChannelAccount, member) for member in value]
+        for name, key, data_type in _DATE_FIELDS:
+            value = body.get(key)
+            if value is not None:
+                fields[name] = _DESERIALIZER.deserialize_data(value, data_type)
+        super(_LazyActivity, self).__init__(**fields)
+
+        self._lazy = {}
+        for name, key in _LAZY_FIELDS:
+            value = body.get(key)
+            if value is not None:
+                # Removed so that reading it goes through __getattr__.
+                del self.__dict__[name]
+                self._lazy[name] = value
+
+    def __copy__(self):
+        # The copies must not share the fields still to deserialize.
+        clone = _LazyActivity.__new__(_LazyActivity)
+        clone.__dict__.update(self.__dict__)
+        clone._lazy = dict(self._lazy)
+        return clone
+
+    def __getattr__(self, name: str):
+        lazy = self.__dict__.get("_lazy")
+        if not lazy or name not in lazy:
+            raise AttributeError(name)
+        value = _DESERIALIZER.deserialize_data(
+            lazy.pop(name), Activity._attribute_map[name]["type"]
+        )
+        setattr(self, name, value)
+        return value
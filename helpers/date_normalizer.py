@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Normalization of the dates extracted by the recognizers to TIMEX strings."""
+import calendar
+import datetime
+import functools
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from dateutil import parser
+
+_MONTHS = {
+    name: number
+    for number in range(1, 13)
+    for name in (
+        calendar.month_name[number].lower(),
+        calendar.month_abbr[number].lower(),
+    )
+}
+_MONTHS["sept"] = 9
+_MONTH = "(?P<month>" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + ")"
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+# Forms parsed without dateutil, they resolve to the same components it finds.
+_FAST_PATHS = [
+    re.compile(r"^(?P<year>\d{4})-(?P<month_number>\d{1,2})-(?P<day>\d{1,2})$"),
+    re.compile(rf"^(?P<day>\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?{_MONTH}(?:,?\s+(?P<year>\d{{4}}))?$"),
+    re.compile(rf"^{_MONTH}\s+(?P<day>\d{{1,2}}){_ORDINAL}(?:,?\s+(?P<year>\d{{4}}))?$"),
+]
+_WHITESPACE = re.compile(r"\s+")
+
+# Two leap years, months and days: a component dateutil takes from the default is
+# told apart by parsing with both.
+_DEFAULTS = (datetime.datetime(2000, 1, 1), datetime.datetime(2004, 2, 2))
+
+
+class NormalizedDate(NamedTuple):
+    """TIMEX of a date, ie "XXXX-08-23", and which of its components were given."""
+
+    timex: str
+    year: bool
+    month: bool
+    day: bool
+
+
+class DateNormalizer:
+    """
+    Turns raw date strings into TIMEX with a single parse per distinct string.
+
+    The strings are lower-cased and their whitespace collapsed, then matched against
+    compiled regular expressions for the common forms ("2022-08-23", "23 aug 2022",
+    "august 23rd") before falling back to dateutil. The last `max_entries` results
+    are kept in an LRU cache.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.fast_path_hits = 0
+        self.dateutil_parses = 0
+        self._cached_parse = functools.lru_cache(maxsize=max_entries)(self._parse)
+
+    def normalize(self, text: str) -> Optional[NormalizedDate]:
+        """Return the normalized `text`, None when it is not a date."""
+        return self._cached_parse(_WHITESPACE.sub(" ", (text or "").strip()).lower())
+
+    def normalize_many(self, texts: Iterable[str]) -> List[Optional[NormalizedDate]]:
+        """Normalize a batch of strings, each distinct string is parsed once."""
+        texts = list(texts)
+        results = {text: self.normalize(text) for text in dict.fromkeys(texts)}
+        return [results[text] for text in texts]
+
+    def cache_info(self):
+        return self._cached_parse.cache_info()
+
+    def _parse(self, text: str) -> Optional[NormalizedDate]:
+        for pattern in _FAST_PATHS:
+            match = pattern.match(text)
+            if match:
+                self.fast_path_hits += 1
+                groups = match.groupdict()
+                month = groups.get("month")
+                return _to_timex(
+                    int(groups["year"]) if groups.get("year") else None,
+                    _MONTHS[month] if month else int(groups["month_number"]),
+                    int(groups["day"]),
+                )
+
+        self.dateutil_parses += 1
+        components = dateutil_components(text)
+        if components is None:
+            return None
+        return _to_timex(*components)
+
+
+def dateutil_components(text: str) -> Optional[Tuple[Optional[int], Optional[int], Optional[int]]]:
+    """Year, month and day dateutil finds in `text`, None for the ones not given."""
+    try:
+        first, second = (parser.parse(text, default=default) for default in _DEFAULTS)
+    except (ValueError, OverflowError):
+        return None
+    return tuple(
+        getattr(first, name) if getattr(first, name) == getattr(second, name) else None
+        for name in ("year", "month", "day")
+    )
+
+
+def _to_timex(year: int, month: int, day: int) -> Optional[NormalizedDate]:
+    # Check the explicit components, using a leap year when the year is not given.
+    try:
+        datetime.date(year or 2000, month or 1, day or 1)
+    except ValueError:
+        return None
+
+    return NormalizedDate(
+        timex="-".join([
+            f"{year:04d}" if year else "XXXX",
+            f"{month:02d}" if month else "XX",
+            f"{day:02d}" if day else "XX",
+        ]),
+        year=year is not None,
+        month=month is not None,
+        day=day is not None,
+    )
@@ -1,8 +1,82 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 """Utility to run dialogs."""
-from botbuilder.core import StatePropertyAccessor, TurnContext
-from botbuilder.dialogs import Dialog, DialogSet, DialogTurnStatus
+from types import MappingProxyType
+
+from botbuilder.core import (
+    BotAdapter,
+    ComponentRegistration,
+    StatePropertyAccessor,
+    TurnContext,
+)
+from botbuilder.dialogs import (
+    Dialog,
+    DialogExtensions,
+    DialogSet,
+    DialogsComponentRegistration,
+    DialogTurnResult,
+    DialogTurnStatus,
+)
+from botbuilder.dialogs.memory import (
+    ComponentMemoryScopesBase,
+    ComponentPathResolversBase,
+    DialogStateManagerConfiguration,
+)
+from botframework.connector.auth import ClaimsIdentity, SkillValidation
+
+
+def dialog_state_configuration() -> DialogStateManagerConfiguration:
+    """Memory scopes and path resolvers of the registered components, as DialogStateManager finds them."""
+    ComponentRegistration.add(DialogsComponentRegistration())
+    configuration = DialogStateManagerConfiguration()
+    for component in ComponentRegistration.get_components():
+        if isinstance(component, ComponentMemoryScopesBase):
+            configuration.memory_scopes.extend(component.get_memory_scopes())
+        if isinstance(component, ComponentPathResolversBase):
+            configuration.path_resolvers.extend(component.get_path_resolvers())
+    return configuration
+
+
+class DialogRegistry(DialogSet):
+    """
+    DialogSet of a root dialog, built once and shared by every turn: a turn only
+    binds the dialog state of its conversation in `run`. Dialogs cannot be added
+    once it is built.
+
+    The dialog state manager configuration, which the first DialogContext of each
+    turn would otherwise rebuild from the registered components, is also built
+    once; its memory scopes and path resolvers keep no state of their own.
+    """
+
+    def __init__(self, dialog_state: StatePropertyAccessor, dialog: Dialog):
+        super(DialogRegistry, self).__init__(dialog_state)
+        super(DialogRegistry, self).add(dialog)
+        self._dialogs = MappingProxyType(self._dialogs)
+        self.dialog = dialog
+        self.state_configuration = dialog_state_configuration()
+
+    def add(self, dialog: Dialog):
+        raise TypeError("DialogRegistry.add(): the registry is immutable.")
+
+    async def run(self, turn_context: TurnContext) -> DialogTurnResult:
+        """Continue the active dialog of the conversation, or begin the root dialog."""
+        turn_context.turn_state.setdefault(
+            DialogStateManagerConfiguration.__name__, self.state_configuration
+        )
+        identity = turn_context.turn_state.get(BotAdapter.BOT_IDENTITY_KEY)
+        if isinstance(identity, ClaimsIdentity) and SkillValidation.is_skill_claim(
+            identity.claims
+        ):
+            # Called as a skill: end of conversation and reprompt handling.
+            return await DialogExtensions.run_dialog(
+                self.dialog, turn_context, self._dialog_state
+            )
+
+        dialog_context = await self.create_context(turn_context)
+        results = await dialog_context.continue_dialog()
+        if results.status == DialogTurnStatus.Empty:
+            results = await dialog_context.begin_dialog(self.dialog.id)
+        return results
 
 
 class DialogHelper:
@@ -12,11 +86,5 @@ class DialogHelper:
     async def run_dialog(
         dialog: Dialog, turn_context: TurnContext, accessor: StatePropertyAccessor
     ):  # pylint: disable=line-too-long
-        """Run dialog."""
-        dialog_set = DialogSet(accessor)
-        dialog_set.add(dialog)
-
-        dialog_context = await dialog_set.create_context(turn_context)
-        results = await dialog_context.continue_dialog()
-        if results.status == DialogTurnStatus.Empty:
-            await dialog_context.begin_dialog(dialog.id)
+        """Run dialog. Bots running the same dialog every turn keep a DialogRegistry."""
+        await DialogRegistry(accessor, dialog).run(turn_context)
@@ -1,31 +1,24 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
+import sys
 from enum import Enum
 from typing import Dict
 from botbuilder.ai.luis import LuisRecognizer
 from botbuilder.core import IntentScore, TopIntent, TurnContext
-from dateutil import parser
 from booking_details import BookingDetails
+from telemetry import span
+from .date_normalizer import DateNormalizer
 
+# Shared by every turn, the same dates come back again and again.
+DATE_NORMALIZER = DateNormalizer()
 
-def get_timex(or_date):
-    date = parser.parse(or_date)
-    date_str = parser.parse(or_date).strftime("%Y-%m-%d")
-
-    year, month, day = date_str.split('-')
-
-    if day not in or_date:
-        day = "XX"
-
-    if date.strftime("%b").lower() not in or_date:
-        month = "XX"
 
-    if year not in or_date:
-        year = "XXXX"
-
-    final_date = f"{year}-{month}-{day}"
+def get_timex(or_date):
+    normalized = DATE_NORMALIZER.normalize(or_date)
+    if normalized is None:
+        raise ValueError(f"Unknown date format: {or_date}")
 
-    return final_date
+    return normalized.timex
 
 
 class Intent(Enum):
@@ -57,7 +50,8 @@ class LuisHelper:
         intent = None
 
         try:
-            recognizer_result = await luis_recognizer.recognize(turn_context)
+            with span("recognize"):
+                recognizer_result = await luis_recognizer.recognize(turn_context)
 
             intent = (
                 sorted(
@@ -111,6 +105,10 @@ class LuisHelper:
                 result.turns.append(recognizer_result.text)
 
         except Exception as exception:
-            print(exception)
+            # The intent is left to None, ie for MainDialog to try its fallback recognizer.
+            print(
+                f"[LuisHelper] recognition failed: {type(exception).__name__}: {exception}",
+                file=sys.stderr,
+            )
 
         return intent, result
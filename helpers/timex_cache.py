@@ -0,0 +1,32 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Shared cache of the TIMEX resolutions used by the date dialogs."""
+import functools
+from typing import FrozenSet, NamedTuple, Optional
+
+from datatypes_date_time.timex import Timex
+
+
+class TimexResolution(NamedTuple):
+    """What the dialogs need to know about a TIMEX string."""
+
+    types: FrozenSet[str]
+    definite: bool
+    # "YYYY-MM-DD" when the TIMEX is a definite date.
+    date: Optional[str]
+
+
+@functools.lru_cache(maxsize=1024)
+def resolve_timex(timex: str) -> TimexResolution:
+    """Parse `timex` once, the same strings come back on every turn of a booking."""
+    timex_property = Timex(timex)
+    types = frozenset(timex_property.types)
+    definite = "definite" in types
+
+    date = None
+    if definite and "date" in types:
+        date = (
+            f"{timex_property.year:04d}-{timex_property.month:02d}"
+            f"-{timex_property.day_of_month:02d}"
+        )
+    return TimexResolution(types=types, definite=definite, date=date)
@@ -0,0 +1,19 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Recognition module."""
+
+from .prediction_cache import PredictionCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .fast_path import FastPathRecognizer, Gazetteer
+from .local_recognizer import LocalRecognizer
+from .luis_client import LuisHttpClient
+
+__all__ = [
+    "PredictionCache",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "FastPathRecognizer",
+    "Gazetteer",
+    "LocalRecognizer",
+    "LuisHttpClient",
+]
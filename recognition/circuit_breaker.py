@@ -0,0 +1,166 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Circuit breaker failing fast while a remote dependency is unhealthy."""
+
+import time
+from collections import deque
+
+from botbuilder.core import BotTelemetryClient, NullTelemetryClient
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the dependency while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker with half-open probing.
+
+    The circuit opens when, over the last `window` calls (and at least `min_calls`),
+    the failure rate reaches `failure_rate` or the rate of calls slower than
+    `slow_call_seconds` reaches `slow_call_rate`. After `open_seconds` it lets
+    `half_open_probes` calls through: if they all succeed the circuit closes, the
+    first failure opens it again. State transitions and the time spent degraded
+    are sent to telemetry.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        telemetry_client: BotTelemetryClient = None,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.telemetry_client = telemetry_client or NullTelemetryClient()
+        self._clock = clock
+
+        self._state = CircuitBreaker.CLOSED
+        self._calls = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._degraded_since = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        self.rejected = 0
+        self.degraded_seconds = 0.0
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == CircuitBreaker.OPEN
+            and self._clock() - self._opened_at >= self.open_seconds
+        ):
+            self._transition(CircuitBreaker.HALF_OPEN)
+        return self._state
+
+    @property
+    def is_degraded(self) -> bool:
+        return self.state != CircuitBreaker.CLOSED
+
+    async def call(self, function, *args):
+        """Await `function(*args)` through the breaker and record its outcome."""
+        self.before_call()
+        start = self._clock()
+        try:
+            result = await function(*args)
+        except Exception:
+            self.record_failure(self._clock() - start)
+            raise
+        except BaseException:
+            # Cancelled by the caller, says nothing about the dependency.
+            if self._state == CircuitBreaker.HALF_OPEN:
+                self._probes_in_flight -= 1
+            raise
+        self.record_success(self._clock() - start)
+        return result
+
+    def before_call(self) -> None:
+        """Reserve a call, raise CircuitOpenError when it must not reach the dependency."""
+        state = self.state
+        if state == CircuitBreaker.OPEN or (
+            state == CircuitBreaker.HALF_OPEN
+            and self._probes_in_flight >= self.half_open_probes
+        ):
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is {state}")
+
+        if state == CircuitBreaker.HALF_OPEN:
+            self._probes_in_flight += 1
+
+    def record_success(self, elapsed: float) -> None:
+        if self._state == CircuitBreaker.HALF_OPEN:
+            self._probes_in_flight -= 1
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(CircuitBreaker.CLOSED)
+            return
+
+        self._record(failed=False, slow=elapsed >= self.slow_call_seconds)
+
+    def record_failure(self, elapsed: float) -> None:
+        if self._state == CircuitBreaker.HALF_OPEN:
+            self._probes_in_flight -= 1
+            self._transition(CircuitBreaker.OPEN)
+            return
+
+        self._record(failed=True, slow=elapsed >= self.slow_call_seconds)
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        if self._state != CircuitBreaker.CLOSED:
+            # A call started before the circuit opened, its outcome is stale.
+            return
+
+        self._calls.append((failed, slow))
+        if len(self._calls) < self.min_calls:
+            return
+
+        failures = sum(1 for call_failed, _ in self._calls if call_failed)
+        slow_calls = sum(1 for _, call_slow in self._calls if call_slow)
+        if (
+            failures / len(self._calls) >= self.failure_rate
+            or slow_calls / len(self._calls) >= self.slow_call_rate
+        ):
+            self._transition(CircuitBreaker.OPEN)
+
+    def _transition(self, state: str) -> None:
+        previous, self._state = self._state, state
+        now = self._clock()
+        measurements = {}
+
+        if state == CircuitBreaker.OPEN:
+            self._opened_at = now
+            if self._degraded_since is None:
+                self._degraded_since = now
+        elif state == CircuitBreaker.HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self._calls.clear()
+            if self._degraded_since is not None:
+                degraded = now - self._degraded_since
+                self.degraded_seconds += degraded
+                measurements["degradedSeconds"] = degraded
+                self._degraded_since = None
+
+        self.telemetry_client.track_event(
+            "CircuitBreakerStateChanged",
+            properties={"circuit": self.name, "from": previous, "to": state},
+            measurements=measurements,
+        )
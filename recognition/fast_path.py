@@ -0,0 +1,238 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Local rule based recognizer resolving structured utterances without calling LUIS."""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from botbuilder.core import (
+    BotTelemetryClient,
+    IntentScore,
+    Recognizer,
+    RecognizerResult,
+    TurnContext,
+)
+
+from telemetry import MetricsReporter
+
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+DATE_PATTERN = re.compile(
+    r"\b(?:"
+    r"\d{4}-\d{1,2}-\d{1,2}"
+    r"|\d{1,2}/\d{1,2}/\d{2,4}"
+    rf"|\d{{1,2}}{_ORDINAL}\s+(?:of\s+)?{_MONTH}(?:,?\s+\d{{4}})?"
+    rf"|{_MONTH}\s+\d{{1,2}}{_ORDINAL}(?:,?\s+\d{{4}})?"
+    r")\b",
+    re.IGNORECASE,
+)
+MONEY_PATTERN = re.compile(
+    r"(?:(?P<prefix>[$€£])\s?(?P<amount>\d[\d,]*(?:\.\d+)?)"
+    r"|(?P<amount2>\d[\d,]*(?:\.\d+)?)\s?(?:(?P<suffix>[$€£])|(?P<word>euros?|dollars?|usd|eur)\b))",
+    re.IGNORECASE,
+)
+TOKEN_PATTERN = re.compile(r"[$€£]|\w+")
+
+BOOKING_KEYWORDS = frozenset(
+    ["book", "booking", "flight", "flights", "fly", "travel", "travelling", "trip", "go", "going"]
+)
+# Words that carry no information once the entities have been extracted.
+FILLER_WORDS = frozenset(
+    [
+        "i", "a", "an", "the", "me", "my", "to", "from", "on", "for", "in", "of", "and",
+        "want", "would", "like", "need", "please", "can", "you", "we", "with", "until",
+        "till", "between", "returning", "return", "back", "leaving", "budget", "max",
+        "maximum", "maximun", "spend", "at", "most", "around", "about", "is", "be",
+    ]
+)
+
+
+class Gazetteer:
+    """Compiled matcher over the canonical forms and synonyms of a LUIS closed list."""
+
+    def __init__(self, entries: Dict[str, str]):
+        # Longest synonyms first so that "new york" wins over a hypothetical "york".
+        synonyms = sorted(entries, key=len, reverse=True)
+        self._canonical = {synonym.lower(): canonical for synonym, canonical in entries.items()}
+        self._pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(synonym) for synonym in synonyms) + r")\b",
+            re.IGNORECASE,
+        ) if synonyms else None
+
+    @classmethod
+    def from_luis_model(cls, path: str, list_name: str = "Airport") -> "Gazetteer":
+        with open(path, encoding="utf-8") as model_file:
+            model = json.load(model_file)
+
+        entries = {}
+        for closed_list in model.get("closedLists", []):
+            if closed_list["name"] != list_name:
+                continue
+            for sub_list in closed_list["subLists"]:
+                canonical = sub_list["canonicalForm"]
+                entries[canonical] = canonical
+                for synonym in sub_list["list"]:
+                    entries[synonym] = canonical
+        return cls(entries)
+
+    def canonical_forms(self) -> List[str]:
+        return sorted(set(self._canonical.values()))
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """Return the (start, end, canonical form) of every entry found in `text`."""
+        if self._pattern is None:
+            return []
+        return [
+            (match.start(), match.end(), self._canonical[match.group(0).lower()])
+            for match in self._pattern.finditer(text)
+        ]
+
+
+class FastPathRecognizer(Recognizer):
+    """
+    Composite recognizer running local extractors before falling through to LUIS.
+
+    The gazetteer and the money/date extractors resolve the utterance locally when
+    it is a booking request made only of known entities and filler words. Anything
+    else, or a confidence below `threshold`, is sent to the wrapped recognizer. The
+    result has the same shape as the one LuisHelper.execute_luis_query consumes.
+
+    It wraps the recognizer of MainDialog.act_step, the only one calling LUIS: the
+    answers to the BookingDialog prompts are taken as typed and are not recognized.
+
+    The numbers of local and remote resolutions are sent as metrics every
+    `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        recognizer: Recognizer,
+        gazetteer: Gazetteer,
+        threshold: float = 0.85,
+        telemetry_client: BotTelemetryClient = None,
+        report_interval: float = 60.0,
+    ):
+        self._recognizer = recognizer
+        self._gazetteer = gazetteer
+        self.threshold = threshold
+        self._reporter = MetricsReporter(
+            "FastPathRecognizer", self.metrics, telemetry_client, interval=report_interval
+        )
+
+        self.local_resolutions = 0
+        self.remote_resolutions = 0
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "local_resolutions": self.local_resolutions,
+            "remote_resolutions": self.remote_resolutions,
+        }
+
+    @property
+    def is_configured(self) -> bool:
+        return self._recognizer.is_configured
+
+    @property
+    def is_degraded(self) -> bool:
+        return getattr(self._recognizer, "is_degraded", False)
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        result, confidence = self.match(turn_context.activity.text)
+
+        if result is not None and confidence >= self.threshold:
+            self.local_resolutions += 1
+        else:
+            self.remote_resolutions += 1
+            result = await self._recognizer.recognize(turn_context)
+
+        self._reporter.report()
+        return result
+
+    def match(self, text: str) -> Tuple[Optional[RecognizerResult], float]:
+        """Run the local extractors, return the result and its confidence."""
+        text = text or ""
+        tokens = [(token.start(), token.end(), token.group(0).lower()) for token in TOKEN_PATTERN.finditer(text)]
+        if not tokens:
+            return None, 0.0
+
+        spans = []
+        entities = {}
+
+        dates = []
+        for match in DATE_PATTERN.finditer(text):
+            spans.append((match.start(), match.end()))
+            dates.append(match.group(0))
+        if dates:
+            entities["str_date"] = [dates[0]]
+        if len(dates) > 1:
+            entities["end_date"] = [dates[1]]
+
+        for match in MONEY_PATTERN.finditer(text):
+            if _overlaps(match.start(), match.end(), spans):
+                continue
+            spans.append((match.start(), match.end()))
+            symbol = match.group("prefix") or match.group("suffix")
+            if symbol:
+                amount = match.group("amount") or match.group("amount2")
+                entities.setdefault("budget", [f"{symbol} {amount}"])
+            else:
+                entities.setdefault("budget", [match.group(0)])
+
+        for start, end, canonical in self._gazetteer.find(text):
+            if _overlaps(start, end, spans):
+                continue
+            spans.append((start, end))
+            previous = _previous_word(tokens, start)
+            if previous == "from":
+                entities.setdefault("or_city", [canonical])
+            elif previous == "to":
+                entities.setdefault("dst_city", [canonical])
+            else:
+                # A city without a preposition is ambiguous, leave it to LUIS.
+                return None, 0.0
+
+        has_keyword = False
+        covered = 0
+        previous = None
+        for start, end, token in tokens:
+            if _overlaps(start, end, spans) or token in FILLER_WORDS:
+                covered += 1
+            elif token in BOOKING_KEYWORDS:
+                covered += 1
+                has_keyword = True
+            elif previous in ("from", "to"):
+                # Most likely a city missing from the gazetteer.
+                return None, 0.0
+            previous = token
+
+        if not has_keyword:
+            return None, 0.0
+
+        confidence = covered / len(tokens)
+        return (
+            RecognizerResult(
+                text=text,
+                altered_text=None,
+                intents={"book": IntentScore(confidence)},
+                entities=entities,
+            ),
+            confidence,
+        )
+
+
+def _overlaps(start: int, end: int, spans: List[Tuple[int, int]]) -> bool:
+    return any(start < span_end and span_start < end for span_start, span_end in spans)
+
+
+def _previous_word(tokens: List[Tuple[int, int, str]], position: int) -> Optional[str]:
+    previous = None
+    for start, _, token in tokens:
+        if start >= position:
+            break
+        previous = token
+    return previous
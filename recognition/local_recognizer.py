@@ -0,0 +1,338 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""In-process intent classifier and entity tagger replacing LUIS when offline."""
+
+import json
+import os
+import random
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+
+from botbuilder.core import IntentScore, Recognizer, RecognizerResult, TurnContext
+
+from .fast_path import DATE_PATTERN, MONEY_PATTERN, TOKEN_PATTERN, Gazetteer
+
+# LUIS model intent names mapped to the ones LuisHelper expects.
+INTENT_NAMES = {"Book flight": "book", "None": "NoneIntent"}
+# LUIS model composite entities mapped to the BookingDetails fields.
+ENTITY_NAMES = {"From": "or_city", "To": "dst_city"}
+
+OUTSIDE = "O"
+ENTITY_LABELS = [OUTSIDE, "or_city", "dst_city", "budget", "str_date", "end_date"]
+
+# Templates expanding the few labelled utterances we have, {name} is an entity slot.
+BOOKING_TEMPLATES = [
+    "book a flight from {or_city} to {dst_city}",
+    "i want to book a flight from {or_city} to {dst_city}",
+    "i want to go to {dst_city} from {or_city}",
+    "fly me to {dst_city}",
+    "i would like to travel to {dst_city} on {str_date}",
+    "from {or_city} to {dst_city} on {str_date} for {budget}",
+    "i want to travel from the {str_date} until {end_date}",
+    "leaving on {str_date} and returning on {end_date}",
+    "book a trip to {dst_city} from {str_date} to {end_date}",
+    "i want to spend maximum {budget}",
+    "my budget is {budget}",
+    "a trip from {or_city} to {dst_city}, from {str_date} to {end_date} for {budget}",
+]
+NONE_UTTERANCES = ["hello", "hi", "thanks", "thank you", "what can you do", "how are you", "ok"]
+DATE_SAMPLES = ["12 aug 2022", "15 september 2022", "feb 14th", "may 5th", "2022-10-10", "23/08/2022", "1st of june"]
+BUDGET_SAMPLES = ["$500", "$ 1200", "300 euros", "800 dollars", "€250"]
+CITY_SAMPLES = ["Marseille", "Rome", "Madrid", "Tokyo", "Lyon", "Toronto"]
+
+
+class TrainingExample(NamedTuple):
+    text: str
+    intent: str
+    # (start, end, entity name) character spans, end excluded.
+    spans: List[Tuple[int, int, str]]
+
+
+def load_luis_examples(path: str) -> List[TrainingExample]:
+    """Read the labelled utterances of a LUIS model export."""
+    with open(path, encoding="utf-8") as model_file:
+        model = json.load(model_file)
+
+    examples = []
+    for utterance in model.get("utterances", []):
+        spans = [
+            (entity["startPos"], entity["endPos"] + 1, ENTITY_NAMES[entity["entity"]])
+            for entity in utterance.get("entities", [])
+            if entity["entity"] in ENTITY_NAMES
+        ]
+        intent = INTENT_NAMES.get(utterance["intent"], utterance["intent"])
+        examples.append(TrainingExample(utterance["text"], intent, spans))
+    return examples
+
+
+def load_new_data_examples(turns: Iterable[dict]) -> List[TrainingExample]:
+    """Build booking examples from the {"text", "labels"} turns of new_data."""
+    examples = []
+    for turn in turns:
+        text = turn["text"]
+        lowered = text.lower()
+        spans = []
+        for name, value in turn["labels"].items():
+            if not value or name not in ENTITY_LABELS:
+                continue
+            start = lowered.find(str(value).lower())
+            if start < 0:
+                continue
+            spans.append((start, start + len(str(value)), name))
+        examples.append(TrainingExample(text, "book", spans))
+    return examples
+
+
+def template_examples(cities: List[str], seed: int = 0) -> List[TrainingExample]:
+    """Fill BOOKING_TEMPLATES with sampled values, plus a few None examples."""
+    generator = random.Random(seed)
+    samples = {
+        "or_city": cities,
+        "dst_city": cities,
+        "str_date": DATE_SAMPLES,
+        "end_date": DATE_SAMPLES,
+        "budget": BUDGET_SAMPLES,
+    }
+
+    examples = []
+    for template in BOOKING_TEMPLATES:
+        for _ in range(8):
+            text, spans = "", []
+            for literal, name in re.findall(r"([^{]*)(?:\{(\w+)\})?", template):
+                text += literal
+                if name:
+                    value = generator.choice(samples[name])
+                    spans.append((len(text), len(text) + len(value), name))
+                    text += value
+            examples.append(TrainingExample(text, "book", spans))
+    examples += [TrainingExample(text, "NoneIntent", []) for text in NONE_UTTERANCES]
+    return examples
+
+
+def load_new_data_turns(path: str = "new_data.json", store=None) -> List[dict]:
+    """Return the legacy new_data.json turns followed by the ones of `store`."""
+    turns = []
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as json_file:
+            turns.extend(json.load(json_file)["turns"])
+    if store is not None:
+        turns.extend(record for key, record in store.read() if key == "turns")
+    return turns
+
+
+class HashedLinearModel:
+    """Softmax classifier over hashed sparse features, trained with NumPy."""
+
+    def __init__(self, labels: List[str], dimensions: int = 2 ** 15):
+        self.labels = labels
+        self.dimensions = dimensions
+        self.weights = np.zeros((dimensions, len(labels)), dtype=np.float32)
+        self.bias = np.zeros(len(labels), dtype=np.float32)
+
+    def indices(self, features: List[str]) -> np.ndarray:
+        return np.fromiter(
+            (_feature_index(feature, self.dimensions) for feature in features),
+            dtype=np.int64,
+            count=len(features),
+        )
+
+    def fit(
+        self,
+        samples: List[List[str]],
+        targets: List[str],
+        epochs: int = 150,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+    ) -> "HashedLinearModel":
+        rows = np.concatenate(
+            [np.full(len(features), row, dtype=np.int64) for row, features in enumerate(samples)]
+        )
+        cols = np.concatenate([self.indices(features) for features in samples])
+        truth = np.zeros((len(samples), len(self.labels)), dtype=np.float32)
+        truth[np.arange(len(samples)), [self.labels.index(t) for t in targets]] = 1.0
+
+        for _ in range(epochs):
+            logits = np.zeros_like(truth)
+            np.add.at(logits, rows, self.weights[cols])
+            logits += self.bias
+            gradient = (_softmax(logits) - truth) / len(samples)
+
+            weights_gradient = np.zeros_like(self.weights)
+            np.add.at(weights_gradient, cols, gradient[rows])
+            self.weights -= learning_rate * (weights_gradient + l2 * self.weights)
+            self.bias -= learning_rate * gradient.sum(axis=0)
+        return self
+
+    def predict_proba(self, samples: List[List[str]]) -> np.ndarray:
+        rows = np.repeat(np.arange(len(samples)), [len(features) for features in samples])
+        cols = self.indices([feature for features in samples for feature in features])
+        logits = np.zeros((len(samples), len(self.labels)), dtype=np.float32)
+        np.add.at(logits, rows, self.weights[cols])
+        return _softmax(logits + self.bias)
+
+
+class LocalRecognizer(Recognizer):
+    """
+    Offline replacement of the LUIS recognizer.
+
+    A hashed n-gram intent classifier and a token tagger are trained in-process from
+    the LUIS model export, the accumulated new_data turns and BOOKING_TEMPLATES
+    expansions. Results have the shape
+    of a LUIS v2 prediction (only the top scoring intent, entity values as written
+    in the utterance) so that LuisHelper.execute_luis_query consumes them unchanged.
+    """
+
+    def __init__(self, gazetteer: Gazetteer, dimensions: int = 2 ** 15):
+        self._gazetteer = gazetteer
+        self._intents = None
+        self._tagger = HashedLinearModel(ENTITY_LABELS, dimensions)
+        self._dimensions = dimensions
+
+    @classmethod
+    def from_sources(
+        cls,
+        model_path: str,
+        new_data_path: str = "new_data.json",
+        new_data_store=None,
+        held_out: Iterable[str] = (),
+    ) -> "LocalRecognizer":
+        """
+        Train on the model export, the new_data turns and the templates. The examples
+        containing one of the `held_out` utterances, ie the ones a benchmark scores
+        the recognizer on, are left out.
+        """
+        gazetteer = Gazetteer.from_luis_model(model_path)
+        examples = load_luis_examples(model_path)
+        examples += load_new_data_examples(load_new_data_turns(new_data_path, new_data_store))
+        examples += template_examples(gazetteer.canonical_forms() + CITY_SAMPLES)
+        held_out = [utterance.lower() for utterance in held_out]
+        if held_out:
+            examples = [
+                example for example in examples
+                if not any(utterance in example.text.lower() for utterance in held_out)
+            ]
+        return cls(gazetteer).fit(examples)
+
+    @property
+    def is_configured(self) -> bool:
+        return self._intents is not None
+
+    def fit(self, examples: List[TrainingExample]) -> "LocalRecognizer":
+        intents = sorted({example.intent for example in examples})
+        self._intents = HashedLinearModel(intents, self._dimensions).fit(
+            [self._intent_features(example.text) for example in examples],
+            [example.intent for example in examples],
+        )
+
+        token_features, token_labels = [], []
+        for example in examples:
+            tokens = self._tokenize(example.text)
+            token_features.extend(self._token_features(example.text, tokens))
+            for start, end, _ in tokens:
+                token_labels.append(
+                    next(
+                        (name for span_start, span_end, name in example.spans
+                         if span_start <= start and end <= span_end),
+                        OUTSIDE,
+                    )
+                )
+        self._tagger.fit(token_features, token_labels)
+        return self
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        return self.predict(turn_context.activity.text)
+
+    def predict(self, text: str) -> RecognizerResult:
+        text = text or ""
+        probabilities = self._intents.predict_proba([self._intent_features(text)])[0]
+        best = int(probabilities.argmax())
+
+        entities = {}
+        tokens = self._tokenize(text)
+        if tokens:
+            labels = self._tagger.predict_proba(self._token_features(text, tokens)).argmax(axis=1)
+            span_start, span_end, span_label = None, None, OUTSIDE
+            for (start, end, _), label in zip(tokens, labels):
+                label = ENTITY_LABELS[label]
+                if label == span_label and label != OUTSIDE:
+                    span_end = end
+                    continue
+                if span_label != OUTSIDE:
+                    entities.setdefault(span_label, []).append(text[span_start:span_end])
+                span_start, span_end, span_label = start, end, label
+            if span_label != OUTSIDE:
+                entities.setdefault(span_label, []).append(text[span_start:span_end])
+
+        return RecognizerResult(
+            text=text,
+            altered_text=None,
+            intents={self._intents.labels[best]: IntentScore(float(probabilities[best]))},
+            entities=entities,
+        )
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[int, int, str]]:
+        return [
+            (token.start(), token.end(), token.group(0).lower())
+            for token in TOKEN_PATTERN.finditer(text)
+        ]
+
+    @staticmethod
+    def _intent_features(text: str) -> List[str]:
+        words = ["<s>"] + [token.group(0).lower() for token in TOKEN_PATTERN.finditer(text)] + ["</s>"]
+        features = ["bias"]
+        features += ["w:" + word for word in words[1:-1]]
+        features += ["b:" + first + " " + second for first, second in zip(words, words[1:])]
+        return features
+
+    def _token_features(self, text: str, tokens: List[Tuple[int, int, str]]) -> List[List[str]]:
+        markers = [[] for _ in tokens]
+
+        def mark(start: int, end: int, marker: str):
+            for index, (token_start, token_end, _) in enumerate(tokens):
+                if token_start < end and start < token_end:
+                    markers[index].append(marker)
+
+        for rank, match in enumerate(DATE_PATTERN.finditer(text)):
+            mark(match.start(), match.end(), f"date#{min(rank, 1)}")
+        for match in MONEY_PATTERN.finditer(text):
+            mark(match.start(), match.end(), "money")
+        for start, end, _ in self._gazetteer.find(text):
+            mark(start, end, "gazetteer")
+
+        words = [token for _, _, token in tokens]
+        features = []
+        for index, word in enumerate(words):
+            previous = words[index - 1] if index > 0 else "<s>"
+            before = words[index - 2] if index > 1 else "<s>"
+            following = words[index + 1] if index + 1 < len(words) else "</s>"
+            shape = "d" if word.isdigit() else "a" if word.isalpha() else "o"
+            token_features = [
+                "bias",
+                "w:" + word,
+                "p:" + previous,
+                "pp:" + before,
+                "n:" + following,
+                "shape:" + shape,
+                "suffix:" + word[-3:],
+                "shape&p:" + shape + previous,
+            ]
+            for marker in markers[index]:
+                token_features += [marker, marker + "&p:" + previous, marker + "&pp:" + before]
+            features.append(token_features)
+        return features
+
+
+@lru_cache(maxsize=65536)
+def _feature_index(feature: str, dimensions: int) -> int:
+    # crc32 is stable across processes, unlike hash().
+    return zlib.crc32(feature.encode("utf-8")) % dimensions
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -0,0 +1,152 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Pooled, single-flight LUIS v2 prediction client."""
+
+import asyncio
+import functools
+import json
+from typing import Dict
+
+import aiohttp
+from azure.cognitiveservices.language.luis.runtime import models
+from botbuilder.ai.luis import LuisApplication
+from botbuilder.ai.luis.luis_util import LuisUtil
+from botbuilder.core import RecognizerResult
+from msrest import Deserializer
+
+_DESERIALIZER = Deserializer(
+    {name: model for name, model in models.__dict__.items() if isinstance(model, type)}
+)
+
+
+class LuisHttpClient:
+    """
+    Calls the LUIS v2 prediction endpoint through one shared, keep-alive aiohttp session.
+
+    At most `max_concurrency` requests are in flight. Concurrent predictions of the
+    same utterance share a single request, which runs in a task of its own: a caller
+    going away, the first one included, does not cancel it for the others. Every attempt is bounded by `timeout`; if an
+    attempt has not answered after `hedge_after` seconds (or failed), another one is
+    started, up to `max_attempts`, and the first successful answer wins.
+    """
+
+    def __init__(
+        self,
+        application: LuisApplication,
+        max_concurrency: int = 32,
+        timeout: float = 3.0,
+        hedge_after: float = 0.75,
+        max_attempts: int = 2,
+        staging: bool = False,
+    ):
+        self.application = application
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.staging = staging
+
+        self._url = f"{application.endpoint}/luis/v2.0/apps/{application.application_id}"
+        self._session: aiohttp.ClientSession = None
+        self._semaphore: asyncio.Semaphore = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        self.requests = 0
+        self.coalesced = 0
+        self.hedged = 0
+
+    async def predict(self, utterance: str) -> dict:
+        """Return the raw LUIS v2 prediction of `utterance`."""
+        prediction = self._in_flight.get(utterance)
+        if prediction is None:
+            prediction = asyncio.ensure_future(self._predict_hedged(utterance))
+            self._in_flight[utterance] = prediction
+            prediction.add_done_callback(functools.partial(self._forget, utterance))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(prediction)
+
+    def _forget(self, utterance: str, prediction: asyncio.Future) -> None:
+        if self._in_flight.get(utterance) is prediction:
+            del self._in_flight[utterance]
+        if not prediction.cancelled():
+            # Mark the exception as retrieved when every caller went away.
+            prediction.exception()
+
+    async def recognize(self, utterance: str) -> RecognizerResult:
+        """Return the prediction of `utterance` the way LuisRecognizer builds it."""
+        return self.to_recognizer_result(utterance, await self.predict(utterance))
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @staticmethod
+    def to_recognizer_result(utterance: str, prediction: dict) -> RecognizerResult:
+        luis_result = _DESERIALIZER("LuisResult", prediction)
+        result = RecognizerResult(
+            text=utterance,
+            altered_text=luis_result.altered_query,
+            intents=LuisUtil.get_intents(luis_result),
+            entities=LuisUtil.extract_entities_and_metadata(
+                luis_result.entities, luis_result.composite_entities, True
+            ),
+        )
+        LuisUtil.add_properties(luis_result, result)
+        return result
+
+    async def _predict_hedged(self, utterance: str) -> dict:
+        attempts = {asyncio.ensure_future(self._request(utterance))}
+        started = 1
+        last_error = None
+        try:
+            while attempts:
+                hedge = self.hedge_after if started < self.max_attempts else None
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=hedge, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    last_error = attempt.exception()
+
+                if started < self.max_attempts:
+                    # Either the slow attempt passed the hedging delay or one failed.
+                    if not done:
+                        self.hedged += 1
+                    attempts.add(asyncio.ensure_future(self._request(utterance)))
+                    started += 1
+            raise last_error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _request(self, utterance: str) -> dict:
+        session = self._get_session()
+        async with self._semaphore:
+            self.requests += 1
+            async with session.post(
+                self._url,
+                params={"verbose": "false", "staging": str(self.staging).lower(), "log": "true"},
+                data=json.dumps(utterance),
+                headers={
+                    "Ocp-Apim-Subscription-Key": self.application.endpoint_key,
+                    "Content-Type": "application/json; charset=utf-8",
+                    "User-Agent": LuisUtil.get_user_agent(),
+                },
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily: the session and the semaphore belong to the running loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_concurrency, keepalive_timeout=30
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
@@ -0,0 +1,230 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Two-tier cache of LUIS predictions."""
+
+import asyncio
+import copy
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from botbuilder.core import IntentScore, RecognizerResult
+
+TIER_MEMORY = "memory"
+TIER_DISK = "disk"
+TIER_MISS = "miss"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class PredictionCache:
+    """
+    LRU + TTL cache of recognizer results keyed on the normalized utterance.
+
+    The in-process tier is always on. When `disk_path` is set, a sqlite database in
+    WAL mode is used as a second tier so that several workers share their predictions.
+    The LUIS application id and version are part of the key: publishing a new model
+    version invalidates the cache.
+
+    `lookup` and `store` are the versions for the event loop: the disk tier is
+    read on a dedicated thread and written in the background. Its expired entries
+    are deleted every `evict_every` writes.
+    """
+
+    def __init__(
+        self,
+        application_id: str,
+        version: str = "",
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        disk_path: str = None,
+        evict_every: int = 256,
+    ):
+        self.application_id = application_id
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.evict_every = evict_every
+
+        self._memory = OrderedDict()
+        # The memory tier is used from the event loop, the connection from the disk
+        # thread: each has its own lock so that the loop never waits on sqlite.
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        self._connection = None
+        self._executor = None
+        if disk_path:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="prediction-cache"
+            )
+            self._connection = sqlite3.connect(
+                disk_path, isolation_level=None, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(utterance: str) -> str:
+        return _WHITESPACE.sub(" ", (utterance or "").strip()).lower()
+
+    def key(self, utterance: str) -> str:
+        return f"{self.application_id}:{self.version}:{self.normalize(utterance)}"
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+        }
+
+    def get(self, key: str) -> Tuple[Optional[dict], str]:
+        """Return the cached prediction for `key` and the tier that served it."""
+        value = self._get_memory(key)
+        if value is not None:
+            return value, TIER_MEMORY
+        return self._get_disk(key)
+
+    async def lookup(self, key: str) -> Tuple[Optional[dict], str]:
+        """`get` reading the disk tier off the event loop."""
+        value = self._get_memory(key)
+        if value is not None:
+            return value, TIER_MEMORY
+        if self._executor is None:
+            return self._get_disk(key)
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, self._get_disk, key
+        )
+
+    def set(self, key: str, value: dict) -> None:
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires)
+        self._set_disk(key, value, expires)
+
+    def store(self, key: str, value: dict) -> None:
+        """`set` writing the disk tier in the background."""
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires)
+        if self._executor is not None:
+            asyncio.get_event_loop().run_in_executor(
+                self._executor, self._set_disk, key, value, expires
+            )
+
+    def _get_memory(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, key: str) -> Tuple[Optional[dict], str]:
+        now = time.time()
+        row = None
+        with self._disk_lock:
+            if self._connection is not None:
+                row = self._connection.execute(
+                    "SELECT value, expires FROM predictions WHERE key = ?", (key,)
+                ).fetchone()
+        if row is not None and row[1] > now:
+            value = json.loads(row[0])
+            with self._lock:
+                self._remember(key, value, row[1])
+                self.disk_hits += 1
+            return value, TIER_DISK
+
+        with self._lock:
+            self.misses += 1
+        return None, TIER_MISS
+
+    def _set_disk(self, key: str, value: dict, expires: float) -> None:
+        with self._disk_lock:
+            if self._connection is None:
+                return
+            self._connection.execute(
+                "INSERT OR REPLACE INTO predictions (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+            self._disk_writes += 1
+            if self.evict_every and self._disk_writes % self.evict_every == 0:
+                self._connection.execute(
+                    "DELETE FROM predictions WHERE expires <= ?", (time.time(),)
+                )
+
+    def evict_expired(self) -> None:
+        """Drop expired entries from both tiers."""
+        now = time.time()
+
+        with self._lock:
+            for key in [key for key, (_, expires) in self._memory.items() if expires <= now]:
+                del self._memory[key]
+        with self._disk_lock:
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM predictions WHERE expires <= ?", (now,))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            # Lets the background writes finish first.
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._disk_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _remember(self, key: str, value: dict, expires: float) -> None:
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def to_cached(result: RecognizerResult) -> dict:
+        """Return the JSON-serializable part of `result`."""
+        return {
+            "alteredText": result.altered_text,
+            "intents": {
+                name: score.score for name, score in (result.intents or {}).items()
+            },
+            "entities": copy.deepcopy(result.entities or {}),
+            "properties": {
+                name: value
+                for name, value in (result.properties or {}).items()
+                if name != "luisResult"
+            },
+        }
+
+    @staticmethod
+    def from_cached(text: str, value: dict) -> RecognizerResult:
+        """Rebuild a recognizer result for `text` from a cached prediction."""
+        return RecognizerResult(
+            text=text,
+            altered_text=value["alteredText"],
+            intents={
+                name: IntentScore(score) for name, score in value["intents"].items()
+            },
+            entities=copy.deepcopy(value["entities"]),
+            properties=copy.deepcopy(value["properties"]),
+        )
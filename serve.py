@@ -0,0 +1,221 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""
+Pre-fork serving mode: one master process binds the port and forks workers which
+all accept on the shared socket, each with its own adapter, dialogs and bot.
+
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+
+SIGHUP starts a new generation of workers, which import the bot code again, then
+drains the previous one. SIGTERM and SIGINT drain every worker and stop. Workers
+exiting on their own are replaced. The conversation state must be shared between
+the workers, so more than one worker needs StorageBackend=sqlite, and TurnLock=file
+keeps the turns of a conversation landing on different workers from overlapping.
+"""
+import argparse
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+
+import config
+
+# A worker dying sooner than this after its start is replaced after the same delay.
+RESPAWN_DELAY = 1.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(
+    sock: socket.socket, index: int, generation: int, shutdown_timeout: float
+) -> None:
+    """Worker process: build the bot and serve the shared socket until SIGTERM."""
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Each worker spills its write-behind records to a file of its own, per generation
+    # since the previous one may still spill while draining. The files of the exited
+    # workers of the same index are replayed on start. The configuration was read by
+    # the master before these variables were set, read it again.
+    spill_path = config.DefaultConfig.WRITE_BEHIND_SPILL_PATH
+    os.environ["WriteBehindSpillPath"] = f"{spill_path}.{index}.{generation}"
+    os.environ["WriteBehindAdoptPattern"] = f"{spill_path}.{index}.*"
+    importlib.reload(config)
+
+    from aiohttp import web  # pylint: disable=import-outside-toplevel
+    import app  # pylint: disable=import-outside-toplevel
+
+    web.run_app(
+        app.init_func(None),
+        sock=sock,
+        shutdown_timeout=shutdown_timeout,
+        print=None,
+    )
+
+
+class Master:
+    """Forks `workers` processes serving `sock` and keeps them running."""
+
+    def __init__(self, sock: socket.socket, workers: int, shutdown_timeout: float):
+        self.sock = sock
+        self.worker_count = workers
+        self.shutdown_timeout = shutdown_timeout
+
+        # pid -> (worker index, start time) of the current generation
+        self.workers = {}
+        # pids of the previous generations, drained and never replaced
+        self.retired = set()
+        self._respawn_at = {}
+        self._reload_requested = False
+        self._stop_requested = False
+
+        self.spawned = 0
+        self.reloads = 0
+
+    def run(self) -> None:
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        for index in range(self.worker_count):
+            self.spawn(index)
+        while not self._stop_requested:
+            if self._reload_requested:
+                self.reload()
+            self.reap()
+            time.sleep(0.1)
+        self.stop()
+
+    def spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, index, self.reloads, self.shutdown_timeout)
+            except BaseException:  # pylint: disable=broad-except
+                import traceback  # pylint: disable=import-outside-toplevel
+
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)  # pylint: disable=protected-access
+
+        self.workers[pid] = (index, time.monotonic())
+        self.spawned += 1
+        return pid
+
+    def reload(self) -> None:
+        """Start a new generation of workers, then drain the previous one."""
+        self._reload_requested = False
+        self.reloads += 1
+        previous = list(self.workers)
+        self.workers = {}
+        for index in range(self.worker_count):
+            self.spawn(index)
+        for pid in previous:
+            self.retired.add(pid)
+            self._signal(pid, signal.SIGTERM)
+        print(f"[serve] reload {self.reloads}: draining {len(previous)} workers", file=sys.stderr)
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.retired:
+                self.retired.discard(pid)
+                continue
+            if pid not in self.workers:
+                continue
+
+            index, started = self.workers.pop(pid)
+            print(
+                f"[serve] worker {index} (pid {pid}) exited with status {status}",
+                file=sys.stderr,
+            )
+            lived = time.monotonic() - started
+            self._respawn_at[index] = time.monotonic() + (
+                RESPAWN_DELAY if lived < RESPAWN_DELAY else 0
+            )
+
+        now = time.monotonic()
+        for index, respawn_at in list(self._respawn_at.items()):
+            if respawn_at <= now:
+                del self._respawn_at[index]
+                self.spawn(index)
+
+    def stop(self) -> None:
+        """Drain every worker, killing the ones still running after the shutdown timeout."""
+        pids = set(self.workers) | self.retired
+        for pid in pids:
+            self._signal(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.shutdown_timeout + 5
+        while pids and time.monotonic() < deadline:
+            for pid in list(pids):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                        pids.discard(pid)
+                except ChildProcessError:
+                    pids.discard(pid)
+            time.sleep(0.1)
+        for pid in pids:
+            self._signal(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers = {}
+        self.retired = set()
+        self.sock.close()
+
+    @staticmethod
+    def _signal(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _on_reload(self, signum, frame):  # pylint: disable=unused-argument
+        self._reload_requested = True
+
+    def _on_stop(self, signum, frame):  # pylint: disable=unused-argument
+        self._stop_requested = True
+
+
+def main():
+    settings = config.DefaultConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=settings.SERVE_WORKERS)
+    parser.add_argument("--host", default=settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    args = parser.parse_args()
+
+    if args.workers > 1 and settings.STORAGE_BACKEND == "memory":
+        parser.error("more than one worker needs StorageBackend=sqlite")
+    if args.workers > 1 and settings.TURN_LOCK != "file":
+        print(
+            "[serve] TurnLock is not 'file': turns of a conversation handled by "
+            "different workers may overlap",
+            file=sys.stderr,
+        )
+
+    Master(
+        bind_socket(args.host, args.port),
+        args.workers,
+        settings.SERVE_SHUTDOWN_TIMEOUT,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
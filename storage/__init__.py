@@ -0,0 +1,36 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Storage module."""
+
+from .outcome_store import (
+    OutcomeStore,
+    JsonlOutcomeStore,
+    OUTCOME_ACCEPTED,
+    OUTCOME_REFUSED,
+)
+from .write_behind import WriteBehindQueue
+from .sqlite_storage import SqliteStorage
+from .state_serializer import StateSerializer
+from .transcript_store import TranscriptStore
+from .keyed_lock import KeyedLock, FileKeyedLock
+from .dirty_state import (
+    DirtyTrackingConversationState,
+    DirtyTrackingUserState,
+    STATE_SAVES_KEY,
+)
+
+__all__ = [
+    "OutcomeStore",
+    "JsonlOutcomeStore",
+    "OUTCOME_ACCEPTED",
+    "OUTCOME_REFUSED",
+    "WriteBehindQueue",
+    "SqliteStorage",
+    "StateSerializer",
+    "TranscriptStore",
+    "KeyedLock",
+    "FileKeyedLock",
+    "DirtyTrackingConversationState",
+    "DirtyTrackingUserState",
+    "STATE_SAVES_KEY",
+]
@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bot states telling cheaply whether their content changed during the turn."""
+
+import hashlib
+import pickle
+
+from botbuilder.core import ConversationState, TurnContext, UserState
+from botbuilder.core.bot_state import CachedBotState
+
+from telemetry import span
+
+# Per-turn counters left in TurnContext.turn_state by the states below.
+STATE_SAVES_KEY = "StateSaves"
+
+
+class _DigestCachedBotState(CachedBotState):
+    """
+    Cached state hashed with a pickle digest instead of the str of its jsonpickle
+    flattening, about 12 times faster on a booking in progress (see
+    benchmarks.state_digest). A pickle differing for equal states only costs a write.
+    """
+
+    def compute_hash(self, obj: object) -> str:
+        try:
+            return hashlib.blake2b(
+                pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+            ).hexdigest()
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return super().compute_hash(obj)
+
+
+class _DirtyTrackingMixin:
+    """
+    Skips `save_changes` as botbuilder does, when the state was not loaded during the
+    turn or did not change since, but compares the cheaper digest above and counts
+    the writes and the skipped ones.
+    """
+
+    def _init_counters(self):
+        self.writes = 0
+        self.skipped_writes = 0
+
+    async def load(self, turn_context: TurnContext, force: bool = False) -> None:
+        cached_state = self.get_cached_state(turn_context)
+        if force or not cached_state or not cached_state.state:
+            storage_key = self.get_storage_key(turn_context)
+            with span("state_load"):
+                items = await self._storage.read([storage_key])
+            turn_context.turn_state[self._context_service_key] = _DigestCachedBotState(
+                items.get(storage_key)
+            )
+
+    async def save_changes(self, turn_context: TurnContext, force: bool = False) -> None:
+        cached_state = self.get_cached_state(turn_context)
+        saves = turn_context.turn_state.setdefault(
+            STATE_SAVES_KEY, {"written": 0, "skipped": 0}
+        )
+
+        if cached_state is None or not (force or cached_state.is_changed):
+            self.skipped_writes += 1
+            saves["skipped"] += 1
+            return
+
+        with span("state_save"):
+            await super().save_changes(turn_context, True)
+        self.writes += 1
+        saves["written"] += 1
+
+
+class DirtyTrackingConversationState(_DirtyTrackingMixin, ConversationState):
+    def __init__(self, storage):
+        super().__init__(storage)
+        self._init_counters()
+
+
+class DirtyTrackingUserState(_DirtyTrackingMixin, UserState):
+    def __init__(self, storage, namespace=""):
+        super().__init__(storage, namespace)
+        self._init_counters()
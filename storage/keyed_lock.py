@@ -0,0 +1,135 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Async locks keyed by conversation, to run the turns of a conversation one at a time."""
+
+import asyncio
+import contextlib
+import fcntl
+import os
+import time
+import weakref
+import zlib
+from typing import AsyncIterator, Dict
+
+
+class KeyedLock:
+    """
+    One asyncio.Lock per key, created on first use: `async with lock(key)` waits for
+    the other holders of the same key, holders of other keys do not wait. The locks
+    are only referenced by their holders and waiters, so the lock of an idle key is
+    freed as soon as its last holder leaves.
+
+    The locks are local to the process and its event loop.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+
+        self.acquisitions = 0
+        self.contended = 0
+
+    def __call__(self, key: str):
+        return self._hold(key)
+
+    @property
+    def keys(self) -> int:
+        """Number of keys currently held or waited for."""
+        return len(self._locks)
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "keys": self.keys,
+        }
+
+    @contextlib.asynccontextmanager
+    async def _hold(self, key: str) -> AsyncIterator[None]:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self.acquisitions += 1
+        if lock.locked():
+            self.contended += 1
+        async with lock:
+            yield
+
+
+class FileKeyedLock(KeyedLock):
+    """
+    KeyedLock also held across the processes sharing `directory`, ie the serve.py
+    workers. The keys are hashed to `shards` lock files taken with flock(2), so keys
+    of the same shard wait for each other across processes; within the process the
+    turns of a key wait on the asyncio lock first and do not poll the file.
+
+    The file lock is polled, from every `poll_interval` seconds up to every
+    `max_poll_interval` seconds, without blocking the event loop. A lock still held
+    elsewhere after `timeout` seconds, ie by a stuck turn, is given up and the turn
+    runs anyway: the e_tag check of the storage still refuses the losing write. The
+    kernel drops the file locks of a process that dies.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        shards: int = 256,
+        poll_interval: float = 0.002,
+        max_poll_interval: float = 0.05,
+        timeout: float = 10.0,
+    ):
+        super(FileKeyedLock, self).__init__()
+        self.directory = directory
+        self.shards = shards
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+
+        self.file_contended = 0
+        self.timeouts = 0
+
+    def metrics(self) -> Dict[str, float]:
+        metrics = super(FileKeyedLock, self).metrics()
+        metrics["file_contended"] = self.file_contended
+        metrics["timeouts"] = self.timeouts
+        return metrics
+
+    def path(self, key: str) -> str:
+        # crc32 rather than hash(), which differs between processes.
+        shard = zlib.crc32(key.encode("utf-8")) % self.shards
+        return os.path.join(self.directory, f"{shard:04d}.lock")
+
+    @contextlib.asynccontextmanager
+    async def _hold(self, key: str) -> AsyncIterator[None]:
+        async with super(FileKeyedLock, self)._hold(key):
+            # A descriptor of its own: flock(2) locks are shared by the users of an
+            # open file description, so the keys of a shard also wait in-process.
+            descriptor = os.open(self.path(key), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                locked = await self._lock_file(descriptor)
+                try:
+                    yield
+                finally:
+                    if locked:
+                        fcntl.flock(descriptor, fcntl.LOCK_UN)
+            finally:
+                os.close(descriptor)
+
+    async def _lock_file(self, descriptor: int) -> bool:
+        deadline = None
+        interval = self.poll_interval
+        while True:
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            now = time.monotonic()
+            if deadline is None:
+                self.file_contended += 1
+                deadline = now + self.timeout
+            elif now >= deadline:
+                self.timeouts += 1
+                return False
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
@@ -0,0 +1,147 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Append-only store for booking outcomes."""
+
+import glob
+import json
+import os
+import threading
+import time
+from typing import Iterator, Tuple
+
+# Keys used by the legacy performances.json document.
+OUTCOME_ACCEPTED = "successfull"
+OUTCOME_REFUSED = "unsuccessfull"
+
+
+class OutcomeStore:
+    """Interface for booking outcome stores."""
+
+    def append(self, outcome: str, record: dict) -> None:
+        """Record one booking outcome."""
+        raise NotImplementedError()
+
+    def read(self) -> Iterator[Tuple[str, dict]]:
+        """Stream every recorded (outcome, record) pair."""
+        raise NotImplementedError()
+
+    def flush(self) -> None:
+        """Make sure every appended record is durable."""
+
+    def close(self) -> None:
+        """Flush and release any open resource."""
+        self.flush()
+
+
+class JsonlOutcomeStore(OutcomeStore):
+    """
+    Outcome store writing one JSON line per record into rotated segment files.
+
+    Each process owns its own segments (the pid is part of the file name), so
+    several workers can share a directory without interleaving writes. Appends
+    are O(1) and fsync is batched: it happens every `fsync_every` records or
+    every `fsync_interval` seconds, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "outcomes",
+        max_segment_bytes: int = 4 * 1024 * 1024,
+        max_segment_age: float = 3600.0,
+        fsync_every: int = 32,
+        fsync_interval: float = 1.0,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._segment_index = 0
+        self._segment_opened_at = 0.0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, outcome: str, record: dict) -> None:
+        line = json.dumps({"outcome": outcome, "record": record}) + "\n"
+        data = line.encode("utf-8")
+
+        with self._lock:
+            if self._should_rotate(len(data)):
+                self._open_next_segment()
+
+            # A single write per record keeps lines whole even if we crash mid-batch.
+            self._file.write(data)
+            self._file.flush()
+            self._unsynced += 1
+
+            if (
+                self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self._sync()
+
+    def read(self) -> Iterator[Tuple[str, dict]]:
+        for path in self.segments():
+            with open(path, encoding="utf-8") as segment:
+                for line in segment:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line after a crash, skip it.
+                        continue
+                    yield entry["outcome"], entry["record"]
+
+    def segments(self) -> list:
+        """Return every segment path of this store, oldest first."""
+        pattern = os.path.join(self.directory, f"{self.prefix}-*.jsonl")
+        return sorted(glob.glob(pattern))
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _should_rotate(self, incoming: int) -> bool:
+        if self._file is None or self._pid != os.getpid():
+            # Nothing open yet, or we were forked and the handle belongs to the parent.
+            return True
+        if self._file.tell() + incoming > self.max_segment_bytes:
+            return True
+        return time.monotonic() - self._segment_opened_at >= self.max_segment_age
+
+    def _open_next_segment(self) -> None:
+        if self._file is not None and self._pid == os.getpid():
+            self._sync()
+            self._file.close()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._pid = os.getpid()
+        self._segment_index += 1
+        path = os.path.join(
+            self.directory,
+            f"{self.prefix}-{int(time.time())}-{self._pid}-{self._segment_index:06d}.jsonl",
+        )
+        self._file = open(path, "ab")
+        self._segment_opened_at = time.monotonic()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
@@ -0,0 +1,305 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bot state storage on an embedded sqlite database shared by every worker."""
+
+import asyncio
+import copy
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from botbuilder.core import Storage, StoreItem
+
+from .state_serializer import StateSerializer
+
+_OP_READ = "read"
+_OP_WRITE = "write"
+_OP_DELETE = "delete"
+_OP_EVICT = "evict"
+
+
+class SqliteStorage(Storage):
+    """
+    `Storage` implementation on a sqlite database in WAL mode.
+
+    Several processes can open the same file. Every stored item gets a version
+    which is returned as its `e_tag`: a write carrying an e_tag other than "*" only
+    succeeds if the stored item has not changed since it was read, otherwise it
+    raises KeyError like MemoryStorage does. Items not written for `ttl` seconds
+    are treated as missing and periodically deleted. Items are encoded with
+    `serializer`, a StateSerializer by default.
+
+    Reads, writes and deletes issued by concurrent turns within `batch_delay`
+    seconds are applied in a single transaction on a dedicated thread, so the
+    event loop never blocks on the disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 0.0,
+        batch_delay: float = 0.0,
+        busy_timeout: float = 5.0,
+        evict_interval: float = 60.0,
+        serializer: StateSerializer = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.batch_delay = batch_delay
+        self.busy_timeout = busy_timeout
+        self.evict_interval = evict_interval
+        self.serializer = serializer or StateSerializer()
+
+        self._pid = None
+        self._executor: ThreadPoolExecutor = None
+        self._connection: sqlite3.Connection = None
+        self._pending: List[Tuple[str, object, asyncio.Future]] = []
+        self._flush_scheduled = False
+        self._last_eviction = 0.0
+
+        self.batches = 0
+        self.operations = 0
+        self.conflicts = 0
+        self.evicted = 0
+
+    async def read(self, keys: List[str]) -> Dict[str, object]:
+        if not keys:
+            return {}
+        rows = await self._submit(_OP_READ, list(keys))
+        return {
+            key: self._restore(value, version) for key, (value, version) in rows.items()
+        }
+
+    async def write(self, changes: Dict[str, StoreItem]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        if not changes:
+            return
+
+        # Serialized on the loop: the caller keeps mutating its objects after the turn.
+        rows = []
+        for key, change in changes.items():
+            e_tag = _get_e_tag(change)
+            if e_tag == "":
+                raise Exception("sqlite_storage.write(): etag missing")
+            rows.append((key, self._flatten(change), e_tag))
+
+        versions = await self._submit(_OP_WRITE, rows)
+        for key, change in changes.items():
+            # Keep the caller's copy writable by a later save of the same turn.
+            if isinstance(change, dict):
+                change["e_tag"] = versions[key]
+            elif hasattr(change, "e_tag"):
+                change.e_tag = versions[key]
+
+    async def delete(self, keys: List[str]):
+        if keys:
+            await self._submit(_OP_DELETE, list(keys))
+
+    async def evict_expired(self) -> int:
+        """Delete the items idle for more than `ttl` seconds, return how many."""
+        if not self.ttl:
+            return 0
+        return await self._submit(_OP_EVICT, None)
+
+    def close(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        if self._connection is not None:
+            self._connection.close()
+        self._executor = None
+        self._connection = None
+
+    def _submit(self, operation: str, payload) -> asyncio.Future:
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((operation, payload, future))
+
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_later(self.batch_delay, lambda: asyncio.ensure_future(self._flush()))
+        return future
+
+    async def _flush(self) -> None:
+        self._flush_scheduled = False
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self._get_executor(),
+                self._apply,
+                [(operation, payload) for operation, payload, _ in batch],
+            )
+        except Exception as error:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, _, future), (succeeded, result) in zip(batch, results):
+            if future.done():
+                continue
+            if succeeded:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def _apply(self, batch: List[Tuple[str, object]]) -> List[Tuple[bool, object]]:
+        connection = self._connect()
+        now = time.time()
+        expired_before = now - self.ttl if self.ttl else None
+        results = []
+
+        self.batches += 1
+        self.operations += len(batch)
+        read_only = all(operation == _OP_READ for operation, _ in batch)
+
+        connection.execute("BEGIN" if read_only else "BEGIN IMMEDIATE")
+        try:
+            for operation, payload in batch:
+                if operation == _OP_READ:
+                    results.append((True, self._read_rows(connection, payload, expired_before)))
+                    continue
+
+                # Every operation of the batch succeeds or fails on its own.
+                connection.execute("SAVEPOINT operation")
+                try:
+                    if operation == _OP_WRITE:
+                        result = self._write_rows(connection, payload, now, expired_before)
+                    elif operation == _OP_DELETE:
+                        result = self._delete_rows(connection, payload)
+                    else:
+                        result = self._evict(connection, now)
+                    connection.execute("RELEASE operation")
+                    results.append((True, result))
+                except KeyError as error:
+                    self.conflicts += 1
+                    connection.execute("ROLLBACK TO operation")
+                    connection.execute("RELEASE operation")
+                    results.append((False, error))
+
+            if (
+                not read_only
+                and self.ttl
+                and now - self._last_eviction >= self.evict_interval
+            ):
+                self._evict(connection, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return results
+
+    @staticmethod
+    def _read_rows(
+        connection: sqlite3.Connection, keys: List[str], expired_before: float
+    ) -> Dict[str, Tuple[str, int]]:
+        placeholders = ", ".join("?" * len(keys))
+        query = f"SELECT key, value, version, updated FROM state WHERE key IN ({placeholders})"
+        return {
+            key: (value, version)
+            for key, value, version, updated in connection.execute(query, keys)
+            if expired_before is None or updated >= expired_before
+        }
+
+    @staticmethod
+    def _write_rows(
+        connection: sqlite3.Connection,
+        rows: List[Tuple[str, str, str]],
+        now: float,
+        expired_before: float,
+    ) -> Dict[str, str]:
+        versions = {}
+        for key, value, e_tag in rows:
+            stored = connection.execute(
+                "SELECT version, updated FROM state WHERE key = ?", (key,)
+            ).fetchone()
+            if stored is not None and expired_before is not None and stored[1] < expired_before:
+                # Expired items are gone as far as the readers know.
+                stored = None
+
+            if (
+                stored is not None
+                and e_tag is not None
+                and e_tag != "*"
+                and e_tag != str(stored[0])
+            ):
+                raise KeyError(
+                    "Etag conflict.\nOriginal: %s\r\nCurrent: %s" % (e_tag, stored[0])
+                )
+
+            version = stored[0] + 1 if stored is not None else 1
+            connection.execute(
+                "INSERT OR REPLACE INTO state (key, value, version, updated) VALUES (?, ?, ?, ?)",
+                (key, value, version, now),
+            )
+            versions[key] = str(version)
+        return versions
+
+    @staticmethod
+    def _delete_rows(connection: sqlite3.Connection, keys: List[str]) -> None:
+        connection.executemany("DELETE FROM state WHERE key = ?", [(key,) for key in keys])
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> int:
+        self._last_eviction = now
+        evicted = connection.execute(
+            "DELETE FROM state WHERE updated < ?", (now - self.ttl,)
+        ).rowcount
+        self.evicted += evicted
+        return evicted
+
+    def _flatten(self, item: object) -> bytes:
+        # The e_tag is the row version, it is not part of the payload.
+        if isinstance(item, dict) and "e_tag" in item:
+            item = {key: value for key, value in item.items() if key != "e_tag"}
+        elif "e_tag" in getattr(item, "__dict__", {}):
+            item = copy.copy(item)
+            del item.e_tag
+        return self.serializer.dumps(item)
+
+    def _restore(self, value: bytes, version: int) -> object:
+        item = self.serializer.loads(value)
+        if isinstance(item, dict):
+            item["e_tag"] = str(version)
+        else:
+            item.e_tag = str(version)
+        return item
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Neither the thread nor the connection survive a fork of the worker.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = None
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="sqlite-storage"
+            )
+        return self._executor
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "version INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS state_updated ON state (updated)")
+            self._connection = connection
+        return self._connection
+
+
+def _get_e_tag(item: object) -> str:
+    if isinstance(item, dict):
+        return item.get("e_tag")
+    return getattr(item, "e_tag", None)
+
@@ -0,0 +1,181 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Compact, versioned binary encoding of the bot state."""
+
+import json
+import struct
+import zlib
+
+from jsonpickle.pickler import Pickler
+from jsonpickle.unpickler import Unpickler
+
+FORMAT_VERSION = 1
+
+_FLAG_COMPRESSED = 0x01
+
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_REF = 6
+_LIST = 7
+_DICT = 8
+
+_DOUBLE = struct.Struct("<d")
+
+
+class StateSerializer:
+    """
+    Encodes store items in a msgpack-like tagged binary format.
+
+    Objects are first flattened with jsonpickle, as the botbuilder storages do. Every
+    distinct string (dictionary keys, class names, repeated values) is written once and
+    then referenced by index, and payloads of at least `compress_above` bytes are zlib
+    compressed. Each payload starts with a version byte; payloads written as plain
+    jsonpickle JSON (version 0) are still read.
+    """
+
+    def __init__(self, compress_above: int = 512):
+        self.compress_above = compress_above
+
+    def dumps(self, item: object) -> bytes:
+        output = bytearray()
+        _Encoder(output).encode(Pickler().flatten(item))
+
+        flags = 0
+        body = bytes(output)
+        if self.compress_above and len(body) >= self.compress_above:
+            compressed = zlib.compress(body)
+            if len(compressed) < len(body):
+                flags, body = flags | _FLAG_COMPRESSED, compressed
+        return bytes((FORMAT_VERSION, flags)) + body
+
+    def loads(self, data) -> object:
+        if isinstance(data, str) or data[:1] in (b"{", b"["):
+            # Version 0: plain jsonpickle JSON.
+            return Unpickler().restore(json.loads(data))
+
+        version, flags = data[0], data[1]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported state format version {version}")
+
+        body = data[2:]
+        if flags & _FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        return Unpickler().restore(_Decoder(body).decode())
+
+
+class _Encoder:
+    def __init__(self, output: bytearray):
+        self._output = output
+        self._strings = {}
+
+    def encode(self, value):
+        output = self._output
+        if value is None:
+            output.append(_NONE)
+        elif value is True:
+            output.append(_TRUE)
+        elif value is False:
+            output.append(_FALSE)
+        elif isinstance(value, int):
+            if not -2 ** 63 <= value < 2 ** 63:
+                raise OverflowError("Integers are limited to 64 bits")
+            output.append(_INT)
+            # Zigzag so that small negative numbers stay small.
+            self._varint((value << 1) ^ (value >> 63))
+        elif isinstance(value, float):
+            output.append(_FLOAT)
+            output += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            self._string(value)
+        elif isinstance(value, (list, tuple)):
+            output.append(_LIST)
+            self._varint(len(value))
+            for item in value:
+                self.encode(item)
+        elif isinstance(value, dict):
+            output.append(_DICT)
+            self._varint(len(value))
+            for key, item in value.items():
+                self._string(str(key))
+                self.encode(item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__}")
+
+    def _string(self, value: str):
+        index = self._strings.get(value)
+        if index is not None:
+            self._output.append(_REF)
+            self._varint(index)
+            return
+
+        self._strings[value] = len(self._strings)
+        encoded = value.encode("utf-8")
+        self._output.append(_STR)
+        self._varint(len(encoded))
+        self._output += encoded
+
+    def _varint(self, value: int):
+        while value > 0x7F:
+            self._output.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self._output.append(value)
+
+
+class _Decoder:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._position = 0
+        self._strings = []
+
+    def decode(self):
+        tag = self._data[self._position]
+        self._position += 1
+
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            value = self._varint()
+            return (value >> 1) ^ -(value & 1)
+        if tag == _FLOAT:
+            (value,) = _DOUBLE.unpack_from(self._data, self._position)
+            self._position += _DOUBLE.size
+            return value
+        if tag in (_STR, _REF):
+            self._position -= 1
+            return self._string()
+        if tag == _LIST:
+            return [self.decode() for _ in range(self._varint())]
+        if tag == _DICT:
+            return {self._string(): self.decode() for _ in range(self._varint())}
+        raise ValueError(f"Unknown tag {tag} in state payload")
+
+    def _string(self) -> str:
+        tag = self._data[self._position]
+        self._position += 1
+        if tag == _REF:
+            return self._strings[self._varint()]
+
+        length = self._varint()
+        value = self._data[self._position:self._position + length].decode("utf-8")
+        self._position += length
+        self._strings.append(value)
+        return value
+
+    def _varint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self._data[self._position]
+            self._position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
@@ -0,0 +1,94 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bounded transcripts of the user answers, kept in the state of a dialog."""
+
+from typing import Dict, List
+
+
+class TranscriptStore:
+    """
+    Records the answers of a conversation in the state dict of the dialog collecting
+    them, ie the `values` of a waterfall step, so that they are saved, loaded and
+    dropped with the conversation state instead of growing in the process.
+
+    Each transcript is a ring buffer of at most `capacity` entries, stored under
+    `key` as plain lists so that any state storage can serialize it; beyond the
+    capacity the oldest entries are overwritten. `release` removes a transcript and
+    must be called when the dialog ends. `metrics` accounts for the entries and
+    UTF-8 bytes of the transcripts this process appended to and not released yet;
+    with several workers a conversation may end on another worker than the one it
+    started on, so only the sum over the workers is exact.
+    """
+
+    def __init__(self, capacity: int = 32, key: str = "transcript"):
+        if capacity < 1:
+            raise ValueError("TranscriptStore.capacity must be at least 1")
+        self.capacity = capacity
+        self.key = key
+
+        self.opened = 0
+        self.released = 0
+        self.appended = 0
+        self.overwritten = 0
+        self.live_entries = 0
+        self.live_bytes = 0
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "opened": self.opened,
+            "released": self.released,
+            "live": self.opened - self.released,
+            "appended": self.appended,
+            "overwritten": self.overwritten,
+            "live_entries": self.live_entries,
+            "live_bytes": self.live_bytes,
+        }
+
+    def append(self, state: dict, text: str) -> None:
+        if text is None:
+            return
+        text = str(text)
+        ring = state.get(self.key)
+        if ring is None:
+            ring = state[self.key] = {"entries": [], "next": 0, "bytes": 0}
+            self.opened += 1
+
+        entries = ring["entries"]
+        size = len(text.encode("utf-8"))
+        if len(entries) < self.capacity:
+            entries.append(text)
+            self.live_entries += 1
+        else:
+            position = ring["next"]
+            size -= len(entries[position].encode("utf-8"))
+            entries[position] = text
+            self.overwritten += 1
+        ring["next"] = (ring["next"] + 1) % self.capacity
+        ring["bytes"] += size
+        self.live_bytes += size
+        self.appended += 1
+
+    def read(self, state: dict) -> List[str]:
+        """Entries of the transcript of `state`, oldest first."""
+        ring = state.get(self.key)
+        if ring is None:
+            return []
+        entries, position = ring["entries"], ring["next"]
+        if len(entries) < self.capacity:
+            return list(entries)
+        return entries[position:] + entries[:position]
+
+    def release(self, state: dict) -> List[str]:
+        """Remove the transcript of `state` and return its entries, oldest first."""
+        entries = self.read(state)
+        ring = state.pop(self.key, None)
+        if ring is not None:
+            self.released += 1
+            self.live_entries -= len(ring["entries"])
+            self.live_bytes -= ring["bytes"]
+        return entries
+
+    def size_of(self, state: dict) -> int:
+        """UTF-8 bytes held by the transcript of `state`."""
+        ring = state.get(self.key)
+        return ring["bytes"] if ring is not None else 0
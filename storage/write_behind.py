@@ -0,0 +1,321 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Write-behind queue keeping store appends off the event loop."""
+
+import asyncio
+import copy
+import fcntl
+import glob
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Tuple
+
+from botbuilder.core import BotTelemetryClient
+
+from telemetry import MetricsReporter
+
+from .outcome_store import OutcomeStore
+
+
+class WriteBehindQueue:
+    """
+    Buffers appends in a bounded asyncio queue and writes them from a dedicated thread.
+
+    `enqueue` never touches the disk and never awaits. When the queue is full, or
+    when it is stopped with records still pending, records are appended to a spill
+    file from the writer thread, which is replayed into the stores on the next start.
+
+    The spill file of a running queue is flock(2)ed. On start, the other spill files
+    matching `adopt_pattern` whose queue is gone, ie those of the previous serve.py
+    generations, are replayed too; the ones of a queue still draining are left for
+    the next start.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 1024,
+        batch_size: int = 64,
+        spill_path: str = "write_behind.spill",
+        telemetry_client: BotTelemetryClient = None,
+        report_interval: float = 60.0,
+        adopt_pattern: str = None,
+    ):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.spill_path = spill_path
+        self.adopt_pattern = adopt_pattern
+
+        self._stores: Dict[str, OutcomeStore] = {}
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="write-behind"
+        )
+        self._spill_lock = threading.Lock()
+        # Descriptor of the flock held on the spill file while the queue runs.
+        self._owner_lock: int = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failed = 0
+        self.high_watermark = 0
+        self._spill_pending = True
+        self._reporter = MetricsReporter(
+            "WriteBehind",
+            self.metrics,
+            telemetry_client,
+            gauges=("pending", "high_watermark"),
+            interval=report_interval,
+        )
+
+    def wrap(self, name: str, store: OutcomeStore) -> OutcomeStore:
+        """Register `store` and return a front end whose appends go through the queue."""
+        self._stores[name] = store
+        return _QueuedOutcomeStore(self, name, store)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "failed": self.failed,
+            "pending": self.pending,
+            "high_watermark": self.high_watermark,
+        }
+
+    def enqueue(self, name: str, outcome: str, record: dict) -> None:
+        """Queue one append without blocking the caller."""
+        self._ensure_started()
+        self.enqueued += 1
+
+        # Snapshot the record, the caller may keep mutating it after this turn.
+        record = copy.deepcopy(record)
+        try:
+            self._queue.put_nowait((name, outcome, record))
+        except asyncio.QueueFull:
+            # Backpressure: keep memory bounded and let the spill file absorb the burst.
+            # The spill runs on the writer thread, the event loop never waits on it.
+            spill = asyncio.get_event_loop().run_in_executor(
+                self._executor, self._spill, [(name, outcome, record)]
+            )
+            spill.add_done_callback(self._spill_done)
+            return
+
+        self.high_watermark = max(self.high_watermark, self._queue.qsize())
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Drain the queue, flush the stores and spill what could not be written in time."""
+        if self._task is None:
+            return
+
+        # Stop waiting early if the writer died, nothing would drain the queue.
+        join = asyncio.ensure_future(self._queue.join())
+        await asyncio.wait(
+            [join, self._task], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        join.cancel()
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception as error:  # pylint: disable=broad-except
+            print(f"[WriteBehindQueue] writer failed: {error}", file=sys.stderr)
+        self._task = None
+
+        leftovers = []
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+        if leftovers:
+            self._spill(leftovers)
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, self._flush_stores)
+        if self._owner_lock is not None:
+            os.close(self._owner_lock)
+            self._owner_lock = None
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        await self._in_executor(self._replay_on_start)
+
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._in_executor(self._write_batch, batch)
+                if self._spill_pending and self._queue.empty():
+                    # The burst is over, move what it spilled into the stores.
+                    await self._in_executor(self._replay_spill)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            self._reporter.report()
+
+    async def _in_executor(self, function, *args) -> None:
+        # The writer keeps running whatever the disk does, ie when it is full.
+        try:
+            await asyncio.get_event_loop().run_in_executor(self._executor, function, *args)
+        except Exception as error:  # pylint: disable=broad-except
+            print(f"[WriteBehindQueue] {function.__name__} failed: {error}", file=sys.stderr)
+
+    def _write_batch(self, batch: list) -> None:
+        failed = []
+        for name, outcome, record in batch:
+            try:
+                self._stores[name].append(outcome, record)
+                self.written += 1
+            except Exception:  # pylint: disable=broad-except
+                failed.append((name, outcome, record))
+
+        if failed:
+            self.failed += len(failed)
+            self._spill(failed)
+
+    def _flush_stores(self) -> None:
+        for store in self._stores.values():
+            store.flush()
+
+    def _spill(self, entries: list) -> None:
+        lines = "".join(
+            json.dumps({"store": name, "outcome": outcome, "record": record}) + "\n"
+            for name, outcome, record in entries
+        )
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                spill_file.write(lines)
+                spill_file.flush()
+                os.fsync(spill_file.fileno())
+            self._spill_pending = True
+        self.spilled += len(entries)
+
+    def _spill_done(self, spill: asyncio.Future) -> None:
+        if not spill.cancelled() and spill.exception() is not None:
+            self.failed += 1
+
+    def _replay_on_start(self) -> None:
+        if self._owner_lock is None:
+            descriptor = os.open(self.spill_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._owner_lock = descriptor
+            except BlockingIOError:
+                os.close(descriptor)
+                print(
+                    f"[WriteBehindQueue] {self.spill_path} is used by another process",
+                    file=sys.stderr,
+                )
+        self._replay_spill()
+
+        if not self.adopt_pattern:
+            return
+        paths = set()
+        for path in glob.glob(self.adopt_pattern):
+            for suffix in (".replay", ".lock"):
+                if path.endswith(suffix):
+                    path = path[: -len(suffix)]
+                    break
+            paths.add(path)
+        paths.discard(self.spill_path)
+        for path in sorted(paths):
+            self._adopt(path)
+
+    def _adopt(self, spill_path: str) -> None:
+        descriptor = os.open(spill_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Its queue still runs, ie a worker of the previous generation draining.
+                return
+            # What cannot be replayed is spilled again, into the file of this queue.
+            self._replay_spill(spill_path)
+            os.remove(spill_path + ".lock")
+        finally:
+            os.close(descriptor)
+
+    def _replay_spill(self, spill_path: str = None) -> None:
+        spill_path = spill_path or self.spill_path
+        replay_path = spill_path + ".replay"
+        with self._spill_lock:
+            if spill_path == self.spill_path:
+                self._spill_pending = False
+            # A leftover replay file means we crashed while replaying: replay it again,
+            # stores are at-least-once.
+            if not os.path.exists(replay_path):
+                if not os.path.exists(spill_path):
+                    return
+                # Claim the current spill file so new spills are not replayed twice.
+                os.replace(spill_path, replay_path)
+
+        kept = []
+        with open(replay_path, encoding="utf-8") as spill_file:
+            for line in spill_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash, skip it.
+                    continue
+                record = (entry["store"], entry["outcome"], entry["record"])
+                store = self._stores.get(entry["store"])
+                if store is None:
+                    # Records of stores that are not registered in this process.
+                    kept.append(record)
+                    continue
+                try:
+                    store.append(entry["outcome"], entry["record"])
+                    self.replayed += 1
+                except Exception:  # pylint: disable=broad-except
+                    self.failed += 1
+                    kept.append(record)
+
+        if kept:
+            # Spilled again, the next failed write or start replays them.
+            self._spill(kept)
+            self._spill_pending = False
+        os.remove(replay_path)
+
+
+class _QueuedOutcomeStore(OutcomeStore):
+    """Outcome store front end enqueuing appends into a WriteBehindQueue."""
+
+    def __init__(self, queue: WriteBehindQueue, name: str, store: OutcomeStore):
+        self._write_behind = queue
+        self._name = name
+        self._store = store
+
+    def append(self, outcome: str, record: dict) -> None:
+        self._write_behind.enqueue(self._name, outcome, record)
+
+    def read(self) -> Iterator[Tuple[str, dict]]:
+        return self._store.read()
+
+    def flush(self) -> None:
+        self._store.flush()
+
+    def close(self) -> None:
+        self._store.close()
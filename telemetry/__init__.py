@@ -0,0 +1,30 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Telemetry module."""
+
+from .export import (
+    BatchingTelemetryQueue,
+    FileTelemetrySender,
+    batching_telemetry_client,
+)
+from .metrics import MetricsReporter
+from .profiler import Span, TurnProfiler, TurnProfilerMiddleware, span
+from .sampling import (
+    PropertyProjector,
+    SamplingTelemetryClient,
+    TelemetrySamplingMiddleware,
+)
+
+__all__ = [
+    "BatchingTelemetryQueue",
+    "FileTelemetrySender",
+    "batching_telemetry_client",
+    "MetricsReporter",
+    "Span",
+    "TurnProfiler",
+    "TurnProfilerMiddleware",
+    "span",
+    "PropertyProjector",
+    "SamplingTelemetryClient",
+    "TelemetrySamplingMiddleware",
+]
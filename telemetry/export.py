@@ -0,0 +1,191 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Application Insights channel exporting the telemetry in batches from a thread."""
+import collections
+import json
+import os
+import threading
+from typing import Dict
+
+from applicationinsights import TelemetryClient  # pylint: disable=no-name-in-module
+from applicationinsights.channel import (
+    QueueBase,
+    SenderBase,
+    SynchronousSender,
+    TelemetryChannel,
+)
+
+# Never sampled out under pressure, only dropped when the queue is full.
+_PRIORITY_TYPES = {"ExceptionData", "RequestData"}
+
+
+class FileTelemetrySender(SenderBase):
+    """Appends the envelopes as JSON lines to `path`, for runs without Application Insights."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, data_to_send):
+        lines = "".join(json.dumps(envelope.write()) + "\n" for envelope in data_to_send)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as sink:
+                sink.write(lines)
+
+
+class BatchingTelemetryQueue(QueueBase):
+    """
+    Bounded queue of telemetry envelopes drained by a background thread.
+
+    `put` only appends to an in-memory deque: the thread hands batches of up to
+    `batch_size` envelopes to the sender as soon as a batch is full, or every
+    `send_interval` seconds. Above `pressure_ratio` of `max_pending` only one
+    trace or event in `pressure_keep_every` is kept, the others are counted in
+    `sampled_out`. Envelopes arriving when the queue is full are counted in
+    `dropped`. Envelopes a sender puts back after a failure wait for the next
+    interval.
+    """
+
+    def __init__(
+        self,
+        sender: SenderBase,
+        max_pending: int = 5000,
+        batch_size: int = 100,
+        send_interval: float = 5.0,
+        pressure_ratio: float = 0.75,
+        pressure_keep_every: int = 10,
+    ):
+        self._pending = collections.deque()
+        super().__init__(sender)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.send_interval = send_interval
+        self.pressure_ratio = pressure_ratio
+        self.pressure_keep_every = max(1, pressure_keep_every)
+        sender.send_buffer_size = batch_size
+
+        self._wake = threading.Event()
+        self._flushed = threading.Condition()
+        self._thread: threading.Thread = None
+        self._pid = None
+        self._stopped = False
+        self._pressure_seen = 0
+
+        self.enqueued = 0
+        self.sent = 0
+        self.batches = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": len(self._pending),
+        }
+
+    def put(self, item):
+        if not item:
+            return
+        pending = len(self._pending)
+        if pending >= self.max_pending:
+            self.dropped += 1
+            return
+        if pending >= self.max_pending * self.pressure_ratio and not _is_priority(item):
+            self._pressure_seen += 1
+            if self._pressure_seen % self.pressure_keep_every:
+                self.sampled_out += 1
+                return
+
+        self._pending.append(item)
+        self.enqueued += 1
+        self._ensure_started()
+        if pending + 1 >= self.batch_size:
+            self._wake.set()
+
+    def get(self):
+        try:
+            return self._pending.popleft()
+        except IndexError:
+            return None
+
+    def flush(self):
+        """Wake the export thread, without waiting for the batches to be sent."""
+        self._ensure_started()
+        self._wake.set()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Send what is pending and stop the export thread."""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        # Anything put after the thread stopped is sent from the caller.
+        self._drain(len(self._pending))
+
+    def _ensure_started(self):
+        # The thread does not survive a fork, the child starts its own.
+        if self._stopped or (self._thread is not None and self._pid == os.getpid()):
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, name="telemetry-export", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.send_interval)
+            self._wake.clear()
+            # Envelopes put back by the sender during this drain wait for the next one.
+            self._drain(len(self._pending))
+        self._drain(len(self._pending))
+
+    def _drain(self, count: int):
+        while count > 0:
+            batch = []
+            while len(batch) < min(count, self.batch_size):
+                item = self.get()
+                if item is None:
+                    break
+                batch.append(item)
+            if not batch:
+                return
+            count -= len(batch)
+            try:
+                self.sender.send(batch)
+            except Exception:  # pylint: disable=broad-except
+                # A sink error must not stop the export thread.
+                self.failed += len(batch)
+                continue
+            self.sent += len(batch)
+            self.batches += 1
+
+
+def _is_priority(envelope) -> bool:
+    data = getattr(envelope, "data", None)
+    return getattr(data, "base_type", None) in _PRIORITY_TYPES
+
+
+def batching_telemetry_client(
+    instrumentation_key: str,
+    file_path: str = "",
+    **queue_options,
+) -> TelemetryClient:
+    """
+    Application Insights client exporting through a BatchingTelemetryQueue, to the
+    Application Insights endpoint or, when `file_path` is set, to that file.
+    """
+    sender = FileTelemetrySender(file_path) if file_path else SynchronousSender()
+    queue = BatchingTelemetryQueue(sender, **queue_options)
+    return TelemetryClient(instrumentation_key, TelemetryChannel(queue=queue))
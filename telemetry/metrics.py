@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Periodic reporting of the counters of a component as telemetry metrics."""
+import time
+from typing import Callable, Dict, Iterable
+
+from botbuilder.core import BotTelemetryClient, NullTelemetryClient
+
+
+class MetricsReporter:
+    """
+    Sends the values returned by `metrics` as "`prefix`.<name>" metrics at most
+    every `interval` seconds, 0 disables it. Counters are sent as their increase
+    since the previous report, the `gauges` as they are.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        metrics: Callable[[], Dict[str, float]],
+        telemetry_client: BotTelemetryClient = None,
+        gauges: Iterable[str] = (),
+        interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.prefix = prefix
+        self.metrics = metrics
+        self.telemetry_client = telemetry_client or NullTelemetryClient()
+        self.gauges = frozenset(gauges)
+        self.interval = interval
+        self._clock = clock
+        self._last_report = clock()
+        self._reported = {}
+
+    def report(self) -> None:
+        """Send the metrics if the interval elapsed since the previous report."""
+        now = self._clock()
+        if not self.interval or now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        for name, value in self.metrics().items():
+            if name in self.gauges:
+                self.telemetry_client.track_metric(f"{self.prefix}.{name}", value)
+            else:
+                self.telemetry_client.track_metric(
+                    f"{self.prefix}.{name}", value - self._reported.get(name, 0)
+                )
+                self._reported[name] = value
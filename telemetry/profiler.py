@@ -0,0 +1,265 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Per-turn span trees timing the hot path of the bot."""
+import contextvars
+import cProfile
+import os
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+from botbuilder.core import BotTelemetryClient, Middleware, NullTelemetryClient, TurnContext
+
+from .metrics import MetricsReporter
+
+# Span of the sampled turn being executed, None when the turn is not sampled.
+_CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar("profiler_span", default=None)
+# True inside a profile already drawn and not sampled, so that the nested profiles,
+# ie the turn of a request, do not draw again.
+_NOT_SAMPLED: contextvars.ContextVar = contextvars.ContextVar("profiler_not_sampled", default=False)
+
+
+class Span:
+    """Named section of a turn timed with the monotonic clock, nested in its parent."""
+
+    __slots__ = ("name", "start", "end", "children", "_token")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+        self.end = 0.0
+        self.children: List["Span"] = []
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT_SPAN.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.end = time.perf_counter()
+        _CURRENT_SPAN.reset(self._token)
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.__exit__(*exc_info)
+
+    def flatten(self, prefix: str = "") -> Dict[str, float]:
+        """Milliseconds per span path, ie "turn/recognize", summed over repeated spans."""
+        path = f"{prefix}/{self.name}" if prefix else self.name
+        timings = {path: self.duration_ms}
+        for child in self.children:
+            for child_path, duration in child.flatten(path).items():
+                timings[child_path] = timings.get(child_path, 0.0) + duration
+        return timings
+
+
+class _NoSpan:
+    """Shared context manager returned when the turn is not sampled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return None
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+NO_SPAN = _NoSpan()
+
+
+class _UnsampledProfile(_NoSpan):
+    """Profile drawn and not sampled, the profiles nested in it are not sampled either."""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _NOT_SAMPLED.set(True)
+
+    def __exit__(self, *exc_info):
+        _NOT_SAMPLED.reset(self._token)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        return self.__exit__(*exc_info)
+
+
+def span(name: str):
+    """
+    Time a section of the current turn, ie `with span("recognize"):`. Outside of a
+    sampled turn it only costs a context variable lookup.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        return NO_SPAN
+    child = Span(name)
+    parent.children.append(child)
+    return child
+
+
+class _ProfiledTurn(Span):
+    """Root span of a sampled turn, handed back to its profiler when it ends."""
+
+    __slots__ = ("profiler", "cprofile")
+
+    def __init__(self, name: str, profiler: "TurnProfiler"):
+        super().__init__(name)
+        self.profiler = profiler
+        self.cprofile = None
+
+    def __enter__(self) -> "Span":
+        self.cprofile = self.profiler._start_cprofile()  # pylint: disable=protected-access
+        return super().__enter__()
+
+    def __exit__(self, *exc_info) -> None:
+        super().__exit__(*exc_info)
+        self.profiler._finish(self)  # pylint: disable=protected-access
+
+
+class TurnProfiler:
+    """
+    Records a span tree for a `sample_rate` fraction of the turns.
+
+    Each sampled turn is sent to the telemetry client as a "TurnProfile" event
+    holding the milliseconds of every span path, and the totals per path are kept
+    in `aggregates` and sent as "TurnProfile.<path>.count" and ".totalMs" metrics
+    every `report_interval` seconds. When `dump_dir` is set, sampled turns also run under cProfile
+    (one at a time, the profile includes the turns interleaved with it on the event
+    loop) and the stats of those slower than `slow_turn_ms` are written there.
+    """
+
+    def __init__(
+        self,
+        telemetry_client: BotTelemetryClient = None,
+        sample_rate: float = 0.0,
+        slow_turn_ms: float = 500.0,
+        dump_dir: str = "",
+        sampler: Callable[[], float] = random.random,
+        report_interval: float = 60.0,
+    ):
+        self.telemetry_client = telemetry_client or NullTelemetryClient()
+        self.sample_rate = sample_rate
+        self.slow_turn_ms = slow_turn_ms
+        self.dump_dir = dump_dir
+        self._sampler = sampler
+        self._cprofile_active = False
+
+        self.sampled = 0
+        self.slow = 0
+        self.dumps = 0
+        # Span path -> [count, total ms, max ms]
+        self.aggregates: Dict[str, List[float]] = {}
+        self._reporter = MetricsReporter(
+            "TurnProfile", self.metrics, self.telemetry_client, interval=report_interval
+        )
+
+    def profile(self, name: str):
+        """
+        Context manager around a turn. It starts a span tree when the turn is
+        sampled and becomes a child span when a profile is already running. The
+        sampling is drawn once, by the outermost profile.
+        """
+        if _CURRENT_SPAN.get() is not None:
+            return span(name)
+        if self.sample_rate <= 0 or _NOT_SAMPLED.get():
+            return NO_SPAN
+        if self._sampler() >= self.sample_rate:
+            return _UnsampledProfile()
+        return _ProfiledTurn(name, self)
+
+    def _start_cprofile(self):
+        if not self.dump_dir or self._cprofile_active:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active in this thread.
+            return None
+        self._cprofile_active = True
+        return profile
+
+    def _finish(self, root: _ProfiledTurn):
+        if root.cprofile is not None:
+            root.cprofile.disable()
+            self._cprofile_active = False
+
+        self.sampled += 1
+        timings = root.flatten()
+        for path, duration in timings.items():
+            aggregate = self.aggregates.setdefault(path, [0, 0.0, 0.0])
+            aggregate[0] += 1
+            aggregate[1] += duration
+            aggregate[2] = max(aggregate[2], duration)
+
+        slow = root.duration_ms >= self.slow_turn_ms
+        properties = {"root": root.name, "slow": str(slow).lower()}
+        if slow:
+            self.slow += 1
+            if root.cprofile is not None:
+                properties["profile"] = self._dump(root)
+        self.telemetry_client.track_event("TurnProfile", properties, timings)
+        self._reporter.report()
+
+    def _dump(self, root: _ProfiledTurn) -> str:
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(
+            self.dump_dir, f"{root.name}-{int(time.time())}-{uuid.uuid4().hex[:8]}.prof"
+        )
+        root.cprofile.dump_stats(path)
+        self.dumps += 1
+        return path
+
+    def metrics(self) -> Dict[str, float]:
+        """Sampled turns and milliseconds spent per span path, ie "turn/recognize.totalMs"."""
+        metrics = {}
+        for path, (count, total, _) in self.aggregates.items():
+            metrics[f"{path}.count"] = count
+            metrics[f"{path}.totalMs"] = total
+        return metrics
+
+    def summary(self) -> Dict[str, dict]:
+        """Count, mean and max milliseconds of every span path seen so far."""
+        return {
+            path: {"count": count, "meanMs": total / count, "maxMs": maximum}
+            for path, (count, total, maximum) in sorted(self.aggregates.items())
+        }
+
+
+class TurnProfilerMiddleware(Middleware):
+    """
+    Profiles the turns going through the adapter, with a "send_activity" span for
+    every outgoing batch of activities.
+    """
+
+    def __init__(self, profiler: TurnProfiler):
+        self.profiler = profiler
+
+    async def on_turn(
+        self, context: TurnContext, logic: Callable[[TurnContext], Awaitable]
+    ):
+        async with self.profiler.profile("turn") as root:
+            if root is not None:
+                context.on_send_activities(self._send_activities)
+            await logic()
+
+    @staticmethod
+    async def _send_activities(context, activities, next_send):
+        with span("send_activity"):
+            return await next_send()
@@ -0,0 +1,185 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Per-conversation and tail-based sampling of the telemetry of the turns."""
+import contextvars
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Iterable
+
+from botbuilder.core import BotTelemetryClient, Middleware, TurnContext
+from botbuilder.core.bot_telemetry_client import Severity
+
+from .metrics import MetricsReporter
+
+# Telemetry buffered for the turn being executed, None outside of a sampled-out turn.
+_TURN_TELEMETRY: contextvars.ContextVar = contextvars.ContextVar(
+    "turn_telemetry", default=None
+)
+
+
+class PropertyProjector:
+    """
+    Reduces a property dict to its `fields`, as strings of at most `max_length`
+    characters, and to the sizes of its `counted` fields, ie "turns_count", so that
+    the payload does not grow with the conversation.
+    """
+
+    def __init__(self, fields: Iterable[str], counted: Iterable[str] = (), max_length: int = 64):
+        self.fields = tuple(fields)
+        self.counted = tuple(counted)
+        self.max_length = max_length
+
+    def project(self, properties: dict) -> Dict[str, str]:
+        projected = {}
+        for name in self.fields:
+            value = properties.get(name)
+            if value is not None:
+                projected[name] = str(value)[: self.max_length]
+        for name in self.counted:
+            value = properties.get(name) or 0
+            projected[f"{name}_count"] = str(value if isinstance(value, int) else len(value))
+        return projected
+
+
+class _TurnTelemetry:
+    __slots__ = ("calls", "failed")
+
+    def __init__(self):
+        self.calls = []
+        self.failed = False
+
+
+def conversation_sample(conversation_id: str) -> float:
+    """Stable position of a conversation in [0, 1), the same in every worker."""
+    digest = hashlib.blake2b((conversation_id or "").encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+class SamplingTelemetryClient(BotTelemetryClient):
+    """
+    Forwards to `telemetry_client` the telemetry of a `rate` fraction of the
+    conversations, chosen by hashing their id so that a conversation is kept or
+    dropped as a whole.
+
+    The telemetry of the other turns is buffered by TelemetrySamplingMiddleware
+    and only forwarded when the turn turns out slower than `slow_turn_ms`, raised,
+    or tracked an exception or a trace of at least `keep_severity`. Telemetry
+    tracked outside of a turn is always forwarded. The counters are sent, never
+    sampled, as "TelemetrySampling.*" metrics every `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        telemetry_client: BotTelemetryClient,
+        rate: float = 1.0,
+        slow_turn_ms: float = 1000.0,
+        keep_severity: Severity = Severity.warning,
+        report_interval: float = 60.0,
+    ):
+        self.telemetry_client = telemetry_client
+        self.rate = rate
+        self.slow_turn_ms = slow_turn_ms
+        self.keep_severity = keep_severity
+
+        self.sampled_turns = 0
+        self.tail_kept_turns = 0
+        self.dropped_turns = 0
+        self.dropped_items = 0
+        self._reporter = MetricsReporter(
+            "TelemetrySampling",
+            self.metrics,
+            telemetry_client,
+            interval=report_interval,
+        )
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "sampled_turns": self.sampled_turns,
+            "tail_kept_turns": self.tail_kept_turns,
+            "dropped_turns": self.dropped_turns,
+            "dropped_items": self.dropped_items,
+        }
+
+    def is_sampled(self, conversation_id: str) -> bool:
+        return self.rate >= 1.0 or conversation_sample(conversation_id) < self.rate
+
+    def begin_turn(self, conversation_id: str):
+        """Return the buffer of a sampled-out turn, None when its telemetry is forwarded."""
+        self._reporter.report()
+        if self.is_sampled(conversation_id):
+            self.sampled_turns += 1
+            return None
+        return _TurnTelemetry()
+
+    def end_turn(self, turn: _TurnTelemetry, duration_ms: float) -> None:
+        if not (turn.failed or duration_ms >= self.slow_turn_ms):
+            self.dropped_turns += 1
+            self.dropped_items += len(turn.calls)
+            return
+
+        self.tail_kept_turns += 1
+        for method, args, kwargs in turn.calls:
+            getattr(self.telemetry_client, method)(*args, **kwargs)
+
+    def _forward(self, method: str, failed: bool, args: tuple, kwargs: dict) -> None:
+        turn = _TURN_TELEMETRY.get()
+        if turn is None:
+            getattr(self.telemetry_client, method)(*args, **kwargs)
+            return
+        turn.failed = turn.failed or failed
+        turn.calls.append((method, args, kwargs))
+
+    def track_pageview(self, *args, **kwargs) -> None:
+        self._forward("track_pageview", False, args, kwargs)
+
+    def track_exception(self, *args, **kwargs) -> None:
+        self._forward("track_exception", True, args, kwargs)
+
+    def track_event(self, *args, **kwargs) -> None:
+        self._forward("track_event", False, args, kwargs)
+
+    def track_metric(self, *args, **kwargs) -> None:
+        self._forward("track_metric", False, args, kwargs)
+
+    def track_trace(self, name, properties=None, severity: Severity = None) -> None:
+        failed = severity is not None and severity.value >= self.keep_severity.value
+        self._forward("track_trace", failed, (name, properties, severity), {})
+
+    def track_request(self, *args, **kwargs) -> None:
+        self._forward("track_request", False, args, kwargs)
+
+    def track_dependency(self, *args, **kwargs) -> None:
+        self._forward("track_dependency", False, args, kwargs)
+
+    def flush(self) -> None:
+        self.telemetry_client.flush()
+
+
+class TelemetrySamplingMiddleware(Middleware):
+    """
+    Scopes the telemetry of each turn for a SamplingTelemetryClient. Register it
+    before the middlewares whose telemetry should be sampled.
+    """
+
+    def __init__(self, telemetry_client: SamplingTelemetryClient):
+        self.telemetry_client = telemetry_client
+
+    async def on_turn(
+        self, context: TurnContext, logic: Callable[[TurnContext], Awaitable]
+    ):
+        conversation = context.activity.conversation
+        turn = self.telemetry_client.begin_turn(conversation.id if conversation else "")
+        if turn is None:
+            await logic()
+            return
+
+        token = _TURN_TELEMETRY.set(turn)
+        start = time.perf_counter()
+        try:
+            await logic()
+        except Exception:
+            turn.failed = True
+            raise
+        finally:
+            _TURN_TELEMETRY.reset(token)
+            self.telemetry_client.end_turn(turn, (time.perf_counter() - start) * 1000)
@@ -0,0 +1,22 @@
+from botbuilder.core import NullTelemetryClient
+
+
+class RecordingTelemetryClient(NullTelemetryClient):
+    """Telemetry client keeping what is tracked, for the assertions of the tests."""
+
+    def __init__(self):
+        # (name, properties, measurements) of the events, (name, value) of the metrics.
+        self.events = []
+        self.metrics = []
+        # Names of the events and traces, in the order they were tracked.
+        self.items = []
+
+    def track_event(self, name, properties=None, measurements=None):
+        self.events.append((name, properties, measurements))
+        self.items.append(name)
+
+    def track_trace(self, name, properties=None, severity=None):
+        self.items.append(name)
+
+    def track_metric(self, name, value, *args, **kwargs):
+        self.metrics.append((name, value))
@@ -0,0 +1,63 @@
+import copy
+import json
+import unittest
+
+from botbuilder.schema import Activity
+from msrest.exceptions import DeserializationError
+
+from benchmarks.activity_parsing import PAYLOADS_PATH
+from helpers.activity_parser import activity_from_dict, parse_activity
+
+
+class TestActivityParser(unittest.TestCase):
+
+    def setUp(self):
+        with open(PAYLOADS_PATH, "rb") as payloads_file:
+            self.payloads = json.load(payloads_file)
+
+    def test_same_activities_as_msrest(self):
+        for body in self.payloads:
+            expected = Activity().deserialize(body)
+            activity = parse_activity(json.dumps(body).encode("utf-8"))
+            self.assertEqual(activity.serialize(), expected.serialize())
+            self.assertEqual(activity.timestamp, expected.timestamp)
+            self.assertEqual(activity.members_removed, expected.members_removed)
+
+    def test_uncommon_fields_are_lazy(self):
+        activity = activity_from_dict(self.payloads[1])
+
+        self.assertNotIn("entities", vars(activity))
+        self.assertIn("timestamp", vars(activity))
+        self.assertEqual(activity.entities[0].type, "ClientCapabilities")
+        self.assertIn("entities", vars(activity))
+        self.assertIsNone(activity.suggested_actions)
+        self.assertEqual(copy.deepcopy(activity).timestamp, activity.timestamp)
+        with self.assertRaises(AttributeError):
+            activity.unknown
+
+    def test_copies_do_not_share_lazy_fields(self):
+        activity = activity_from_dict(self.payloads[1])
+        clone = copy.copy(activity)
+
+        self.assertEqual(activity.entities[0].type, "ClientCapabilities")
+        self.assertEqual(clone.entities[0].type, "ClientCapabilities")
+        self.assertEqual(clone.text, activity.text)
+
+    def test_rejects_invalid_dates(self):
+        body = dict(self.payloads[1], timestamp="garbage")
+        with self.assertRaises(DeserializationError):
+            activity_from_dict(body)
+
+    def test_falls_back_to_msrest(self):
+        invoke = activity_from_dict(self.payloads[5])
+        self.assertEqual(type(invoke), Activity)
+        self.assertEqual(invoke.value["action"]["verb"], "confirm")
+
+        body = dict(self.payloads[6], text=42, conversation={"id": 7})
+        odd = activity_from_dict(body)
+        self.assertEqual(type(odd), Activity)
+        self.assertEqual(odd.serialize(), Activity().deserialize(body).serialize())
+
+    def test_rejects_invalid_json(self):
+        with self.assertRaises(ValueError):
+            parse_activity(b"{not json")
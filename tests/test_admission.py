@@ -0,0 +1,146 @@
+import asyncio
+from http import HTTPStatus
+
+import aiounittest
+from botbuilder.core import ConversationState, MemoryStorage, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import DialogInstance, DialogState
+
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, dialog_in_stack
+from helpers.dialog_helper import DialogRegistry
+from tests.test_dialog_registry import GreetingDialog
+
+
+class TestAdmissionController(aiounittest.AsyncTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+
+    def controller(self, **options) -> AdmissionController:
+        return AdmissionController(clock=lambda: self.now, report_interval=0, **options)
+
+    async def test_serves_conversations_in_progress_first(self):
+        controller = self.controller(max_concurrent=1)
+        await controller.acquire("booking")
+        controller.mark("booking", True)
+        controller.release()
+
+        await controller.acquire("other")
+        order = []
+
+        async def turn(conversation_id):
+            await controller.acquire(conversation_id)
+            order.append(conversation_id)
+
+        new = asyncio.ensure_future(turn("new"))
+        await asyncio.sleep(0)
+        booking = asyncio.ensure_future(turn("booking"))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.waiting, 2)
+
+        controller.release()
+        await booking
+        controller.release()
+        await new
+        controller.release()
+
+        self.assertEqual(order, ["booking", "new"])
+        self.assertEqual(controller.active, 0)
+        self.assertEqual(controller.admitted_in_progress, 1)
+
+    async def test_sheds_new_conversations_first(self):
+        controller = self.controller(max_concurrent=1, max_queue=2, new_queue_share=0.5)
+        await controller.acquire("booking")
+        controller.mark("booking", True)
+        controller.release()
+
+        await controller.acquire("first")
+        second = asyncio.ensure_future(controller.acquire("second"))
+        await asyncio.sleep(0)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await controller.acquire("third")
+        self.assertEqual(rejected.exception.status, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(rejected.exception.retry_after, 1)
+
+        # The rest of the queue is kept for the bookings in progress.
+        booking = asyncio.ensure_future(controller.acquire("booking"))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.waiting, 2)
+        controller.release()
+        await booking
+        controller.release()
+        await second
+
+        controller.average_wait = 2.0
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await controller.acquire("fourth")
+        self.assertEqual(rejected.exception.retry_after, 2)
+        controller.release()
+        self.assertEqual((controller.shed_queue_full, controller.shed_latency), (1, 1))
+
+    async def test_sheds_turns_waiting_too_long(self):
+        controller = self.controller(max_concurrent=1, max_wait=0.01)
+        await controller.acquire("first")
+        with self.assertRaises(AdmissionRejected):
+            await controller.acquire("second")
+        self.assertEqual(controller.waiting, 0)
+        self.assertEqual(controller.shed_timeout, 1)
+
+        controller.release()
+        self.assertEqual(controller.active, 0)
+
+    async def test_limits_the_rate_of_each_conversation(self):
+        controller = self.controller(rate=1.0, burst=2.0)
+        for _ in range(2):
+            await controller.acquire("chatty")
+            controller.release()
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await controller.acquire("chatty")
+        self.assertEqual(rejected.exception.status, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(rejected.exception.retry_after, 1)
+        await controller.acquire("quiet")
+        controller.release()
+
+        self.now += 1.0
+        await controller.acquire("chatty")
+        controller.release()
+        self.assertEqual(controller.metrics()["rate_limited"], 1)
+
+    def test_finds_nested_dialogs(self):
+        booking = DialogState([DialogInstance("WaterfallDialog", {})])
+        main = DialogState(
+            [
+                DialogInstance(
+                    "MainDialog",
+                    {"dialogs": DialogState([DialogInstance("BookingDialog", {"dialogs": booking})])},
+                )
+            ]
+        )
+        self.assertTrue(dialog_in_stack(main, "BookingDialog"))
+        self.assertFalse(dialog_in_stack(booking, "BookingDialog"))
+
+    async def test_middleware_marks_dialogs_in_progress(self):
+        controller = self.controller()
+        conversation_state = ConversationState(MemoryStorage())
+        registry = DialogRegistry(
+            conversation_state.create_property("DialogState"), GreetingDialog()
+        )
+
+        async def logic(context: TurnContext):
+            await registry.run(context)
+            await conversation_state.save_changes(context)
+
+        adapter = TestAdapter(logic)
+        adapter.use(AdmissionMiddleware(controller, conversation_state, "TextPrompt"))
+        conversation_id = adapter.template.conversation.id
+
+        await controller.acquire(conversation_id)
+        await adapter.test("hi", "Name?")
+        controller.release()
+        self.assertTrue(controller._conversations[conversation_id].in_progress)
+
+        await controller.acquire(conversation_id)
+        await adapter.test("Ada", "Hello Ada")
+        controller.release()
+        self.assertFalse(controller._conversations[conversation_id].in_progress)
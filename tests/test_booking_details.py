@@ -0,0 +1,24 @@
+import unittest
+
+from booking_details import BookingDetails
+
+
+class TestBookingDetails(unittest.TestCase):
+
+    def test_caps_turns(self):
+        details = BookingDetails(turns=[])
+        spilled = [details.add_turn(str(index), max_turns=3) for index in range(5)]
+
+        self.assertEqual(details.turns, ["2", "3", "4"])
+        self.assertEqual(spilled, [[], [], [], ["0"], ["1"]])
+        self.assertEqual(details.spilled_turns, 2)
+
+    def test_has_no_instance_dict(self):
+        details = BookingDetails(dst_city="Paris", turns=[])
+        with self.assertRaises(AttributeError):
+            details.unknown = None
+        self.assertEqual(details.to_dict()["dst_city"], "Paris")
+
+    def test_turns_are_not_shared(self):
+        BookingDetails().turns.append("book a flight")
+        self.assertEqual(BookingDetails().turns, [])
@@ -35,7 +35,7 @@ class TestBotLuis(aiounittest.AsyncTestCase):
 
             await turn_context.send_activity(
                 json.dumps({"intent": intent,
-                            "booking_details": result.__dict__})
+                            "booking_details": result.to_dict()})
             )
 
         adapter = TestAdapter(exec_text)
@@ -48,7 +48,7 @@ class TestBotLuis(aiounittest.AsyncTestCase):
                             dst_city="Paris",
                             turns=[
                                 "I want to book a flight from Marseille to Paris"]
-                        ).__dict__})
+                        ).to_dict()})
         )
 
         await adapter.test(
@@ -57,9 +57,9 @@ class TestBotLuis(aiounittest.AsyncTestCase):
                         "booking_details": BookingDetails(
                             str_date="2022-08-12",
                             end_date="2022-09-15",
-                            turns=["I want to book a flight from Marseille to Paris",
-                                   "I want to travel from the 12 aug 2022 until 15 september 2022"]
-                        ).__dict__})
+                            turns=[
+                                "I want to travel from the 12 aug 2022 until 15 september 2022"]
+                        ).to_dict()})
         )
 
         await adapter.test(
@@ -67,10 +67,8 @@ class TestBotLuis(aiounittest.AsyncTestCase):
             json.dumps({"intent": "book",
                         "booking_details": BookingDetails(
                             budget="$ 500",
-                            turns=["I want to book a flight from Marseille to Paris",
-                                   "I want to travel from the 12 aug 2022 until 15 september 2022",
-                                   "I want to spend maximun $500"]
-                        ).__dict__})
+                            turns=["I want to spend maximun $500"]
+                        ).to_dict()})
         )
 
 
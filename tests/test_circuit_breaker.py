@@ -0,0 +1,137 @@
+import aiounittest
+from botbuilder.core import (
+    ConversationState,
+    IntentScore,
+    MemoryStorage,
+    Recognizer,
+    RecognizerResult,
+    TurnContext,
+)
+from botbuilder.core.adapters import TestAdapter
+
+from dialogs import BookingDialog, MainDialog
+from helpers.dialog_helper import DialogRegistry
+from recognition import CircuitBreaker, CircuitOpenError
+from storage import OutcomeStore
+from tests.recording_telemetry import RecordingTelemetryClient
+
+
+class DegradedRecognizer(Recognizer):
+    """LUIS recognizer whose breaker is open."""
+
+    is_configured = True
+    is_degraded = True
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        raise CircuitOpenError("luis")
+
+
+class StaticRecognizer(Recognizer):
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        return RecognizerResult(
+            text=turn_context.activity.text,
+            intents={"book": IntentScore(0.9)},
+            entities={"dst_city": ["paris"]},
+        )
+
+
+class TestCircuitBreaker(aiounittest.AsyncTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.telemetry = RecordingTelemetryClient()
+        self.breaker = CircuitBreaker(
+            "luis",
+            window=4,
+            min_calls=4,
+            failure_rate=0.5,
+            open_seconds=10,
+            telemetry_client=self.telemetry,
+            clock=lambda: self.now,
+        )
+
+    async def succeed(self):
+        return "ok"
+
+    async def fail(self):
+        raise TimeoutError()
+
+    async def slow(self):
+        self.now += 5
+        return "ok"
+
+    async def test_opens_and_fails_fast(self):
+        for function in (self.succeed, self.succeed, self.fail):
+            try:
+                await self.breaker.call(function)
+            except TimeoutError:
+                pass
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        with self.assertRaises(TimeoutError):
+            await self.breaker.call(self.fail)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(self.breaker.is_degraded)
+
+        with self.assertRaises(CircuitOpenError):
+            await self.breaker.call(self.succeed)
+        self.assertEqual(self.breaker.rejected, 1)
+
+    async def test_opens_on_slow_calls(self):
+        for _ in range(4):
+            await self.breaker.call(self.slow)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    async def test_half_open_probe(self):
+        self.breaker.min_calls = 1
+        with self.assertRaises(TimeoutError):
+            await self.breaker.call(self.fail)
+
+        self.now = 10
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(TimeoutError):
+            await self.breaker.call(self.fail)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.now = 25
+        self.assertEqual(await self.breaker.call(self.succeed), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.degraded_seconds, 25)
+
+        transitions = [(event[1]["from"], event[1]["to"]) for event in self.telemetry.events]
+        self.assertEqual(transitions, [
+            ("closed", "open"),
+            ("open", "half_open"),
+            ("half_open", "open"),
+            ("open", "half_open"),
+            ("half_open", "closed"),
+        ])
+        self.assertEqual(self.telemetry.events[-1][2], {"degradedSeconds": 25})
+
+
+class TestMainDialogFallback(aiounittest.AsyncTestCase):
+
+    async def test_uses_the_fallback_while_luis_is_degraded(self):
+        telemetry = RecordingTelemetryClient()
+        booking_dialog = BookingDialog(
+            outcome_store=OutcomeStore(),
+            new_data_store=OutcomeStore(),
+            turn_spill_store=OutcomeStore(),
+        )
+        dialog = MainDialog(
+            DegradedRecognizer(), booking_dialog, telemetry, StaticRecognizer()
+        )
+        conversation_state = ConversationState(MemoryStorage())
+        registry = DialogRegistry(conversation_state.create_property("DialogState"), dialog)
+
+        async def logic(context: TurnContext):
+            await registry.run(context)
+            await conversation_state.save_changes(context)
+
+        adapter = TestAdapter(logic)
+        await adapter.test("hi", "What can I help you with today?")
+        # The booking starts with the destination found by the fallback recognizer.
+        await adapter.test("book a flight to paris", "From what city will you be travelling?")
+
+        self.assertIn("RecognizerFallback", telemetry.items)
@@ -0,0 +1,46 @@
+import unittest
+
+from helpers.date_normalizer import DateNormalizer, NormalizedDate, dateutil_components
+from helpers.luis_helper import get_timex
+
+
+class TestDateNormalizer(unittest.TestCase):
+
+    def setUp(self):
+        self.normalizer = DateNormalizer(max_entries=16)
+
+    def test_timex_and_explicit_components(self):
+        self.assertEqual(self.normalizer.normalize("12 aug 2022"), NormalizedDate("2022-08-12", True, True, True))
+        self.assertEqual(self.normalizer.normalize("August 5th"), NormalizedDate("XXXX-08-05", False, True, True))
+        self.assertEqual(self.normalizer.normalize("2022-08-12").timex, "2022-08-12")
+        self.assertEqual(self.normalizer.normalize("12/08/22").timex, "2022-12-08")
+        self.assertIsNone(self.normalizer.normalize("31 feb 2022"))
+        self.assertIsNone(self.normalizer.normalize("tomorrow"))
+
+    def test_fast_paths_agree_with_dateutil(self):
+        for text in ["23 aug 2022", "aug 23rd, 2022", "23rd of august", "2022-8-23"]:
+            year, month, day = dateutil_components(text)
+            self.assertEqual(
+                self.normalizer.normalize(text),
+                NormalizedDate(
+                    "-".join([
+                        f"{year:04d}" if year else "XXXX",
+                        f"{month:02d}",
+                        f"{day:02d}",
+                    ]),
+                    year is not None,
+                    True,
+                    True,
+                ),
+            )
+        self.assertEqual(self.normalizer.dateutil_parses, 0)
+
+    def test_batch_parses_each_string_once(self):
+        results = self.normalizer.normalize_many(["23 aug 2022", "23  AUG 2022", "monday", "23 aug 2022"])
+        self.assertEqual([result.timex for result in results], ["2022-08-23", "2022-08-23", "XXXX-XX-XX", "2022-08-23"])
+        self.assertEqual(self.normalizer.cache_info().misses, 2)
+
+    def test_get_timex(self):
+        self.assertEqual(get_timex("15 september 2022"), "2022-09-15")
+        with self.assertRaises(ValueError):
+            get_timex("not a date")
@@ -0,0 +1,64 @@
+import aiounittest
+from botbuilder.core import ConversationState, MemoryStorage, MessageFactory, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import WaterfallDialog, WaterfallStepContext
+from botbuilder.dialogs.memory import DialogStateManagerConfiguration
+from botbuilder.dialogs.prompts import PromptOptions, TextPrompt
+
+from dialogs import CancelAndHelpDialog
+from helpers.dialog_helper import DialogRegistry
+
+
+class GreetingDialog(CancelAndHelpDialog):
+
+    def __init__(self):
+        super(GreetingDialog, self).__init__(GreetingDialog.__name__)
+        self.add_dialog(TextPrompt(TextPrompt.__name__))
+        self.add_dialog(WaterfallDialog(WaterfallDialog.__name__, [self.ask, self.greet]))
+        self.initial_dialog_id = WaterfallDialog.__name__
+
+    async def ask(self, step_context: WaterfallStepContext):
+        return await step_context.prompt(
+            TextPrompt.__name__, PromptOptions(prompt=MessageFactory.text("Name?"))
+        )
+
+    async def greet(self, step_context: WaterfallStepContext):
+        await step_context.context.send_activity(f"Hello {step_context.result}")
+        return await step_context.end_dialog()
+
+
+class TestDialogRegistry(aiounittest.AsyncTestCase):
+
+    async def test_runs_every_turn_on_the_same_set(self):
+        conversation_state = ConversationState(MemoryStorage())
+        registry = DialogRegistry(
+            conversation_state.create_property("DialogState"), GreetingDialog()
+        )
+        configurations = []
+
+        async def logic(context: TurnContext):
+            await registry.run(context)
+            configurations.append(
+                context.turn_state[DialogStateManagerConfiguration.__name__]
+            )
+            await conversation_state.save_changes(context)
+
+        adapter = TestAdapter(logic)
+        await adapter.test("hi", "Name?")
+        await adapter.test("Ada", "Hello Ada")
+        await adapter.test("hi", "Name?")
+        await adapter.test("help", "Show Help...")
+
+        self.assertEqual(len(configurations), 4)
+        self.assertTrue(all(item is registry.state_configuration for item in configurations))
+        self.assertTrue(registry.state_configuration.memory_scopes)
+
+    def test_is_immutable(self):
+        conversation_state = ConversationState(MemoryStorage())
+        registry = DialogRegistry(
+            conversation_state.create_property("DialogState"), GreetingDialog()
+        )
+        with self.assertRaises(TypeError):
+            registry.add(GreetingDialog())
+        with self.assertRaises(TypeError):
+            registry._dialogs["other"] = GreetingDialog()
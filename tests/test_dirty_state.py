@@ -0,0 +1,75 @@
+import aiounittest
+from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.core.adapters import TestAdapter
+
+from bots import DialogBot
+from storage import DirtyTrackingConversationState, DirtyTrackingUserState, STATE_SAVES_KEY
+from tests.recording_telemetry import RecordingTelemetryClient
+from tests.test_dialog_registry import GreetingDialog
+
+
+class CountingStorage(MemoryStorage):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    async def write(self, changes):
+        self.writes += 1
+        await super().write(changes)
+
+
+class TestDirtyTrackingState(aiounittest.AsyncTestCase):
+
+    async def test_skips_unchanged_state(self):
+        storage = CountingStorage()
+        conversation_state = DirtyTrackingConversationState(storage)
+        user_state = DirtyTrackingUserState(storage)
+        accessor = conversation_state.create_property("count")
+        saves = []
+
+        async def logic(context: TurnContext):
+            count = await accessor.get(context, lambda: 0)
+            if context.activity.text == "increment":
+                await accessor.set(context, count + 1)
+            await conversation_state.save_changes(context)
+            await user_state.save_changes(context)
+            saves.append(context.turn_state[STATE_SAVES_KEY])
+            await context.send_activity(str(await accessor.get(context)))
+
+        adapter = TestAdapter(logic)
+        await adapter.test("increment", "1")
+        await adapter.test("help", "1")
+        await adapter.test("increment", "2")
+
+        self.assertEqual(storage.writes, 2)
+        self.assertEqual(saves, [
+            {"written": 1, "skipped": 1},
+            {"written": 0, "skipped": 2},
+            {"written": 1, "skipped": 1},
+        ])
+        self.assertEqual((conversation_state.writes, conversation_state.skipped_writes), (2, 1))
+        self.assertEqual(user_state.skipped_writes, 3)
+
+    async def test_bot_reports_the_saves_as_metrics(self):
+        storage = CountingStorage()
+        telemetry_client = RecordingTelemetryClient()
+        bot = DialogBot(
+            DirtyTrackingConversationState(storage),
+            DirtyTrackingUserState(storage),
+            GreetingDialog(),
+            telemetry_client,
+        )
+        adapter = TestAdapter(bot.on_turn)
+
+        await adapter.test("hi", "Name?")
+        await adapter.test("Ada", "Hello Ada")
+        self.assertEqual(bot.metrics(), {"written": 2, "skipped": 2})
+        # Counted, not sent as an event per turn.
+        self.assertEqual(telemetry_client.events, [])
+
+        bot._saves_reporter.interval = 1e-9
+        await adapter.test("Grace", "Name?")
+        self.assertEqual(
+            telemetry_client.metrics, [("StateSaves.written", 3), ("StateSaves.skipped", 3)]
+        )
@@ -0,0 +1,62 @@
+import os
+
+import aiounittest
+
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+
+from recognition import FastPathRecognizer, Gazetteer
+from tests.recording_telemetry import RecordingTelemetryClient
+
+MODEL_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "cognitiveModels", "FlightBooking.json"
+)
+
+
+class TestFastPathRecognizer(aiounittest.AsyncTestCase):
+
+    def setUp(self):
+        self.recognizer = FastPathRecognizer(None, Gazetteer.from_luis_model(MODEL_PATH))
+
+    def test_resolves_structured_booking(self):
+        result, confidence = self.recognizer.match(
+            "book a flight from London to new york on 23 aug 2022 until 30 aug 2022 for $500"
+        )
+        self.assertEqual(confidence, 1.0)
+        self.assertEqual(result.intents["book"].score, 1.0)
+        self.assertEqual(result.entities, {
+            "or_city": ["London"],
+            "dst_city": ["New York"],
+            "str_date": ["23 aug 2022"],
+            "end_date": ["30 aug 2022"],
+            "budget": ["$ 500"],
+        })
+
+    def test_unknown_words_lower_confidence(self):
+        _, confidence = self.recognizer.match("I want to fly from Marseille to Paris")
+        self.assertLess(confidence, self.recognizer.threshold)
+
+    def test_requires_booking_intent(self):
+        self.assertEqual(self.recognizer.match("Paris"), (None, 0.0))
+        self.assertEqual(self.recognizer.match("cancel"), (None, 0.0))
+
+    async def test_reports_the_resolutions_as_metrics(self):
+        telemetry_client = RecordingTelemetryClient()
+        recognizer = FastPathRecognizer(
+            None,
+            Gazetteer.from_luis_model(MODEL_PATH),
+            telemetry_client=telemetry_client,
+            report_interval=1e-9,
+        )
+        activity = Activity(type=ActivityTypes.message, text="book a flight to Paris")
+        await recognizer.recognize(TurnContext(TestAdapter(), activity))
+
+        self.assertEqual(telemetry_client.events, [])
+        self.assertEqual(
+            telemetry_client.metrics,
+            [
+                ("FastPathRecognizer.local_resolutions", 1),
+                ("FastPathRecognizer.remote_resolutions", 0),
+            ],
+        )
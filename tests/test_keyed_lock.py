@@ -0,0 +1,126 @@
+import asyncio
+import gc
+import multiprocessing
+import tempfile
+import time
+
+import aiounittest
+from botbuilder.core import ConversationState, MemoryStorage, UserState
+from botbuilder.core.adapters import TestAdapter
+
+from bots import DialogBot
+from storage import FileKeyedLock, KeyedLock
+from tests.test_dialog_registry import GreetingDialog
+
+
+class YieldingStorage(MemoryStorage):
+    """MemoryStorage letting the other turns run while it reads and writes."""
+
+    async def read(self, keys):
+        await asyncio.sleep(0.01)
+        return await super(YieldingStorage, self).read(keys)
+
+    async def write(self, changes):
+        await asyncio.sleep(0.01)
+        await super(YieldingStorage, self).write(changes)
+
+
+def hold_file_lock(directory: str, key: str, held, release) -> None:
+    async def hold():
+        async with FileKeyedLock(directory)(key):
+            held.set()
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+
+    asyncio.run(hold())
+
+
+class TestKeyedLock(aiounittest.AsyncTestCase):
+
+    async def test_serializes_the_holders_of_a_key(self):
+        lock = KeyedLock()
+        events = []
+
+        async def hold(key: str, name: str):
+            async with lock(key):
+                events.append(f"{name} in")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} out")
+
+        await asyncio.gather(hold("a", "first"), hold("a", "second"), hold("b", "other"))
+
+        self.assertEqual(events[:2], ["first in", "other in"])
+        self.assertLess(events.index("first out"), events.index("second in"))
+        self.assertEqual(lock.metrics()["acquisitions"], 3)
+        self.assertEqual(lock.metrics()["contended"], 1)
+
+    async def test_frees_idle_keys(self):
+        lock = KeyedLock()
+        async with lock("a"):
+            self.assertEqual(lock.keys, 1)
+        gc.collect()
+        self.assertEqual(lock.keys, 0)
+
+    async def test_file_lock_is_held_across_processes(self):
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as directory:
+            held, release = context.Event(), context.Event()
+            process = context.Process(
+                target=hold_file_lock, args=(directory, "a", held, release)
+            )
+            process.start()
+            try:
+                self.assertTrue(held.wait(5))
+                lock = FileKeyedLock(directory, timeout=5)
+
+                # Another shard is not locked.
+                other = next(key for key in "bcdefgh" if lock.path(key) != lock.path("a"))
+                async with lock(other):
+                    pass
+
+                asyncio.get_event_loop().call_later(0.05, release.set)
+                start = time.monotonic()
+                async with lock("a"):
+                    self.assertGreaterEqual(time.monotonic() - start, 0.04)
+                self.assertEqual(lock.metrics()["file_contended"], 1)
+                self.assertEqual(lock.metrics()["timeouts"], 0)
+            finally:
+                release.set()
+                process.join(5)
+
+    async def test_file_lock_gives_up_after_the_timeout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            holder = FileKeyedLock(directory)
+            lock = FileKeyedLock(directory, timeout=0.02)
+            async with holder("a"):
+                async with lock("a"):
+                    pass
+            self.assertEqual(lock.timeouts, 1)
+            async with lock("a"):
+                pass
+            self.assertEqual(lock.timeouts, 1)
+
+
+class TestDialogBotTurnLock(aiounittest.AsyncTestCase):
+
+    async def test_runs_the_turns_of_a_conversation_one_at_a_time(self):
+        storage = YieldingStorage()
+        conversation_state = ConversationState(storage)
+        bot = DialogBot(
+            conversation_state,
+            UserState(storage),
+            GreetingDialog(),
+            None,
+            turn_lock=KeyedLock(),
+        )
+        adapter = TestAdapter(bot.on_turn)
+
+        # Both turns are processed together: without the lock the second one loads
+        # the state before the first saves it and asks for the name again.
+        await asyncio.gather(
+            adapter.receive_activity("hi"), adapter.receive_activity("Ada")
+        )
+        replies = [activity.text for activity in adapter.activity_buffer]
+
+        self.assertEqual(replies, ["Name?", "Hello Ada"])
+        self.assertEqual(bot.turn_lock.contended, 1)
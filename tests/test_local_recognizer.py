@@ -0,0 +1,39 @@
+import os
+
+import aiounittest
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+
+from helpers.luis_helper import LuisHelper
+from recognition import LocalRecognizer
+
+MODEL_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "cognitiveModels", "FlightBooking.json"
+)
+
+
+class TestLocalRecognizer(aiounittest.AsyncTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.recognizer = LocalRecognizer.from_sources(MODEL_PATH, new_data_path=None)
+
+    async def test_execute_luis_query(self):
+        async def exec_text(turn_context: TurnContext):
+            intent, result = await LuisHelper.execute_luis_query(
+                self.recognizer, turn_context
+            )
+            await turn_context.send_activity(
+                f"{intent} {result.or_city} {result.dst_city} {result.str_date}"
+            )
+
+        adapter = TestAdapter(exec_text)
+        await adapter.test(
+            "I want to book a flight from Marseille to Paris on 12 aug 2022",
+            "book Marseille Paris 2022-08-12",
+        )
+
+    def test_predicts_single_top_intent(self):
+        result = self.recognizer.predict("I want to spend maximun $500")
+        self.assertEqual(list(result.intents), ["book"])
+        self.assertEqual(result.entities, {"budget": ["$500"]})
@@ -0,0 +1,131 @@
+import asyncio
+
+import aiounittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from botbuilder.ai.luis import LuisApplication
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer, luis_endpoint
+from recognition import LuisHttpClient
+
+APP_ID = "b31aeaf3-3511-495b-a07f-571fc873214b"
+
+
+class TestLuisHttpClient(aiounittest.AsyncTestCase):
+
+    async def start_fake_luis(self, delays: list) -> TestServer:
+        calls = []
+
+        async def predict(request: web.Request) -> web.Response:
+            utterance = await request.json()
+            calls.append(utterance)
+            await asyncio.sleep(delays[min(len(calls), len(delays)) - 1])
+            return web.json_response({
+                "query": utterance,
+                "topScoringIntent": {"intent": "book", "score": 0.9},
+                "entities": [{"entity": "paris", "type": "dst_city", "startIndex": 0, "endIndex": 4}],
+            })
+
+        app = web.Application()
+        app.router.add_post(f"/luis/v2.0/apps/{APP_ID}", predict)
+        server = TestServer(app)
+        await server.start_server()
+        server.calls = calls
+        return server
+
+    def create_client(self, server: TestServer, **kwargs) -> LuisHttpClient:
+        application = LuisApplication(APP_ID, "0d2a8a1c-7b7f-4d1a-9d3e-6c1c2c0e0a11", str(server.make_url("")).rstrip("/"))
+        return LuisHttpClient(application, **kwargs)
+
+    async def test_recognize(self):
+        server = await self.start_fake_luis([0])
+        client = self.create_client(server)
+
+        result = await client.recognize("Paris")
+        self.assertEqual(result.intents["book"].score, 0.9)
+        self.assertEqual(result.entities["dst_city"], ["paris"])
+
+        await client.close()
+        await server.close()
+
+    async def test_single_flight(self):
+        server = await self.start_fake_luis([0.05])
+        client = self.create_client(server)
+
+        results = await asyncio.gather(*[client.predict("Paris") for _ in range(5)])
+        self.assertEqual(len(server.calls), 1)
+        self.assertEqual(client.coalesced, 4)
+        self.assertEqual(len({result["query"] for result in results}), 1)
+
+        await client.close()
+        await server.close()
+
+    async def test_follower_outlives_a_cancelled_leader(self):
+        server = await self.start_fake_luis([0.05])
+        client = self.create_client(server)
+
+        leader = asyncio.ensure_future(client.predict("Paris"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(client.predict("Paris"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        result = await follower
+        self.assertEqual(result["query"], "Paris")
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(len(server.calls), 1)
+
+        await client.close()
+        await server.close()
+
+    async def test_hedges_slow_attempt(self):
+        server = await self.start_fake_luis([1.0, 0])
+        client = self.create_client(server, hedge_after=0.05)
+
+        await asyncio.wait_for(client.predict("Paris"), 0.5)
+        self.assertEqual(client.hedged, 1)
+        self.assertEqual(len(server.calls), 2)
+
+        await client.close()
+        await server.close()
+
+    async def test_recognizer_times_the_cache_hits_and_misses(self):
+        server = await self.start_fake_luis([0.02])
+        configuration = DefaultConfig()
+        configuration.LUIS_APP_ID = APP_ID
+        configuration.LUIS_API_KEY = "0d2a8a1c-7b7f-4d1a-9d3e-6c1c2c0e0a11"
+        configuration.LUIS_API_HOST_NAME = str(server.make_url("")).rstrip("/")
+        configuration.LUIS_CACHE_PATH = ""
+        recognizer = FlightBookingRecognizer(configuration)
+        adapter = TestAdapter()
+
+        for _ in range(2):
+            activity = Activity(
+                type=ActivityTypes.message,
+                text="Paris",
+                from_property=ChannelAccount(id="user"),
+                recipient=ChannelAccount(id="bot"),
+                conversation=ConversationAccount(id="conversation"),
+            )
+            result = await recognizer.recognize(TurnContext(adapter, activity))
+            self.assertEqual(result.entities["dst_city"], ["paris"])
+
+        metrics = recognizer.cache_metrics()
+        self.assertEqual(metrics["memory_hits"], 1)
+        self.assertEqual(metrics["misses"], 1)
+        self.assertGreaterEqual(metrics["miss_latency_ms"], 20)
+        self.assertLess(metrics["hit_latency_ms"], metrics["miss_latency_ms"])
+
+        await recognizer.close()
+        await server.close()
+
+
+class TestLuisEndpoint(aiounittest.AsyncTestCase):
+
+    def test_scheme_is_optional(self):
+        self.assertEqual(luis_endpoint("westus.api.cognitive.microsoft.com"), "https://westus.api.cognitive.microsoft.com")
+        self.assertEqual(luis_endpoint("http://127.0.0.1:8080/"), "http://127.0.0.1:8080")
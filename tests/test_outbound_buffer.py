@@ -0,0 +1,131 @@
+import aiounittest
+from botbuilder.core import CardFactory, MessageFactory, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import (
+    Activity,
+    ActivityTypes,
+    DeliveryModes,
+    Entity,
+    HeroCard,
+    InputHints,
+)
+
+from bots import OutboundBufferMiddleware, coalesce_activities
+from tests.recording_telemetry import RecordingTelemetryClient
+
+
+class RecordingAdapter(TestAdapter):
+    """TestAdapter remembering each batch of activities handed to it."""
+
+    def __init__(self, logic):
+        super().__init__(logic)
+        self.batches = []
+
+    async def send_activities(self, context, activities):
+        # TurnContext hands the list over even when the buffer emptied it.
+        if activities:
+            self.batches.append([activity.text for activity in activities])
+        return await super().send_activities(context, activities)
+
+
+class TestOutboundBuffer(aiounittest.AsyncTestCase):
+
+    def test_coalesce_keeps_inputs(self):
+        first = MessageFactory.text("Booked.", input_hint=InputHints.ignoring_input)
+        second = MessageFactory.text("What else?", input_hint=InputHints.expecting_input)
+        card = MessageFactory.attachment(CardFactory.hero_card(HeroCard(title="Welcome")))
+
+        merged = coalesce_activities([first, second, card, first])
+
+        self.assertEqual([activity.text for activity in merged], ["Booked.\n\nWhat else?", None, "Booked."])
+        self.assertEqual(merged[0].input_hint, InputHints.expecting_input)
+        self.assertEqual(first.text, "Booked.")
+        self.assertIs(merged[2], first)
+
+    def test_coalesce_keeps_entities_values_and_locales(self):
+        mention = MessageFactory.text("Hi Ada.")
+        mention.entities = [Entity(type="mention")]
+        answer = MessageFactory.text("Yes.")
+        answer.value = {"confirmed": True}
+        french = MessageFactory.text("Bonjour.")
+        french.locale = "fr-FR"
+
+        activities = [MessageFactory.text("Booked."), mention, answer, french]
+        self.assertEqual(coalesce_activities(activities), activities)
+
+    async def test_turn_sends_one_batch(self):
+        buffer = OutboundBufferMiddleware()
+
+        async def logic(context: TurnContext):
+            await context.send_activity("Booked.")
+            await context.send_activity(Activity(type=ActivityTypes.trace, name="trace"))
+            await context.send_activity("What else?")
+
+        adapter = RecordingAdapter(logic)
+        adapter.use(buffer)
+        await adapter.send("hi")
+
+        self.assertEqual(adapter.batches, [["Booked.", None, "What else?"]])
+        self.assertEqual(buffer.metrics()["flushes"], 1)
+
+    async def test_merges_consecutive_messages(self):
+        buffer = OutboundBufferMiddleware()
+
+        async def logic(context: TurnContext):
+            await context.send_activity("Booked.")
+            await context.send_activity("What else?")
+            await context.send_activity(Activity(type=ActivityTypes.typing))
+            await context.send_activity("Still there?")
+
+        adapter = RecordingAdapter(logic)
+        adapter.use(buffer)
+        step = await adapter.send("hi")
+        step = await step.assert_reply("Booked.\n\nWhat else?")
+        step = await step.assert_reply(lambda activity, description: None)
+        await step.assert_reply("Still there?")
+
+        # The typing activity flushed the buffer to keep the order.
+        self.assertEqual(adapter.batches, [["Booked.\n\nWhat else?"], [None], ["Still there?"]])
+        self.assertEqual(buffer.metrics(), {"activities": 4, "sent": 3, "flushes": 2, "expect_replies": 0})
+
+    async def test_expect_replies_untouched(self):
+        buffer = OutboundBufferMiddleware()
+
+        async def logic(context: TurnContext):
+            await context.send_activity("Booked.")
+            await context.send_activity("What else?")
+
+        adapter = RecordingAdapter(logic)
+        adapter.use(buffer)
+        activity = Activity(
+            type=ActivityTypes.message,
+            text="hi",
+            channel_id="test",
+            conversation=adapter.template.conversation,
+            delivery_mode=DeliveryModes.expect_replies,
+        )
+        context = TurnContext(adapter, activity)
+        await adapter.run_pipeline(context, logic)
+
+        self.assertEqual(
+            [reply.text for reply in context.buffered_reply_activities], ["Booked.", "What else?"]
+        )
+        self.assertEqual(adapter.batches, [])
+        self.assertEqual(buffer.expect_replies, 2)
+
+    async def test_reports_metrics(self):
+        telemetry = RecordingTelemetryClient()
+        buffer = OutboundBufferMiddleware(telemetry_client=telemetry, report_interval=1e-9)
+
+        async def logic(context: TurnContext):
+            await context.send_activity("Booked.")
+            await context.send_activity("What else?")
+
+        adapter = RecordingAdapter(logic)
+        adapter.use(buffer)
+        await adapter.send("hi")
+        await adapter.send("hi")
+
+        reported = [value for name, value in telemetry.metrics if name == "OutboundBuffer.activities"]
+        self.assertEqual(reported, [2, 2])
+        self.assertIn(("OutboundBuffer.sent", 1), telemetry.metrics)
@@ -0,0 +1,42 @@
+import tempfile
+import unittest
+
+from storage import JsonlOutcomeStore, OUTCOME_ACCEPTED, OUTCOME_REFUSED
+
+
+class TestJsonlOutcomeStore(unittest.TestCase):
+
+    def test_append_and_read(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = JsonlOutcomeStore(directory)
+            store.append(OUTCOME_ACCEPTED, {"dst_city": "Paris"})
+            store.append(OUTCOME_REFUSED, {"dst_city": "London"})
+            store.close()
+
+            self.assertEqual(
+                list(JsonlOutcomeStore(directory).read()),
+                [(OUTCOME_ACCEPTED, {"dst_city": "Paris"}),
+                 (OUTCOME_REFUSED, {"dst_city": "London"})]
+            )
+
+    def test_rotates_segments(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = JsonlOutcomeStore(directory, max_segment_bytes=64)
+            for index in range(5):
+                store.append(OUTCOME_ACCEPTED, {"index": index})
+            store.close()
+
+            self.assertEqual(len(store.segments()), 5)
+            self.assertEqual(
+                [record["index"] for _, record in store.read()], [0, 1, 2, 3, 4]
+            )
+
+    def test_skips_torn_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = JsonlOutcomeStore(directory)
+            store.append(OUTCOME_ACCEPTED, {"index": 0})
+            store.close()
+            with open(store.segments()[0], "a") as segment:
+                segment.write('{"outcome": "succ')
+
+            self.assertEqual(len(list(store.read())), 1)
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import aiounittest
+from botbuilder.core import IntentScore, RecognizerResult
+
+from recognition import PredictionCache
+
+
+class TestPredictionCache(unittest.TestCase):
+
+    def test_key_is_normalized(self):
+        cache = PredictionCache("app", "0.1")
+        self.assertEqual(cache.key("  Paris \n"), cache.key("paris"))
+        self.assertNotEqual(cache.key("paris"), PredictionCache("app", "0.2").key("paris"))
+
+    def test_round_trip(self):
+        cache = PredictionCache("app")
+        result = RecognizerResult(
+            text="Paris",
+            intents={"book": IntentScore(0.9)},
+            entities={"dst_city": ["paris"]},
+        )
+        cache.set(cache.key("Paris"), PredictionCache.to_cached(result))
+
+        cached, tier = cache.get(cache.key("PARIS"))
+        restored = PredictionCache.from_cached("PARIS", cached)
+        self.assertEqual(tier, "memory")
+        self.assertEqual(restored.text, "PARIS")
+        self.assertEqual(restored.intents["book"].score, 0.9)
+        self.assertEqual(restored.entities, {"dst_city": ["paris"]})
+
+    def test_lru_and_ttl(self):
+        cache = PredictionCache("app", max_entries=1)
+        cache.set("a", {})
+        cache.set("b", {})
+        self.assertEqual(cache.get("a"), (None, "miss"))
+
+        expired = PredictionCache("app", ttl=-1)
+        expired.set("a", {})
+        self.assertEqual(expired.get("a"), (None, "miss"))
+
+    def test_disk_tier_is_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            PredictionCache("app", disk_path=path).set("a", {"intents": {}})
+
+            cached, tier = PredictionCache("app", disk_path=path).get("a")
+            self.assertEqual((cached, tier), ({"intents": {}}, "disk"))
+
+    def test_disk_tier_evicts_expired_entries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            cache = PredictionCache("app", ttl=-1, disk_path=path, evict_every=2)
+            cache.set("a", {})
+            with sqlite3.connect(path) as connection:
+                self.assertEqual(connection.execute("SELECT COUNT(*) FROM predictions").fetchone(), (1,))
+            cache.set("b", {})
+            with sqlite3.connect(path) as connection:
+                self.assertEqual(connection.execute("SELECT COUNT(*) FROM predictions").fetchone(), (0,))
+            cache.close()
+
+
+class TestPredictionCacheOnTheLoop(aiounittest.AsyncTestCase):
+
+    async def test_disk_tier_off_the_loop(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            writer = PredictionCache("app", disk_path=path)
+            writer.store("a", {"intents": {}})
+            self.assertEqual(await writer.lookup("a"), ({"intents": {}}, "memory"))
+            # Waits for the background write.
+            writer.close()
+
+            reader = PredictionCache("app", disk_path=path)
+            self.assertEqual(await reader.lookup("a"), ({"intents": {}}, "disk"))
+            self.assertEqual(await reader.lookup("b"), (None, "miss"))
+            self.assertEqual(
+                reader.metrics(),
+                {"memory_hits": 0, "disk_hits": 1, "misses": 1, "entries": 1},
+            )
+            reader.close()
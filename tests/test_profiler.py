@@ -0,0 +1,138 @@
+import os
+import tempfile
+
+import aiounittest
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import DialogSet, DialogTurnStatus
+from botbuilder.core import ConversationState, MemoryStorage
+
+from dialogs import ProfiledWaterfallDialog
+from telemetry import TurnProfiler, TurnProfilerMiddleware, span
+from tests.recording_telemetry import RecordingTelemetryClient
+
+
+class TestTurnProfiler(aiounittest.AsyncTestCase):
+
+    async def run_turn(self, profiler, logic):
+        adapter = TestAdapter(logic)
+        adapter.use(TurnProfilerMiddleware(profiler))
+        await adapter.test("hi", "hello")
+
+    async def test_records_span_tree(self):
+        telemetry = RecordingTelemetryClient()
+        profiler = TurnProfiler(telemetry, sample_rate=1.0, sampler=lambda: 0.0)
+
+        async def logic(context: TurnContext):
+            with span("recognize"):
+                with span("cache"):
+                    pass
+            with span("recognize"):
+                pass
+            await context.send_activity("hello")
+
+        await self.run_turn(profiler, logic)
+
+        [(name, properties, timings)] = telemetry.events
+        self.assertEqual(name, "TurnProfile")
+        self.assertEqual(properties, {"root": "turn", "slow": "false"})
+        self.assertEqual(
+            sorted(timings),
+            ["turn", "turn/recognize", "turn/recognize/cache", "turn/send_activity"],
+        )
+        self.assertGreaterEqual(timings["turn"], timings["turn/recognize"])
+        self.assertEqual(profiler.summary()["turn/recognize"]["count"], 1)
+
+    async def test_reports_the_aggregates(self):
+        telemetry = RecordingTelemetryClient()
+        profiler = TurnProfiler(
+            telemetry, sample_rate=1.0, sampler=lambda: 0.0, report_interval=1e-9
+        )
+
+        async def logic(context: TurnContext):
+            with span("recognize"):
+                pass
+            await context.send_activity("hello")
+
+        await self.run_turn(profiler, logic)
+        await self.run_turn(profiler, logic)
+
+        counts = [value for name, value in telemetry.metrics if name == "TurnProfile.turn/recognize.count"]
+        self.assertEqual(counts, [1, 1])
+        self.assertIn("TurnProfile.turn.totalMs", dict(telemetry.metrics))
+
+    async def test_unsampled_turns_record_nothing(self):
+        telemetry = RecordingTelemetryClient()
+        profiler = TurnProfiler(telemetry, sample_rate=0.0)
+        spans = []
+
+        async def logic(context: TurnContext):
+            spans.append(span("recognize"))
+            await context.send_activity("hello")
+
+        await self.run_turn(profiler, logic)
+
+        self.assertEqual(telemetry.events, [])
+        self.assertEqual(profiler.sampled, 0)
+        self.assertIs(spans[0], span("other"))
+
+    async def test_samples_once_per_request(self):
+        telemetry = RecordingTelemetryClient()
+        draws = iter([0.9, 0.0, 0.0])
+        profiler = TurnProfiler(telemetry, sample_rate=0.5, sampler=lambda: next(draws))
+
+        async def logic(context: TurnContext):
+            await context.send_activity("hello")
+
+        async with profiler.profile("request"):
+            await self.run_turn(profiler, logic)
+        self.assertEqual(telemetry.events, [])
+
+        async with profiler.profile("request"):
+            await self.run_turn(profiler, logic)
+        [(_, properties, timings)] = telemetry.events
+        self.assertEqual(properties["root"], "request")
+        self.assertIn("request/turn", timings)
+        self.assertEqual(next(draws), 0.0)
+
+    async def test_dumps_slow_turns(self):
+        telemetry = RecordingTelemetryClient()
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = TurnProfiler(
+                telemetry, sample_rate=1.0, slow_turn_ms=0, dump_dir=directory
+            )
+
+            async def logic(context: TurnContext):
+                await context.send_activity("hello")
+
+            await self.run_turn(profiler, logic)
+
+            properties = telemetry.events[0][1]
+            self.assertEqual(properties["slow"], "true")
+            self.assertTrue(os.path.exists(properties["profile"]))
+            self.assertEqual(profiler.dumps, 1)
+
+    async def test_waterfall_steps_are_spans(self):
+        telemetry = RecordingTelemetryClient()
+        profiler = TurnProfiler(telemetry, sample_rate=1.0)
+        conversation_state = ConversationState(MemoryStorage())
+        dialogs = DialogSet(conversation_state.create_property("DialogState"))
+
+        async def greet_step(step_context):
+            await step_context.context.send_activity("hello")
+            return await step_context.end_dialog()
+
+        dialogs.add(ProfiledWaterfallDialog("greet", [greet_step]))
+
+        async def logic(context: TurnContext):
+            dialog_context = await dialogs.create_context(context)
+            result = await dialog_context.continue_dialog()
+            if result.status == DialogTurnStatus.Empty:
+                await dialog_context.begin_dialog("greet")
+
+        await self.run_turn(profiler, logic)
+
+        timings = telemetry.events[0][2]
+        step = "turn/TestTurnProfiler.test_waterfall_steps_are_spans.<locals>.greet_step"
+        self.assertIn(step, timings)
+        self.assertIn(step + "/send_activity", timings)
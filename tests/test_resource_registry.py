@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bots import ResourceRegistry
+from bots.dialog_and_welcome_bot import RESOURCES_DIRECTORY
+
+
+class TestResourceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        shutil.copy(os.path.join(RESOURCES_DIRECTORY, "welcomeCard.json"), self.directory)
+        self.path = os.path.join(self.directory, "welcomeCard.json")
+        self.registry = ResourceRegistry(self.directory, reload_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, content: str, mtime: int):
+        with open(self.path, "w") as card_file:
+            card_file.write(content)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_serves_independent_attachments(self):
+        attachment = self.registry.attachment("welcomeCard")
+        self.assertEqual(attachment.content_type, "application/vnd.microsoft.card.adaptive")
+        self.assertEqual(attachment.content["type"], "AdaptiveCard")
+
+        attachment.content["body"].clear()
+        self.assertNotEqual(self.registry.attachment("welcomeCard").content["body"], [])
+
+    def test_reloads_changed_files(self):
+        card = {"type": "AdaptiveCard", "version": "1.0", "body": []}
+        self.write(json.dumps(card), 1)
+        self.registry.reload_changed()
+        self.assertEqual(self.registry.attachment("welcomeCard").content, card)
+
+        self.write("{ not json", 2)
+        self.registry.reload_changed()
+        self.registry.reload_changed()
+        self.assertEqual(self.registry.attachment("welcomeCard").content, card)
+        self.assertEqual(self.registry.reloads, 1)
+        self.assertEqual(self.registry.failures, 1)
+
+        self.write(json.dumps(card), 3)
+        self.registry.reload_changed()
+        self.assertEqual(self.registry.reloads, 2)
+
+    def test_rejects_invalid_cards(self):
+        self.write(json.dumps({"type": "HeroCard"}), 1)
+        with self.assertRaises(ValueError):
+            ResourceRegistry(self.directory)
+
+    def test_keeps_the_templates_of_a_missing_directory(self):
+        shutil.rmtree(self.directory)
+        self.registry.reload_changed()
+        self.registry.reload_changed()
+        self.assertEqual(self.registry.failures, 1)
+        self.assertEqual(self.registry.attachment("welcomeCard").content["type"], "AdaptiveCard")
+        os.makedirs(self.directory)
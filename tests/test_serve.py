@@ -0,0 +1,60 @@
+import os
+import signal
+import time
+import unittest
+
+from serve import Master, bind_socket
+
+
+class SleepingMaster(Master):
+    """Master forking workers which sleep until they are signaled."""
+
+    def spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            time.sleep(30)
+            os._exit(0)
+        self.workers[pid] = (index, time.monotonic())
+        self.spawned += 1
+        return pid
+
+
+class TestMaster(unittest.TestCase):
+
+    def setUp(self):
+        self.master = SleepingMaster(bind_socket("127.0.0.1", 0), 2, shutdown_timeout=1)
+
+    def tearDown(self):
+        self.master.stop()
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 10
+        while not condition() and time.monotonic() < deadline:
+            self.master.reap()
+            time.sleep(0.05)
+        self.assertTrue(condition())
+
+    def test_replaces_dead_workers(self):
+        for index in range(2):
+            self.master.spawn(index)
+        pid = next(pid for pid, (index, _) in self.master.workers.items() if index == 0)
+
+        os.kill(pid, signal.SIGKILL)
+        self.wait_for(lambda: self.master.spawned == 3)
+
+        self.assertNotIn(pid, self.master.workers)
+        self.assertEqual(sorted(index for index, _ in self.master.workers.values()), [0, 1])
+
+    def test_reload_drains_previous_generation(self):
+        for index in range(2):
+            self.master.spawn(index)
+        previous = set(self.master.workers)
+
+        self.master.reload()
+        self.assertEqual(self.master.retired, previous)
+        self.wait_for(lambda: not self.master.retired)
+
+        self.assertEqual(len(self.master.workers), 2)
+        self.assertFalse(previous & set(self.master.workers))
+        self.assertEqual(self.master.spawned, 4)
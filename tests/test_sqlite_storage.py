@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+
+import aiounittest
+from botbuilder.core import StoreItem
+
+from storage import SqliteStorage
+
+
+def increment(path: str, key: str, times: int):
+    async def run():
+        storage = SqliteStorage(path)
+        for _ in range(times):
+            while True:
+                item = (await storage.read([key]))[key]
+                item["count"] += 1
+                try:
+                    await storage.write({key: item})
+                    break
+                except KeyError:
+                    continue
+        storage.close()
+
+    asyncio.run(run())
+
+
+class TestSqliteStorage(aiounittest.AsyncTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "state.db")
+        self.storage = SqliteStorage(self.path)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    async def test_read_write_delete(self):
+        await self.storage.write({"dict": {"turns": ["Paris"]}, "item": StoreItem(count=1)})
+
+        items = await self.storage.read(["dict", "item", "missing"])
+        self.assertEqual(items["dict"], {"turns": ["Paris"], "e_tag": "1"})
+        self.assertEqual(items["item"].count, 1)
+        self.assertNotIn("missing", items)
+
+        await self.storage.delete(["dict"])
+        self.assertEqual(await self.storage.read(["dict"]), {})
+
+    async def test_etag_conflict(self):
+        await self.storage.write({"key": {"count": 0}})
+        first = (await self.storage.read(["key"]))["key"]
+        second = (await self.storage.read(["key"]))["key"]
+
+        await self.storage.write({"key": first})
+        self.assertEqual(first["e_tag"], "2")
+        with self.assertRaises(KeyError):
+            await self.storage.write({"key": second})
+
+        second["e_tag"] = "*"
+        await self.storage.write({"key": second})
+        self.assertEqual(self.storage.conflicts, 1)
+
+    async def test_batches_concurrent_operations(self):
+        await asyncio.gather(*[
+            self.storage.write({f"key{index}": {"index": index}}) for index in range(10)
+        ])
+        self.assertEqual(self.storage.batches, 1)
+        self.assertEqual(len(await self.storage.read([f"key{index}" for index in range(10)])), 10)
+
+    async def test_expires_idle_items(self):
+        storage = SqliteStorage(self.path, ttl=0.05)
+        await storage.write({"key": {"count": 0}})
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(await storage.read(["key"]), {})
+        self.assertEqual(await storage.evict_expired(), 1)
+        storage.close()
+
+    async def test_shared_by_processes(self):
+        await self.storage.write({"counter": {"count": 0}})
+
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=increment, args=(self.path, "counter", 20))
+            for _ in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual((await self.storage.read(["counter"]))["counter"]["count"], 60)
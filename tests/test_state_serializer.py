@@ -0,0 +1,39 @@
+import json
+import unittest
+
+from botbuilder.dialogs import DialogInstance, DialogState
+from jsonpickle.pickler import Pickler
+
+from booking_details import BookingDetails
+from storage import StateSerializer
+
+
+class TestStateSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = StateSerializer(compress_above=64)
+        details = BookingDetails(dst_city="Paris", budget="$ 500", turns=["book a flight to Paris"])
+        self.state = {
+            "DialogState": DialogState([
+                DialogInstance("WaterfallDialog", {"options": details, "stepIndex": 2}),
+            ]),
+            "count": -3,
+            "ratio": 0.5,
+        }
+
+    def test_round_trip(self):
+        data = self.serializer.dumps(self.state)
+        self.assertLess(len(data), len(json.dumps(Pickler().flatten(self.state))))
+
+        state = self.serializer.loads(data)
+        instance = state["DialogState"].dialog_stack[0]
+        self.assertEqual(instance.state["options"].to_dict(), self.state["DialogState"].dialog_stack[0].state["options"].to_dict())
+        self.assertEqual((state["count"], state["ratio"]), (-3, 0.5))
+
+    def test_reads_plain_json(self):
+        data = json.dumps(Pickler().flatten(self.state)).encode("utf-8")
+        self.assertEqual(self.serializer.loads(data)["DialogState"].dialog_stack[0].id, "WaterfallDialog")
+
+    def test_rejects_unknown_version(self):
+        with self.assertRaises(ValueError):
+            self.serializer.loads(b"\x09\x00")
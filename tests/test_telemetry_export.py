@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from applicationinsights.channel import SenderBase
+
+from telemetry import BatchingTelemetryQueue, batching_telemetry_client
+
+
+class ListSender(SenderBase):
+
+    def __init__(self):
+        super().__init__("memory")
+        self.batches = []
+        self.sent = threading.Event()
+
+    def send(self, data_to_send):
+        self.batches.append(list(data_to_send))
+        self.sent.set()
+
+
+class Envelope:
+
+    def __init__(self, base_type="EventData"):
+        self.data = type("Data", (), {"base_type": base_type})()
+
+
+class TestBatchingTelemetryQueue(unittest.TestCase):
+
+    def test_sends_full_batches_from_thread(self):
+        sender = ListSender()
+        queue = BatchingTelemetryQueue(sender, batch_size=3, send_interval=60)
+        for _ in range(3):
+            queue.put(Envelope())
+
+        self.assertTrue(sender.sent.wait(5))
+        self.assertEqual([len(batch) for batch in sender.batches], [3])
+        queue.put(Envelope())
+        queue.close()
+        self.assertEqual([len(batch) for batch in sender.batches], [3, 1])
+        self.assertEqual(queue.metrics()["sent"], 4)
+
+    def test_samples_then_drops_under_pressure(self):
+        sender = ListSender()
+        queue = BatchingTelemetryQueue(
+            sender,
+            max_pending=8,
+            batch_size=100,
+            send_interval=60,
+            pressure_ratio=0.5,
+            pressure_keep_every=2,
+        )
+        for _ in range(4):
+            queue.put(Envelope())
+        queue.put(Envelope("ExceptionData"))
+        for _ in range(6):
+            queue.put(Envelope())
+        queue.put(Envelope("ExceptionData"))
+
+        metrics = queue.metrics()
+        self.assertEqual(metrics["pending"], 8)
+        self.assertEqual(metrics["sampled_out"], 3)
+        self.assertEqual(metrics["dropped"], 1)
+        queue.close()
+        self.assertEqual(sum(len(batch) for batch in sender.batches), 8)
+
+    def test_file_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "telemetry", "events.jsonl")
+            client = batching_telemetry_client(
+                "00000000-0000-0000-0000-000000000000", file_path=path, send_interval=60
+            )
+            client.track_event("booking_accepted", {"or_city": "Paris"})
+            client.track_trace("booking_refused")
+            client.channel.queue.close()
+
+            with open(path, encoding="utf-8") as sink:
+                envelopes = [json.loads(line) for line in sink]
+
+        self.assertEqual(
+            [envelope["data"]["baseType"] for envelope in envelopes],
+            ["EventData", "MessageData"],
+        )
+        self.assertEqual(envelopes[0]["data"]["baseData"]["properties"], {"or_city": "Paris"})
@@ -0,0 +1,93 @@
+import aiounittest
+from botbuilder.core import NullTelemetryClient, TelemetryLoggerMiddleware, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.core.bot_telemetry_client import Severity
+
+from booking_details import BookingDetails
+from dialogs.booking_dialog import BOOKING_TRACE_PROPERTIES
+from telemetry import SamplingTelemetryClient, TelemetrySamplingMiddleware
+from telemetry.sampling import conversation_sample
+from tests.recording_telemetry import RecordingTelemetryClient
+
+
+class TestSamplingTelemetryClient(aiounittest.AsyncTestCase):
+
+    async def run_turn(self, client, logic):
+        adapter = TestAdapter(logic)
+        adapter.use(TelemetrySamplingMiddleware(client))
+        adapter.use(TelemetryLoggerMiddleware(client, False))
+        await adapter.test("hi", "hello")
+
+    async def test_keeps_only_slow_or_failed_turns_when_not_sampled(self):
+        recorded = RecordingTelemetryClient()
+        client = SamplingTelemetryClient(recorded, rate=0.0, slow_turn_ms=10000)
+
+        async def quiet(context: TurnContext):
+            client.track_trace("booking_accepted")
+            await context.send_activity("hello")
+
+        async def refused(context: TurnContext):
+            client.track_trace("booking_refused", severity=Severity.warning)
+            await context.send_activity("hello")
+
+        await self.run_turn(client, quiet)
+        self.assertEqual(recorded.items, [])
+        await self.run_turn(client, refused)
+        self.assertEqual(
+            recorded.items, ["BotMessageReceived", "booking_refused", "BotMessageSend"]
+        )
+        self.assertEqual(client.metrics()["dropped_turns"], 1)
+        self.assertEqual(client.metrics()["dropped_items"], 3)
+        self.assertEqual(client.metrics()["tail_kept_turns"], 1)
+
+        client.track_event("outside of a turn")
+        self.assertEqual(recorded.items[-1], "outside of a turn")
+
+    async def test_sampled_conversations_are_forwarded(self):
+        recorded = RecordingTelemetryClient()
+        client = SamplingTelemetryClient(recorded, rate=1.0)
+
+        async def logic(context: TurnContext):
+            await context.send_activity("hello")
+
+        await self.run_turn(client, logic)
+        self.assertEqual(recorded.items, ["BotMessageReceived", "BotMessageSend"])
+        self.assertEqual(client.metrics()["sampled_turns"], 1)
+
+    async def test_reports_its_counters_past_the_sampling(self):
+        recorded = RecordingTelemetryClient()
+        client = SamplingTelemetryClient(recorded, rate=0.0, report_interval=1e-9)
+
+        async def quiet(context: TurnContext):
+            await context.send_activity("hello")
+
+        await self.run_turn(client, quiet)
+        await self.run_turn(client, quiet)
+
+        self.assertIn(("TelemetrySampling.dropped_turns", 1), recorded.metrics)
+        self.assertEqual(recorded.items, [])
+
+    def test_conversation_hash_is_stable(self):
+        client = SamplingTelemetryClient(NullTelemetryClient(), rate=0.3)
+        ids = [f"conversation-{index}" for index in range(2000)]
+        sampled = [conversation_id for conversation_id in ids if client.is_sampled(conversation_id)]
+
+        self.assertEqual(sampled, [c for c in ids if client.is_sampled(c)])
+        self.assertAlmostEqual(len(sampled) / len(ids), 0.3, delta=0.05)
+        self.assertEqual(conversation_sample("a"), conversation_sample("a"))
+
+
+class TestPropertyProjector(aiounittest.AsyncTestCase):
+
+    def test_booking_traces_do_not_grow_with_the_transcript(self):
+        details = BookingDetails(or_city="Paris", dst_city="x" * 500, turns=["hi"] * 50)
+        details.spilled_turns = 30
+
+        properties = BOOKING_TRACE_PROPERTIES.project(details.to_dict())
+
+        self.assertEqual(properties, {
+            "or_city": "Paris",
+            "dst_city": "x" * 64,
+            "turns_count": "50",
+            "spilled_turns_count": "30",
+        })
@@ -0,0 +1,18 @@
+import unittest
+
+from helpers.timex_cache import resolve_timex
+
+
+class TestTimexCache(unittest.TestCase):
+
+    def test_resolves_definite_dates(self):
+        resolution = resolve_timex("2022-08-23")
+        self.assertTrue(resolution.definite)
+        self.assertEqual(resolution.date, "2022-08-23")
+        self.assertIn("date", resolution.types)
+        self.assertIs(resolve_timex("2022-08-23"), resolution)
+
+    def test_resolves_partial_dates(self):
+        resolution = resolve_timex("XXXX-08-23")
+        self.assertFalse(resolution.definite)
+        self.assertIsNone(resolution.date)
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+
+import aiounittest
+import jwt
+from aiohttp import web
+from botbuilder.core import BotFrameworkAdapterSettings, ConversationState, MemoryStorage
+from botbuilder.schema import Activity
+from botframework.connector.auth import AuthenticationConstants, ChannelValidation
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from adapter_with_error_handler import AdapterWithErrorHandler
+from authentication import SigningKeyRefresher, ValidatedTokenCache
+
+APP_ID = "2cd87869-38a0-4182-9251-d056e8f0ac24"
+SERVICE_URL = "https://smba.trafficmanager.net/emea/"
+
+
+class FakeIdentityProvider:
+    """OpenID metadata and signing keys served from a local aiohttp server."""
+
+    def __init__(self):
+        self.keys = {}
+        self.requests = 0
+        self.url = None
+        self._runner = None
+
+    def add_key(self, kid: str):
+        self.keys[kid] = rsa.generate_private_key(65537, 2048, default_backend())
+
+    def token(self, kid: str, service_url: str = SERVICE_URL, lifetime: int = 3600) -> str:
+        pem = self.keys[kid].private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        claims = {
+            "iss": AuthenticationConstants.TO_BOT_FROM_CHANNEL_TOKEN_ISSUER,
+            "aud": APP_ID,
+            "serviceurl": service_url,
+            "exp": int(time.time()) + lifetime,
+        }
+        token = jwt.encode(claims, pem, algorithm="RS256", headers={"kid": kid})
+        return "Bearer " + (token.decode() if isinstance(token, bytes) else token)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/.well-known/openid-configuration", self.metadata)
+        app.router.add_get("/keys", self.jwks)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, shutdown_timeout=0.1)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url + "/.well-known/openid-configuration"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def metadata(self, request):
+        self.requests += 1
+        return web.json_response({"jwks_uri": self.url + "/keys"})
+
+    async def jwks(self, request):
+        self.requests += 1
+        keys = []
+        for kid, key in self.keys.items():
+            jwk = json.loads(RSAAlgorithm.to_jwk(key.public_key()))
+            keys.append(dict(jwk, kid=kid))
+        return web.json_response({"keys": keys})
+
+
+class TestValidatedTokenCache(aiounittest.AsyncTestCase):
+
+    async def set_up(self):
+        self.identity_provider = FakeIdentityProvider()
+        self.identity_provider.add_key("key-1")
+        self.metadata_url = await self.identity_provider.start()
+        ChannelValidation.open_id_metadata_endpoint = self.metadata_url
+
+        self.now = time.time()
+        self.cache = ValidatedTokenCache(clock=lambda: self.now)
+        self.refresher = SigningKeyRefresher(
+            [self.metadata_url], min_interval=0, on_keys_removed=self.cache.clear
+        )
+        await self.refresher.start()
+        self.adapter = AdapterWithErrorHandler(
+            BotFrameworkAdapterSettings(APP_ID, "secret"),
+            ConversationState(MemoryStorage()),
+            token_cache=self.cache,
+            key_refresher=self.refresher,
+        )
+
+    async def tear_down(self):
+        await self.refresher.stop()
+        await self.identity_provider.stop()
+        ChannelValidation.open_id_metadata_endpoint = None
+
+    def activity(self, service_url: str = SERVICE_URL) -> Activity:
+        return Activity(type="message", channel_id="msteams", service_url=service_url)
+
+    async def test_validates_each_token_once(self):
+        await self.set_up()
+        try:
+            header = self.identity_provider.token("key-1")
+            first = await self.adapter._authenticate_request(self.activity(), header)
+            second = await self.adapter._authenticate_request(self.activity(), header)
+
+            self.assertIs(first, second)
+            self.assertEqual(first.get_claim_value("aud"), APP_ID)
+            self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+            # Only the refresher fetched the metadata and the keys.
+            self.assertEqual(self.identity_provider.requests, 2)
+
+            with self.assertRaises(PermissionError):
+                await self.adapter._authenticate_request(
+                    self.activity("https://elsewhere.example/"), header
+                )
+
+            self.now += 7200
+            await self.adapter._authenticate_request(self.activity(), header)
+            self.assertEqual(self.cache.expired, 1)
+        finally:
+            await self.tear_down()
+
+    async def test_refreshes_rotated_keys_in_background(self):
+        await self.set_up()
+        try:
+            self.identity_provider.add_key("key-2")
+            header = self.identity_provider.token("key-2")
+            with self.assertRaises(Exception):
+                await self.adapter._authenticate_request(self.activity(), header)
+
+            # The failure asked the background task for new keys.
+            for _ in range(100):
+                if self.refresher.refreshes == 2:
+                    break
+                await asyncio.sleep(0.05)
+            identity = await self.adapter._authenticate_request(self.activity(), header)
+            self.assertEqual(identity.get_claim_value("serviceurl"), SERVICE_URL)
+
+            del self.identity_provider.keys["key-1"]
+            await self.refresher.refresh_all()
+            self.assertEqual(len(self.cache), 0)
+        finally:
+            await self.tear_down()
+
+    async def test_authenticates_before_the_turn(self):
+        await self.set_up()
+        try:
+            # app.py admits the turns of authenticated requests only.
+            with self.assertRaises(PermissionError):
+                await self.adapter.authenticate(self.activity(), "")
+            identity = await self.adapter.authenticate(
+                self.activity(), self.identity_provider.token("key-1")
+            )
+            self.assertTrue(identity.is_authenticated)
+        finally:
+            await self.tear_down()
@@ -0,0 +1,97 @@
+import aiounittest
+from botbuilder.core import ConversationState, MemoryStorage, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import DialogSet, DialogTurnStatus
+
+from booking_details import BookingDetails
+from dialogs import BookingDialog
+from storage import OutcomeStore, TranscriptStore
+
+
+class ListOutcomeStore(OutcomeStore):
+
+    def __init__(self):
+        self.records = []
+
+    def append(self, outcome: str, record: dict) -> None:
+        self.records.append((outcome, record))
+
+    def read(self):
+        return iter(self.records)
+
+
+def conversation(booking_dialog: BookingDialog) -> TestAdapter:
+    """A conversation of its own, sharing the dialog instance with the others."""
+    conversation_state = ConversationState(MemoryStorage())
+    dialogs = DialogSet(conversation_state.create_property("DialogState"))
+    dialogs.add(booking_dialog)
+
+    async def logic(context: TurnContext):
+        dialog_context = await dialogs.create_context(context)
+        result = await dialog_context.continue_dialog()
+        if result.status == DialogTurnStatus.Empty:
+            await dialog_context.begin_dialog(
+                booking_dialog.id,
+                BookingDetails(str_date="2022-10-10", end_date="2022-11-10"),
+            )
+        await conversation_state.save_changes(context)
+
+    return TestAdapter(logic)
+
+
+class TestTranscriptStore(aiounittest.AsyncTestCase):
+
+    def test_ring_buffer(self):
+        store = TranscriptStore(capacity=3)
+        state = {}
+        for text in ("a", "b", "c", "dd", "é"):
+            store.append(state, text)
+
+        self.assertEqual(store.read(state), ["c", "dd", "é"])
+        self.assertEqual(store.size_of(state), 5)
+        self.assertEqual(store.metrics()["live_bytes"], 5)
+        self.assertEqual(store.metrics()["overwritten"], 2)
+
+        self.assertEqual(store.release(state), ["c", "dd", "é"])
+        self.assertEqual(state, {})
+        self.assertEqual(
+            store.metrics(),
+            {
+                "opened": 1,
+                "released": 1,
+                "live": 0,
+                "appended": 5,
+                "overwritten": 2,
+                "live_entries": 0,
+                "live_bytes": 0,
+            },
+        )
+
+    async def test_transcripts_are_per_conversation(self):
+        transcripts = TranscriptStore()
+        new_data = ListOutcomeStore()
+        booking_dialog = BookingDialog(
+            outcome_store=ListOutcomeStore(),
+            new_data_store=new_data,
+            transcripts=transcripts,
+        )
+        first = conversation(booking_dialog)
+        second = conversation(booking_dialog)
+
+        await first.test("book a flight", "From what city will you be travelling?")
+        await second.test("book a flight", "From what city will you be travelling?")
+        await first.test("Paris", "To what city would you like to travel?")
+        await second.test("Rome", "To what city would you like to travel?")
+        await first.test("Berlin", "What is your budget for this trip?")
+        await second.test("cancel", "Cancelling")
+        step = await first.send("$500")
+        await step.assert_reply(lambda activity, description: None)
+        await first.send("no")
+
+        self.assertEqual(
+            [record["text"] for _, record in new_data.records],
+            ["book a flight Paris Berlin $500 2022-10-10 2022-11-10"],
+        )
+        # The ended and the cancelled bookings both released their transcript.
+        self.assertEqual(transcripts.metrics()["live"], 0)
+        self.assertEqual(transcripts.metrics()["live_bytes"], 0)
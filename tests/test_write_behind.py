@@ -0,0 +1,114 @@
+import fcntl
+import os
+import tempfile
+
+import aiounittest
+
+from storage import JsonlOutcomeStore, OutcomeStore, WriteBehindQueue, OUTCOME_ACCEPTED
+
+
+class FailingStore(OutcomeStore):
+    """Store whose appends fail while `failing` is set, ie a full disk."""
+
+    def __init__(self):
+        self.failing = True
+        self.records = []
+
+    def append(self, outcome: str, record: dict) -> None:
+        if self.failing:
+            raise OSError(28, "No space left on device")
+        self.records.append(record)
+
+
+class TestWriteBehindQueue(aiounittest.AsyncTestCase):
+
+    async def test_writes_in_background(self):
+        with tempfile.TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(spill_path=os.path.join(directory, "spill"))
+            store = queue.wrap("outcomes", JsonlOutcomeStore(directory))
+
+            record = {"dst_city": "Paris", "turns": ["Paris"]}
+            store.append(OUTCOME_ACCEPTED, record)
+            record["turns"].append("mutated after the turn")
+            await queue.stop()
+
+            self.assertEqual(
+                list(store.read()),
+                [(OUTCOME_ACCEPTED, {"dst_city": "Paris", "turns": ["Paris"]})]
+            )
+            self.assertEqual(queue.metrics()["written"], 1)
+
+    async def test_spills_when_full_and_replays(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "spill")
+            queue = WriteBehindQueue(max_pending=1, spill_path=spill_path)
+            store = queue.wrap("outcomes", JsonlOutcomeStore(directory))
+
+            for index in range(3):
+                store.append(OUTCOME_ACCEPTED, {"index": index})
+            await queue.stop()
+            self.assertEqual(queue.spilled, 2)
+
+            restarted = WriteBehindQueue(spill_path=spill_path)
+            restarted.wrap("outcomes", store)
+            await restarted.start()
+            await restarted.stop()
+
+            self.assertEqual(
+                sorted(record["index"] for _, record in store.read()), [0, 1, 2]
+            )
+            self.assertFalse(os.path.exists(spill_path))
+
+    async def test_survives_a_failing_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "spill")
+            store = FailingStore()
+            queue = WriteBehindQueue(spill_path=spill_path)
+            front = queue.wrap("outcomes", store)
+
+            for index in range(2):
+                front.append(OUTCOME_ACCEPTED, {"index": index})
+            await queue.stop(timeout=1)
+            self.assertTrue(os.path.exists(spill_path))
+            self.assertEqual(store.records, [])
+
+            store.failing = False
+            restarted = WriteBehindQueue(spill_path=spill_path)
+            restarted.wrap("outcomes", store)
+            await restarted.start()
+            await restarted.stop()
+            self.assertEqual(sorted(record["index"] for record in store.records), [0, 1])
+            self.assertFalse(os.path.exists(spill_path))
+
+    async def test_adopts_the_spill_files_of_exited_queues(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FailingStore()
+            store.failing = False
+
+            def spill(path: str, index: int):
+                with open(path, "w", encoding="utf-8") as spill_file:
+                    spill_file.write(
+                        '{"store": "outcomes", "outcome": "accepted", "record": {"index": %d}}\n' % index
+                    )
+
+            exited = os.path.join(directory, "spill.0.1")
+            draining = os.path.join(directory, "spill.0.2")
+            spill(exited, 1)
+            spill(draining, 2)
+            # The queue of the previous generation still holds its file.
+            holder = os.open(draining + ".lock", os.O_RDWR | os.O_CREAT)
+            fcntl.flock(holder, fcntl.LOCK_EX)
+            try:
+                queue = WriteBehindQueue(
+                    spill_path=os.path.join(directory, "spill.0.3"),
+                    adopt_pattern=os.path.join(directory, "spill.0.*"),
+                )
+                queue.wrap("outcomes", store)
+                await queue.start()
+                await queue.stop()
+            finally:
+                os.close(holder)
+
+            self.assertEqual(store.records, [{"index": 1}])
+            self.assertFalse(os.path.exists(exited))
+            self.assertTrue(os.path.exists(draining))